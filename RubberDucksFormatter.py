@@ -1,12 +1,217 @@
+import json
+import re
+import sys
 
+_WHITESPACE = re.compile(r"\s*")
+# Whitespace or punctuation: the end of a JSON token outside strings
+_TOKEN_END = re.compile(r"[\s,:\[\]{}]")
+_decoder = json.JSONDecoder()
+
+
+def format_duck(duck, label="Duck"):
+    return f"{label} Name: {duck['name']}, Color: {duck['color']}"
 
 
 class RubberDucksFormatter:
     def __init__(self, ducks):
+        # Any iterable of ducks works, including iter_ducks() on a stream
         self.ducks = ducks
 
     def format_ducks(self):
-        return [f"Duck Name: {duck['name']}, Color: {duck['color']}" for duck in self.ducks]
+        return [format_duck(duck) for duck in self.ducks]
+
+    def iter_formatted(self):
+        """Yield the formatted ducks one at a time instead of building a list."""
+        for duck in self.ducks:
+            yield format_duck(duck)
+
+
+class _ChunkReader:
+    """Text buffer over a file that holds roughly one chunk at a time."""
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        # Drop what has been consumed and append the next chunk
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or "" at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in flock file, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def skip(self, char):
+        """Consume char if it is next, return whether it was."""
+        if self.peek() == char:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self):
+        """Decode the next complete JSON value, reading more as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as error:
+                # Only a value cut off by the end of the buffer can be
+                # completed by reading on: an open string, or one partial
+                # token at the very end. Anything followed by more text is
+                # a syntax error, reported without reading the rest
+                rest = self.buf[error.pos:].lstrip()
+                truncated = error.msg.startswith("Unterminated string") or not _TOKEN_END.search(rest)
+                if not truncated or not self.fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer end may continue in the next chunk
+            if end == len(self.buf) and not isinstance(value, (dict, list, str)) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_flock(file, chunk_size=1 << 16):
+    """
+    Parse a flock file incrementally.
+
+    Only one chunk of text and one duck are held at a time, so memory does
+    not grow with the number of ducks.
+
+    Args:
+        file: Text file object positioned at the start of the JSON
+        chunk_size (int): Characters read per step
+
+    Yields:
+        tuple: ("duck", duck) for each entry of the "ducks" array and
+        (key, value) for every other top-level key, e.g. ("mamaDuck", {...}),
+        in file order
+    """
+    reader = _ChunkReader(file, chunk_size)
+    reader.expect("{")
+    if reader.skip("}"):
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "ducks":
+            reader.expect("[")
+            if not reader.skip("]"):
+                while True:
+                    yield "duck", reader.value()
+                    if not reader.skip(","):
+                        break
+                reader.expect("]")
+        else:
+            yield key, reader.value()
+
+        if not reader.skip(","):
+            reader.expect("}")
+            return
+
+
+def iter_ducks(file, chunk_size=1 << 16):
+    """Yield only the entries of the "ducks" array, see iter_flock."""
+    for kind, value in iter_flock(file, chunk_size):
+        if kind == "duck":
+            yield value
+
+
+def iter_formatted_flock(file, chunk_size=1 << 16):
+    """Yield a formatted line per duck, and one for the mamaDuck if present."""
+    for kind, value in iter_flock(file, chunk_size):
+        if kind == "duck":
+            yield format_duck(value)
+        elif kind == "mamaDuck":
+            yield format_duck(value, "Mama Duck")
+
+
+def write_lines(lines, sink, buffer_size=1 << 16):
+    """
+    Write lines to any file-like sink, batching them into large writes.
+
+    Args:
+        lines (iterable): Strings without trailing newlines
+        sink: Object with a write(str) method
+        buffer_size (int): Characters collected before each write
+
+    Returns:
+        int: Number of lines written
+    """
+    pending = []
+    pending_size = 0
+    count = 0
+    for line in lines:
+        pending.append(line)
+        pending_size += len(line) + 1
+        count += 1
+        if pending_size >= buffer_size:
+            pending.append("")
+            sink.write("\n".join(pending))
+            pending = []
+            pending_size = 0
+    if pending:
+        pending.append("")
+        sink.write("\n".join(pending))
+    return count
+
+
+def iter_formatted_snapshot(snapshot):
+    """Like iter_formatted_flock, over a flock_snapshot.FlockSnapshot."""
+    for duck in snapshot:
+        yield format_duck(duck)
+    if snapshot.mama_duck is not None:
+        yield format_duck(snapshot.mama_duck, "Mama Duck")
+
+
+def stream_format(path, sink, chunk_size=1 << 16, use_snapshot=True):
+    """
+    Format a flock file of any size into sink.
+
+    With use_snapshot the ducks come from the file's binary snapshot, which
+    is compiled on first use and whenever the JSON changes. If the snapshot
+    cannot be written (e.g. a read-only directory) the JSON is streamed.
+
+    Returns:
+        int: Number of lines written
+    """
+    if use_snapshot:
+        # Imported here, flock_snapshot itself builds on iter_flock
+        from flock_snapshot import load_flock
+        try:
+            snapshot = load_flock(path)
+        except OSError:
+            snapshot = None
+        if snapshot is not None:
+            with snapshot:
+                return write_lines(iter_formatted_snapshot(snapshot), sink, chunk_size)
+
+    with open(path, "r", encoding="utf-8") as file:
+        return write_lines(iter_formatted_flock(file, chunk_size), sink, chunk_size)
+
+
+if __name__ == "__main__":
+    for flock_path in sys.argv[1:] or ["RubberDucks.json"]:
+        stream_format(flock_path, sys.stdout)
 
 # Example usage
 # import json
@@ -27,4 +232,9 @@ class RubberDucksFormatter:
 
 # ducks_data = json.loads(ducks_json)['ducks']
 # formatter = RubberDucksFormatter(ducks_data)
-# print(formatter.format_ducks()) 
\ No newline at end of file
+# print(formatter.format_ducks())
+#
+# Streaming, for flock files too large to load:
+# with open('RubberDucks.json') as file:
+#     for line in RubberDucksFormatter(iter_ducks(file)).iter_formatted():
+#         print(line)
@@ -1,13 +1,20 @@
 import os
 import sys
 import numpy as np
-import cv2
 from PIL import Image
 import tkinter as tk
 from tkinter import filedialog, Scale, Button, Label, Frame
 from tkinter.ttk import Progressbar
 import threading
 
+import color_metrics
+import image_cache
+import image_ops
+import keyed_output
+import keying
+from preview_render import PreviewRenderer
+from preview_scheduler import PreviewScheduler
+
 class BackgroundRemoverApp:
     def __init__(self, root):
         self.root = root
@@ -19,7 +26,18 @@ class BackgroundRemoverApp:
         self.output_path = None
         self.target_color = None
         self.color_range = 30
-        self.img = None
+        self.metric = "rgb"
+        self.extra_keys = []
+        self.preview_keys_mask = None
+        self.feather = 0
+        self.seed = None
+        self.key_seeds = []
+        self.img_rgb = None
+        self.proxy_rgb = None
+        self.preview_distance = None
+        self.preview_spaces = None
+        self.distance_map = None
+        self.color_spaces = None
         self.img_display = None
         self.preview_img = None
         self.is_processing = False
@@ -34,9 +52,11 @@ class BackgroundRemoverApp:
         # Control elements
         self.create_controls()
         
-        # Image display
+        # Image display, one persistent label updated in place
         self.image_label = Label(self.image_frame, text="No image selected")
+        self.image_label.bind("<Button-1>", self.pick_color)
         self.image_label.pack(expand=True)
+        self.renderer = PreviewRenderer(self.image_label)
         
         # Status bar
         self.status_bar = Label(root, text="Ready", bd=1, relief=tk.SUNKEN, anchor=tk.W)
@@ -45,6 +65,12 @@ class BackgroundRemoverApp:
         # Progress bar (hidden initially)
         self.progress = Progressbar(root, orient=tk.HORIZONTAL, length=100, mode='indeterminate')
         
+        # Single background worker for previews, results come back on the Tk thread
+        self.preview_scheduler = PreviewScheduler(
+            root, self.render_preview, self.update_display,
+            on_error=lambda e: self.status_bar.config(text=f"Preview error: {str(e)}")
+        )
+        
     def create_controls(self):
         # Button to select input image
         self.select_btn = Button(self.control_frame, text="Select Image", command=self.select_image)
@@ -59,6 +85,38 @@ class BackgroundRemoverApp:
         self.range_slider.set(self.color_range)
         self.range_slider.pack(side=tk.LEFT, padx=5, pady=5)
         
+        # Color distance metric
+        self.metric_var = tk.StringVar(value=color_metrics.METRICS[self.metric])
+        self.metric_menu = tk.OptionMenu(self.control_frame, self.metric_var,
+                                         *color_metrics.METRICS.values(), command=self.update_metric)
+        self.metric_menu.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # Feathered edges: alpha ramps from the range to range + feather
+        self.feather_label = Label(self.control_frame, text="Feather:")
+        self.feather_label.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.feather_slider = Scale(self.control_frame, from_=0, to=50, orient=tk.HORIZONTAL,
+                                    length=80, command=self.update_feather)
+        self.feather_slider.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.edges_only = tk.BooleanVar(value=True)
+        self.edges_only_check = tk.Checkbutton(self.control_frame, text="Edges only",
+                                               variable=self.edges_only)
+        self.edges_only_check.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # Only remove the region connected to the clicked point(s)
+        self.contiguous = tk.BooleanVar(value=False)
+        self.contiguous_check = tk.Checkbutton(self.control_frame, text="Connected only",
+                                               variable=self.contiguous, command=self.generate_preview)
+        self.contiguous_check.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # Extra key colors, keyed out together with the selected one
+        self.add_key_btn = Button(self.control_frame, text="Add Key", command=self.add_key)
+        self.add_key_btn.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.clear_keys_btn = Button(self.control_frame, text="Clear Keys", command=self.clear_keys)
+        self.clear_keys_btn.pack(side=tk.LEFT, padx=5, pady=5)
+        
         # Process button
         self.process_btn = Button(self.control_frame, text="Process & Save", 
                                  command=self.process_image, state=tk.DISABLED)
@@ -81,16 +139,42 @@ class BackgroundRemoverApp:
         if not self.input_path:
             return
         
-        self.img = cv2.imread(self.input_path)
-        if self.img is None:
+        # Decoded images are cached, so re-selecting a file skips the decode
+        try:
+            self.img_rgb = image_cache.load_array(self.input_path, "RGB", exif_transpose=True)
+        except Exception:
             self.status_bar.config(text=f"Error: Could not read image at {self.input_path}")
             return
-            
-        self.img_rgb = cv2.cvtColor(self.img, cv2.COLOR_BGR2RGB)
-        self.update_display(self.img_rgb)
+        
+        # Previews run on a display-sized copy, the full image is only keyed on save
+        self.preview_scheduler.cancel()
+        self.seed = None
+        # Keys, seeds and their cached mask belong to the previous image
+        self.extra_keys = []
+        self.key_seeds = []
+        self.preview_keys_mask = None
+        self.proxy_rgb = self.build_proxy(self.img_rgb)
+        
+        # Color space conversions are cached per image and shared by all metrics
+        self.preview_spaces = color_metrics.ColorSpaceCache(self.proxy_rgb)
+        self.color_spaces = color_metrics.ColorSpaceCache(self.img_rgb)
+        self.update_display(self.proxy_rgb)
         self.status_bar.config(text=f"Image loaded: {os.path.basename(self.input_path)}")
         self.process_btn.config(state=tk.DISABLED)
         
+    def build_proxy(self, img):
+        h, w = img.shape[:2]
+        max_height = self.image_frame.winfo_height() or 400
+        max_width = self.image_frame.winfo_width() or 700
+        
+        ratio = min(max_width/w, max_height/h)
+        if ratio >= 1:
+            return img
+        
+        # Area averaging (OpenCV, loaded on first use) keeps keyed colors representative
+        new_size = (max(1, int(w * ratio)), max(1, int(h * ratio)))
+        return image_ops.resize(img, new_size)
+        
     def update_display(self, img, resize=True):
         h, w = img.shape[:2]
         
@@ -98,26 +182,12 @@ class BackgroundRemoverApp:
         if resize:
             max_height = self.image_frame.winfo_height() or 400
             max_width = self.image_frame.winfo_width() or 700
-            
-            # Calculate resize ratio
-            ratio = min(max_width/w, max_height/h)
-            if ratio < 1:
-                new_width = int(w * ratio)
-                new_height = int(h * ratio)
-                img = cv2.resize(img, (new_width, new_height))
-        
-        # Convert NumPy array to PhotoImage
-        self.img_display = Image.fromarray(img)
-        self.photo = tk.PhotoImage(master=self.root, data=self.img_display.tobytes())
-        
-        # Update label
-        if hasattr(self, 'image_label'):
-            self.image_label.destroy()
-        
-        self.image_label = Label(self.image_frame, image=self.photo)
-        self.image_label.image = self.photo  # Keep a reference
-        self.image_label.bind("<Button-1>", self.pick_color)
-        self.image_label.pack(expand=True)
+        else:
+            max_width, max_height = w, h
+        
+        # Copy the array straight into the existing Tk image (scaling it first,
+        # cheaply and refined once idle, if it does not fit)
+        self.img_display = self.renderer.show_array(img, (max_width, max_height))
         
     def pick_color(self, event):
         if self.img_rgb is None:
@@ -140,8 +210,9 @@ class BackgroundRemoverApp:
         x = max(0, min(x, original_width - 1))
         y = max(0, min(y, original_height - 1))
         
-        # Get the color at the clicked point
+        # Get the color at the clicked point, which is also the flood fill seed
         self.target_color = self.img_rgb[y, x].tolist()
+        self.seed = (x, y)
         
         # Update color indicator
         hex_color = f'#{self.target_color[0]:02x}{self.target_color[1]:02x}{self.target_color[2]:02x}'
@@ -157,31 +228,92 @@ class BackgroundRemoverApp:
         self.color_range = int(value)
         if self.target_color is not None:
             self.generate_preview()
+    
+    def update_feather(self, value):
+        # Only affects the saved image, the preview shows the hard key
+        self.feather = int(value)
+    
+    def update_metric(self, label):
+        self.metric = next(key for key, value in color_metrics.METRICS.items() if value == label)
+        if self.target_color is not None:
+            self.generate_preview()
+            
+    def add_key(self):
+        # Keep the current color and range as an extra key and pick the next one
+        if self.target_color is None:
+            return
+        
+        self.extra_keys.append((tuple(self.target_color), self.color_range))
+        self.key_seeds.append(self.seed)
+        self.status_bar.config(text=f"{len(self.extra_keys)} extra key color(s), pick the next one")
+        self.generate_preview()
+    
+    def clear_keys(self):
+        self.extra_keys = []
+        self.key_seeds = []
+        self.preview_keys_mask = None
+        self.status_bar.config(text="Extra key colors cleared")
+        self.generate_preview()
             
     def generate_preview(self):
         if self.img_rgb is None or self.target_color is None:
             return
-            
-        # Create a preview with the current settings
-        def process_preview():
-            target_rgb = np.array(self.target_color, dtype=np.int32)
-            img_copy = self.img_rgb.copy()
-            
-            # Only process every few pixels for speed
-            step = 3
-            for y in range(0, img_copy.shape[0], step):
-                for x in range(0, img_copy.shape[1], step):
-                    pixel_rgb = img_copy[y, x]
-                    distance = np.sqrt(np.sum((pixel_rgb - target_rgb) ** 2))
-                    if distance <= self.color_range:
-                        # Mark the background pixels as bright pink
-                        img_copy[y:y+step, x:x+step] = [255, 0, 255]
-            
-            self.update_display(img_copy)
         
-        # Run the processing in a separate thread to avoid freezing the UI
-        preview_thread = threading.Thread(target=process_preview)
-        preview_thread.start()
+        # Flood fill seeds in proxy coordinates
+        seeds = self.flood_seeds()
+        if seeds is not None:
+            sx = self.proxy_rgb.shape[1] / self.img_rgb.shape[1]
+            sy = self.proxy_rgb.shape[0] / self.img_rgb.shape[0]
+            seeds = tuple((int(x * sx), int(y * sy)) for x, y in seeds)
+        
+        # Only the latest request is kept, stale previews are dropped
+        self.preview_scheduler.request(tuple(self.target_color), self.color_range, self.metric,
+                                       tuple(self.extra_keys), seeds)
+    
+    def seeds(self):
+        # Every clicked point that picked a key color still in use
+        return [seed for seed in self.key_seeds + [self.seed] if seed is not None]
+    
+    def flood_seeds(self):
+        # Seeds for connected mode, None to key the whole image. With no
+        # clicked point there is nothing to flood from, so key globally
+        # rather than silently remove nothing
+        if not self.contiguous.get():
+            return None
+        seeds = self.seeds()
+        if not seeds:
+            self.status_bar.config(text="Connected only needs a clicked point, keying the whole image")
+            return None
+        return seeds
+    
+    def render_preview(self, target_color, color_range, metric, extra_keys, seeds=None):
+        # Runs on the preview worker thread, must not touch Tk widgets
+        proxy = self.proxy_rgb
+        img_copy = proxy.copy()
+        
+        # The distance map is only rebuilt when the color or image changes,
+        # a new range is just a threshold on it
+        self.preview_distance = keying.cached_distance_map(
+            self.preview_distance, proxy, target_color, metric, self.preview_spaces)
+        mask = self.preview_distance.mask(color_range)
+        
+        # The extra keys only change on Add/Clear, so their union is cached too.
+        # The entry holds the proxy it was built from, so a mask made for a
+        # previous image can never match
+        if extra_keys:
+            cached = self.preview_keys_mask
+            if cached is None or cached[0] is not proxy or cached[1] != (metric, extra_keys):
+                cached = (proxy, (metric, extra_keys), keying.multi_key_mask(proxy, extra_keys, metric))
+                self.preview_keys_mask = cached
+            mask |= cached[2]
+        
+        # Connected mode: only the regions the clicks landed in are removed
+        if seeds is not None:
+            mask = keying.connected_region(mask, seeds)
+        
+        # Mark the background pixels as bright pink
+        img_copy[mask] = [255, 0, 255]
+        return img_copy
     
     def process_image(self):
         if self.img_rgb is None or self.target_color is None:
@@ -189,9 +321,9 @@ class BackgroundRemoverApp:
             
         # Ask for output filename
         self.output_path = filedialog.asksaveasfilename(
-            title="Save Transparent PNG",
+            title="Save Transparent Image",
             defaultextension=".png",
-            filetypes=[("PNG files", "*.png")]
+            filetypes=[("PNG files", "*.png"), ("WebP files (lossless)", "*.webp")]
         )
         
         if not self.output_path:
@@ -203,36 +335,51 @@ class BackgroundRemoverApp:
         self.is_processing = True
         self.status_bar.config(text="Processing image...")
         
-        # Process in a separate thread
-        process_thread = threading.Thread(target=self.remove_background)
+        # Process in a separate thread, Tk variables are read here on the Tk thread
+        seeds = self.flood_seeds()
+        process_thread = threading.Thread(target=self.remove_background,
+                                          args=(self.edges_only.get(), seeds))
         process_thread.start()
     
-    def remove_background(self):
+    def remove_background(self, edges_only=True, seeds=None):
         try:
-            # Create an alpha channel (initially all opaque)
-            height, width = self.img_rgb.shape[:2]
-            alpha_channel = np.ones((height, width), dtype=np.uint8) * 255
-            
-            # Convert target_color to numpy array
-            target_rgb = np.array(self.target_color, dtype=np.int32)
+            # A full-size distance map for this color turns a save into a
+            # threshold. Perceptual metrics build one from the cached color
+            # conversions, and edge refinement needs the whole mask anyway.
+            cached = (self.distance_map is not None
+                      and self.distance_map.matches(self.img_rgb, self.target_color, self.metric))
+            if cached or self.metric != "rgb" or (self.feather and edges_only):
+                self.distance_map = keying.cached_distance_map(
+                    self.distance_map, self.img_rgb, self.target_color, self.metric, self.color_spaces)
+                rgba = np.empty(self.img_rgb.shape[:2] + (4,), dtype=np.uint8)
+                rgba[:, :, :3] = self.img_rgb
+                outer = self.color_range + self.feather
+                if not self.feather:
+                    rgba[:, :, 3] = self.distance_map.alpha(self.color_range)
+                elif edges_only:
+                    rgba[:, :, 3] = self.distance_map.refined_alpha(self.color_range, outer)
+                else:
+                    rgba[:, :, 3] = self.distance_map.soft_alpha(self.color_range, outer)
+                
+                # Extra keys stay hard-edged
+                if self.extra_keys:
+                    rgba[:, :, 3][keying.multi_key_mask(self.img_rgb, self.extra_keys, self.metric)] = 0
+            else:
+                # Nothing cached to reuse: row bands are keyed on a thread
+                # pool straight into one RGBA buffer
+                rgba = keying.remove_background_parallel(
+                    self.img_rgb, self.target_color, self.color_range, self.metric,
+                    keys=self.extra_keys, feather=self.feather)
             
-            # For each pixel, check if it's within the color range of the target color
-            for y in range(height):
-                for x in range(width):
-                    pixel_rgb = self.img_rgb[y, x]
-                    # Calculate color distance (Euclidean distance in RGB space)
-                    distance = np.sqrt(np.sum((pixel_rgb - target_rgb) ** 2))
-                    # If the distance is within the range, mark the pixel for transparency
-                    if distance <= self.color_range:
-                        alpha_channel[y, x] = 0  # Transparent
+            # Connected mode: restore everything not reachable from a clicked point
+            if seeds is not None:
+                rgba[:, :, 3] = keying.contiguous_alpha(rgba[:, :, 3], seeds)
             
-            # Convert to PIL Image with transparency
-            img_pil = Image.fromarray(self.img_rgb)
-            alpha_pil = Image.fromarray(alpha_channel)
-            img_pil.putalpha(alpha_pil)
+            # Wrap the buffer as a PIL image without copying it
+            img_pil = Image.frombuffer('RGBA', (rgba.shape[1], rgba.shape[0]), rgba, 'raw', 'RGBA', 0, 1)
             
-            # Save the image with transparency
-            img_pil.save(self.output_path, 'PNG')
+            # Save the image with transparency, lossless WebP if chosen
+            keyed_output.save_image(img_pil, self.output_path)
             
             # Update status
             self.root.after(0, lambda: self.status_bar.config(
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: split/merge channel swap vs. the single-pass permutation.
+
+Each method runs in a fresh child process so the extra peak memory it needs
+can be read from the process high-water mark.
+
+    python benchmarks/bench_channel_swap.py --megapixels 24
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import channel_swap
+
+
+def split_merge(img):
+    r, g, b = img.split()
+    return Image.merge('RGB', (g, r, b))
+
+
+def matrix_convert(img):
+    return channel_swap.permute_channels(img, "RG")
+
+
+def numpy_inplace(arr):
+    return channel_swap.permute_array(arr, "RG")
+
+
+METHODS = {
+    "split_merge": (split_merge, False),
+    "matrix_convert": (matrix_convert, False),
+    "numpy_inplace": (numpy_inplace, True),
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(name, width, height, repeats, queue):
+    func, wants_array = METHODS[name]
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    source = data if wants_array else Image.fromarray(data)
+    if not wants_array:
+        del data
+
+    baseline = _peak_rss_mb()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(source)
+        timings.append(time.perf_counter() - start)
+        del result
+    queue.put((min(timings), _peak_rss_mb() - baseline))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    width = int((args.megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    image_mb = width * height * 3 / (1024 * 1024)
+    print(f"{width}x{height} RGB ({image_mb:.0f} MB of pixels), best of {args.repeats}")
+
+    ctx = multiprocessing.get_context("spawn")
+    for name in METHODS:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(name, width, height, args.repeats, queue))
+        proc.start()
+        seconds, extra_mb = queue.get()
+        proc.join()
+        print(f"{name:16s} {seconds * 1000:8.1f} ms  {width * height / seconds / 1e6:7.1f} MP/s  "
+              f"extra peak {extra_mb:7.1f} MB ({extra_mb / image_mb:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Frames per second of NumPy-to-Tk preview updates at 4K.
+
+Compares the old backgroundCliper path (PIL image -> tobytes -> new Tk
+image), a new ImageTk.PhotoImage per frame, and PreviewRenderer.show_array.
+Needs a display; without one only the CPU-side conversion is timed.
+
+    python benchmarks/bench_display.py --frames 60
+"""
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+
+import numpy as np
+from PIL import Image, ImageTk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from preview_render import PreviewRenderer, new_frame
+
+WIDTH, HEIGHT = 3840, 2160
+
+
+def make_frames(count):
+    # A few distinct frames so nothing can be cached between updates
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8) for _ in range(min(count, 4))]
+
+
+def cpu_only(frames, count):
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(count):
+        Image.fromarray(frames[i % len(frames)]).tobytes()
+    results["fromarray + tobytes"] = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(count):
+        Image.fromarray(frames[i % len(frames)])
+    results["fromarray"] = count / (time.perf_counter() - start)
+
+    frame = new_frame("RGB", (WIDTH, HEIGHT))
+    start = time.perf_counter()
+    for i in range(count):
+        frame.frombytes(frames[i % len(frames)])
+    results["frombytes into reused block"] = count / (time.perf_counter() - start)
+    return results
+
+
+def with_tk(frames, count):
+    root = tk.Tk()
+    label = tk.Label(root)
+    label.pack()
+    results = {}
+
+    def run(name, update):
+        update(frames[0])
+        root.update()
+        start = time.perf_counter()
+        for i in range(count):
+            update(frames[i % len(frames)])
+            root.update_idletasks()
+        results[name] = count / (time.perf_counter() - start)
+
+    def ppm_bytes(arr):
+        # The old path passed raw bytes with no header, which Tk cannot parse;
+        # a PPM header is the minimal fix for a like-for-like comparison
+        header = f"P6 {WIDTH} {HEIGHT} 255 ".encode()
+        photo = tk.PhotoImage(master=root, data=header + Image.fromarray(arr).tobytes(), format="PPM")
+        label.config(image=photo)
+        label.image = photo
+
+    def new_photo(arr):
+        photo = ImageTk.PhotoImage(Image.fromarray(arr))
+        label.config(image=photo)
+        label.image = photo
+
+    renderer = PreviewRenderer(label, max_size=(WIDTH, HEIGHT), refine_delay=None)
+
+    run("tobytes + PPM PhotoImage", ppm_bytes)
+    run("new ImageTk.PhotoImage", new_photo)
+    run("PreviewRenderer.show_array", renderer.show_array)
+    root.destroy()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    frames = make_frames(args.frames)
+    try:
+        results = with_tk(frames, args.frames)
+        print(f"{WIDTH}x{HEIGHT} RGB, {args.frames} frames, display updates:")
+    except tk.TclError as e:
+        print(f"Tk unavailable ({e}); timing CPU-side conversion only")
+        results = cpu_only(frames, args.frames)
+
+    for name, fps in results.items():
+        print(f"{name:32s} {fps:7.1f} fps")
+
+
+if __name__ == "__main__":
+    main()
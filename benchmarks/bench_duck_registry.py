@@ -0,0 +1,94 @@
+"""
+DuckRegistry vs. a plain list of dicts at 1M ducks.
+
+Measures build time and memory (tracemalloc), then the time of "all
+Yellow ducks", "ducks named X" and "count per color" queries.
+
+    python benchmarks/bench_duck_registry.py --ducks 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from duck_registry import DuckRegistry
+
+COLORS = ["Yellow", "Red", "Blue", "Green", "Pink", "Black", "White", "Orange", "Purple", "Brown"]
+
+
+def generate(count):
+    # Colors are built per duck, as json.load does, so none are shared
+    for i in range(count):
+        yield f"Duck{i}", "".join(COLORS[i % len(COLORS)])
+
+
+def make_ducks(count):
+    return [{"name": name, "color": color} for name, color in generate(count)]
+
+
+def build_registry(count):
+    registry = DuckRegistry()
+    for name, color in generate(count):
+        registry.add(name, color)
+    return registry
+
+
+def measure(func):
+    # Timed untraced, then built again under tracemalloc for its size
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, size
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ducks", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    ducks, list_seconds, list_bytes = measure(lambda: make_ducks(args.ducks))
+    registry, registry_seconds, registry_bytes = measure(lambda: build_registry(args.ducks))
+    name = f"Duck{args.ducks // 2}"
+
+    print(f"{args.ducks} ducks")
+    print(f"{'':24s} {'dict list':>12s} {'registry':>12s}")
+    print(f"{'build (s)':24s} {list_seconds:12.3f} {registry_seconds:12.3f}")
+    print(f"{'memory (MB)':24s} {list_bytes / 1e6:12.1f} {registry_bytes / 1e6:12.1f}")
+
+    queries = [
+        ("all Yellow (ms)",
+         lambda: [d for d in ducks if d["color"] == "Yellow"],
+         lambda: registry.by_color("Yellow")),
+        ("by name (ms)",
+         lambda: [d for d in ducks if d["name"] == name],
+         lambda: registry.by_name(name)),
+        ("count per color (ms)",
+         lambda: Counter(d["color"] for d in ducks),
+         lambda: registry.count_per_color()),
+    ]
+    for label, scan, indexed in queries:
+        print(f"{label:24s} {best_of(args.repeat, scan) * 1000:12.3f} "
+              f"{best_of(args.repeat, indexed) * 1000:12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Encode time vs. file size for keyed results, see keyed_output.py.
+
+Keys a synthetic green-screen shot (a noisy, textured subject on a noisy
+screen) and encodes it in memory with each setting.
+
+    python benchmarks/bench_encode.py --megapixels 12
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import keyed_output
+import keying
+
+GREEN = (0, 177, 64)
+
+SETTINGS = [
+    ("PNG level 0", ".png", 0, False, "image"),
+    ("PNG level 1", ".png", 1, False, "image"),
+    ("PNG level 3", ".png", 3, False, "image"),
+    ("PNG level 6 (default)", ".png", 6, False, "image"),
+    ("PNG level 9", ".png", 9, False, "image"),
+    ("PNG optimize", ".png", 9, True, "image"),
+    ("WebP lossless level 1", ".webp", 1, False, "image"),
+    ("WebP lossless level 6", ".webp", 6, False, "image"),
+    ("WebP lossless optimize", ".webp", 9, True, "image"),
+    ("Mask PNG level 1", ".png", 1, False, "mask"),
+    ("Mask PNG level 6", ".png", 6, False, "mask"),
+]
+
+
+def make_keyed(megapixels):
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(0)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = GREEN
+    img += rng.integers(0, 8, img.shape, dtype=np.uint8)
+
+    # Smooth gradients plus grain, closer to a photo than pure noise
+    ys, xs = np.mgrid[0:height // 2, 0:width // 2]
+    subject = np.stack([(xs * 255 // (width // 2)), (ys * 255 // (height // 2)),
+                        np.full_like(xs, 96)], axis=-1).astype(np.uint8)
+    subject += rng.integers(0, 16, subject.shape, dtype=np.uint8)
+    img[height // 4:height // 4 + height // 2, width // 4:width // 4 + width // 2] = subject
+
+    rgba = keying.remove_background_parallel(img, GREEN, 30)
+    return Image.fromarray(rgba)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=12)
+    args = parser.parse_args(argv)
+
+    image = make_keyed(args.megapixels)
+    print(f"{image.width}x{image.height} RGBA ({image.width * image.height / 1e6:.1f} MP)")
+    print(f"{'setting':26s} {'seconds':>8s} {'MB':>8s}")
+    for name, ext, level, optimize, output in SETTINGS:
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        if output == "mask":
+            target = image.getchannel("A")
+        else:
+            target = image
+        target.save(buffer, format=Image.registered_extensions()[ext],
+                    **keyed_output.encoder_options("result" + ext, level, optimize))
+        seconds = time.perf_counter() - start
+        print(f"{name:26s} {seconds:8.2f} {buffer.tell() / 1e6:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Throughput of keying.remove_background_parallel by number of worker threads.
+
+Runs on a synthetic green screen, the single-threaded remove_background is
+timed as the baseline.
+
+    python benchmarks/bench_parallel_keying.py --megapixels 24 --metric rgb
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import keying
+
+GREEN = (0, 177, 64)
+
+
+def make_image(megapixels):
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(0)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = GREEN
+    # Noisy screen with a gray subject in the middle
+    img += rng.integers(0, 12, img.shape, dtype=np.uint8)
+    img[height // 4:3 * height // 4, width // 4:3 * width // 4] = 128
+    return img
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--metric", default="rgb")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    img = make_image(args.megapixels)
+    megapixels = img.shape[0] * img.shape[1] / 1e6
+    out = np.empty(img.shape[:2] + (4,), dtype=np.uint8)
+    print(f"{img.shape[1]}x{img.shape[0]} ({megapixels:.1f} MP), metric {args.metric}, "
+          f"{os.cpu_count()} CPUs")
+
+    seconds = best_of(args.repeat, lambda: keying.remove_background(img, GREEN, 40, args.metric))
+    print(f"{'remove_background':28s} {megapixels / seconds:8.1f} MP/s")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        seconds = best_of(args.repeat, lambda: keying.remove_background_parallel(
+            img, GREEN, 40, args.metric, workers=workers, out=out))
+        print(f"{'parallel, ' + str(workers) + ' worker(s)':28s} {megapixels / seconds:8.1f} MP/s")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
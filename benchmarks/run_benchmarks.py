@@ -0,0 +1,394 @@
+"""
+Benchmark suite for the swap, LUT, keying, preview and display hot paths.
+
+Every case runs on synthetic images (a textured photo and a noisy green
+screen) at each requested size, in a fresh child process so peak RSS
+belongs to that case alone. Results are written as JSON, one record per
+case and size, so runs can be diffed to catch regressions.
+
+Peak RSS is the process high-water mark over the runs, minus the mark
+after the inputs were built (reset through /proc on Linux, elsewhere the
+input build can mask smaller peaks). tracemalloc sees NumPy and Python
+allocations, not Pillow's pixel buffers, which only show up in RSS.
+tracemalloc_retained_blocks counts blocks still alive after one call that
+were not before it (a snapshot diff, so caches filled by the call count),
+not every block the call allocated.
+
+A case that crashes its process, or runs past --timeout, is recorded as
+an error and the suite moves on.
+
+    python benchmarks/run_benchmarks.py --sizes 1 12 48 --output results.json
+    python benchmarks/run_benchmarks.py --cases key.* --sizes 12
+"""
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import PIL
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import channel_swap
+import color_lut
+import keying
+import preview_render
+
+GREEN = (0, 177, 64)
+TOLERANCE = 40
+PREVIEW_SIZE = (700, 400)
+DISPLAY_SIZE = (900, 500)
+
+
+def make_photo(megapixels, seed=0):
+    """Smooth gradients plus grain, 3:2, about megapixels in size."""
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:, :, 0] = xs
+    img[:, :, 1] = ys
+    img[:, :, 2] = (xs + ys) / 2
+    img += rng.integers(0, 24, img.shape, dtype=np.uint8)
+    return img
+
+
+def make_green_screen(megapixels, seed=0):
+    """Noisy, unevenly lit green screen with a photo-like subject in the middle."""
+    img = make_photo(megapixels, seed)
+    height, width = img.shape[:2]
+    rng = np.random.default_rng(seed + 1)
+    subject = img[height // 4:3 * height // 4, width // 4:3 * width // 4].copy()
+
+    # Lighting falls off towards the right, plus per-pixel sensor noise
+    shade = np.linspace(1.0, 0.8, width, dtype=np.float32)[None, :, None]
+    img[:] = (np.asarray(GREEN, dtype=np.float32) * shade).astype(np.uint8)
+    img += rng.integers(0, 16, img.shape, dtype=np.uint8)
+    img[height // 4:3 * height // 4, width // 4:3 * width // 4] = subject
+    return img
+
+
+def _proxy(img, size):
+    import cv2  # As in backgroundCliper.build_proxy
+
+    width, height = preview_render.fit_size((img.shape[1], img.shape[0]), size)
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def setup_permute_channels(megapixels, workdir):
+    image = Image.fromarray(make_photo(megapixels))
+    return lambda: channel_swap.permute_channels(image, "RG")
+
+
+def setup_permute_array(megapixels, workdir):
+    arr = make_photo(megapixels)
+    return lambda: channel_swap.permute_array(arr, "RG")
+
+
+def setup_swap_channels_file(megapixels, workdir):
+    # Uncompressed TIFF keeps the timing about the swap, not zlib
+    input_path = os.path.join(workdir, "input.tif")
+    output_path = os.path.join(workdir, "output.tif")
+    Image.fromarray(make_photo(megapixels)).save(input_path)
+    return lambda: channel_swap.swap_channels(input_path, output_path, "RG")
+
+
+def setup_lut_separable_image(megapixels, workdir):
+    # A swap plus per-channel gains: permutation convert and Image.point
+    image = Image.fromarray(make_photo(megapixels))
+    transform = color_lut.parse_transform("0,1.2,0, 1,0,0, 0,0,0.5")
+    return lambda: transform.apply_image(image)
+
+
+def setup_lut_matrix_image(megapixels, workdir):
+    image = Image.fromarray(make_photo(megapixels))
+    transform = color_lut.preset("SEPIA")
+    return lambda: transform.apply_image(image)
+
+
+def setup_lut_matrix_array(megapixels, workdir):
+    arr = make_photo(megapixels)
+    out = np.empty_like(arr)
+    transform = color_lut.preset("SEPIA")
+    return lambda: transform.apply_array(arr, out=out)
+
+
+def sepia_grid():
+    # SEPIA sampled on the default 33^3 grid, as a 3D .cube LUT would be
+    matrix = np.array(color_lut.MATRIX_PRESETS["SEPIA"], dtype=np.float32)
+    return color_lut.from_function(lambda rgb: rgb @ matrix.T)
+
+
+def setup_lut_3d_image(megapixels, workdir):
+    image = Image.fromarray(make_photo(megapixels))
+    transform = sepia_grid()
+    return lambda: transform.apply_image(image)
+
+
+def setup_lut_3d_array(megapixels, workdir):
+    arr = make_photo(megapixels)
+    out = np.empty_like(arr)
+    transform = sepia_grid()
+    return lambda: transform.apply_array(arr, out=out)
+
+
+def setup_remove_background(megapixels, workdir):
+    img = make_green_screen(megapixels)
+    return lambda: keying.remove_background(img, GREEN, TOLERANCE)
+
+
+def setup_remove_background_parallel(megapixels, workdir):
+    # backgroundCliper.py saves through this path
+    img = make_green_screen(megapixels)
+    out = np.empty(img.shape[:2] + (4,), dtype=np.uint8)
+    return lambda: keying.remove_background_parallel(img, GREEN, TOLERANCE, out=out)
+
+
+def setup_distance_map_alpha(megapixels, workdir):
+    # bg-remover-gui.py keys through a distance map it keeps between tolerances
+    img = make_green_screen(megapixels)
+    return lambda: keying.DistanceMap(img, GREEN).alpha(TOLERANCE)
+
+
+def setup_retune_tolerance(megapixels, workdir):
+    # Moving the tolerance slider only thresholds the cached map
+    distance_map = keying.DistanceMap(make_green_screen(megapixels), GREEN)
+    return lambda: distance_map.alpha(TOLERANCE + 5)
+
+
+def setup_preview_first(megapixels, workdir):
+    # Loading an image and picking a color: proxy, distance map, marked preview
+    import cv2  # noqa: F401, loaded before the RSS baseline
+    img = make_green_screen(megapixels)
+
+    def run():
+        proxy = _proxy(img, PREVIEW_SIZE)
+        mask = keying.DistanceMap(proxy, GREEN).mask(TOLERANCE)
+        preview = proxy.copy()
+        preview[mask] = [255, 0, 255]
+        return preview
+    return run
+
+
+def setup_preview_update(megapixels, workdir):
+    # Dragging the range slider: threshold the cached proxy map and mark it
+    proxy = _proxy(make_green_screen(megapixels), PREVIEW_SIZE)
+    distance_map = keying.DistanceMap(proxy, GREEN)
+
+    def run():
+        preview = proxy.copy()
+        preview[distance_map.mask(TOLERANCE)] = [255, 0, 255]
+        return preview
+    return run
+
+
+def setup_scale_fast(megapixels, workdir):
+    image = Image.fromarray(make_photo(megapixels))
+    size = preview_render.fit_size(image.size, DISPLAY_SIZE)
+    return lambda: preview_render.scale_image(image, size)
+
+
+def setup_scale_final(megapixels, workdir):
+    image = Image.fromarray(make_photo(megapixels))
+    size = preview_render.fit_size(image.size, DISPLAY_SIZE)
+    return lambda: preview_render.scale_image(image, size, final=True)
+
+
+CASES = {
+    "swap.permute_channels": setup_permute_channels,
+    "swap.permute_array": setup_permute_array,
+    "swap.swap_channels_file": setup_swap_channels_file,
+    "lut.separable_image": setup_lut_separable_image,
+    "lut.matrix_image": setup_lut_matrix_image,
+    "lut.matrix_array": setup_lut_matrix_array,
+    "lut.3d_image": setup_lut_3d_image,
+    "lut.3d_array": setup_lut_3d_array,
+    "key.remove_background": setup_remove_background,
+    "key.remove_background_parallel": setup_remove_background_parallel,
+    "key.distance_map_alpha": setup_distance_map_alpha,
+    "key.retune_tolerance": setup_retune_tolerance,
+    "preview.first": setup_preview_first,
+    "preview.update": setup_preview_update,
+    "display.scale_fast": setup_scale_fast,
+    "display.scale_final": setup_scale_final,
+}
+
+
+def _reset_peak_rss():
+    # Linux lets a process reset its own high-water mark, so temporaries
+    # from building the inputs do not hide the peak of the case itself
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case(name, megapixels, repeats, queue):
+    # Runs in a fresh child process
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        func = CASES[name](megapixels, workdir)
+        _reset_peak_rss()
+        baseline = _peak_rss_mb()
+        func()  # Warm up caches and lazy imports
+
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        peak = _peak_rss_mb()
+
+        # Separate, untimed run: tracing slows allocations down
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = func()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        del result
+        retained = sum(max(0, stat.count_diff) for stat in after.compare_to(before, "lineno"))
+
+        best = min(timings)
+        queue.put({
+            "seconds": best,
+            "mean_seconds": sum(timings) / len(timings),
+            "megapixels_per_second": megapixels / best,
+            "peak_rss_mb": peak,
+            "extra_rss_mb": peak - baseline,
+            "tracemalloc_peak_mb": traced_peak / (1024 * 1024),
+            "tracemalloc_retained_blocks": retained,
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _wait_for_record(proc, queue, timeout=None):
+    # Poll rather than block, so a child that dies without reporting (a
+    # segfault, the OOM killer) or hangs cannot stall the whole suite
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            pass
+        if not proc.is_alive():
+            # It may have reported just before exiting
+            try:
+                return queue.get(timeout=1)
+            except queue_module.Empty:
+                return {"error": f"process exited with code {proc.exitcode} without a result"}
+        if deadline is not None and time.monotonic() > deadline:
+            proc.terminate()
+            return {"error": f"timed out after {timeout:g} s"}
+
+
+def run(cases, sizes, repeats, timeout=None):
+    """
+    Run every case at every size, each in its own process.
+
+    Args:
+        cases (list): Names in CASES
+        sizes (list): Image sizes in megapixels
+        repeats (int): Timed runs per case
+        timeout (float, optional): Seconds before a case is stopped
+
+    Returns:
+        dict: {"meta": {...}, "results": [record, ...]}
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for megapixels in sizes:
+        for name in cases:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run_case, args=(name, megapixels, repeats, queue))
+            proc.start()
+            record = _wait_for_record(proc, queue, timeout)
+            proc.join()
+            record = {"case": name, "megapixels": megapixels, **record}
+            results.append(record)
+            if "error" in record:
+                print(f"{name:32s} {megapixels:5g} MP  FAILED {record['error']}", file=sys.stderr)
+            else:
+                print(f"{name:32s} {megapixels:5g} MP  {record['seconds'] * 1000:9.1f} ms  "
+                      f"{record['megapixels_per_second']:8.1f} MP/s  "
+                      f"+{record['extra_rss_mb']:7.1f} MB RSS", file=sys.stderr)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": repeats,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 12, 48],
+                        help="Image sizes in megapixels (default: 1 12 48)")
+    parser.add_argument("--cases", nargs="+", default=["*"],
+                        help="Case names or glob patterns (default: all)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case, best is reported")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds before a case is stopped and recorded as failed (default: none)")
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    cases = [name for name in CASES if any(fnmatch.fnmatch(name, p) for p in args.cases)]
+    if not cases:
+        print("No cases match.", file=sys.stderr)
+        return 2
+
+    report = run(cases, args.sizes, args.repeats, args.timeout)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any("error" in record for record in report["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,17 @@
 import tkinter as tk
 from tkinter import filedialog, ttk, colorchooser
-from PIL import Image, ImageTk
+from PIL import Image
 import numpy as np
 import os
 import sys
 
+import color_metrics
+import image_cache
+import keyed_output
+import keying
+from preview_render import PreviewRenderer
+from preview_scheduler import PreviewScheduler
+
 class BackgroundRemoverApp:
     def __init__(self, root):
         self.root = root
@@ -15,6 +22,15 @@ class BackgroundRemoverApp:
         self.input_path = None
         self.output_path = None
         self.image = None
+        self.image_array = None
+        self.distance_map = None
+        self.color_spaces = None
+        self.metric = "rgb"
+        self.extra_keys = []
+        self.keys_mask = None
+        self.seed = None
+        self.key_seeds = []
+        self.suggested_tolerance = None
         self.display_image = None
         self.tk_image = None
         self.original_size = (0, 0)
@@ -23,10 +39,18 @@ class BackgroundRemoverApp:
         self.result_image = None
         self.picking_color = False
         self.preview_displayed = False
+        self.stats_pending = False
+        self.preview_pending = False
+        self.save_pending = False
         
         # Create UI
         self.create_ui()
         
+        # Removal stats need the full-size distance map, which is built on a
+        # worker so large images do not freeze the window
+        self.stats_scheduler = PreviewScheduler(
+            self.root, self.compute_removal_stats, self.show_removal_stats, self.removal_stats_failed)
+        
         # Initial state
         self.update_ui_state()
     
@@ -62,10 +86,23 @@ class BackgroundRemoverApp:
         self.color_label = ttk.Label(color_frame, text="RGB: (0, 255, 0)")
         self.color_label.pack(side=tk.LEFT, padx=5)
         
+        # Extra key colors, removed together with the selected one
+        ttk.Button(color_frame, text="Add Key", command=self.add_key).pack(side=tk.LEFT, padx=5)
+        ttk.Button(color_frame, text="Clear Keys", command=self.clear_keys).pack(side=tk.LEFT, padx=5)
+        
+        self.keys_label = ttk.Label(color_frame, text="")
+        self.keys_label.pack(side=tk.LEFT, padx=5)
+        
         # Tolerance slider
         tolerance_frame = ttk.LabelFrame(control_frame, text="Color Tolerance", padding=5)
         tolerance_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
         
+        self.metric_var = tk.StringVar(value=color_metrics.METRICS[self.metric])
+        metric_box = ttk.Combobox(tolerance_frame, textvariable=self.metric_var,
+                                  values=list(color_metrics.METRICS.values()), state="readonly", width=16)
+        metric_box.bind("<<ComboboxSelected>>", self.update_metric)
+        metric_box.pack(side=tk.LEFT, padx=5)
+        
         self.tolerance_slider = ttk.Scale(tolerance_frame, from_=0, to=255, orient=tk.HORIZONTAL, 
                                          value=30, command=self.update_tolerance)
         self.tolerance_slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
@@ -73,6 +110,30 @@ class BackgroundRemoverApp:
         self.tolerance_label = ttk.Label(tolerance_frame, text="30")
         self.tolerance_label.pack(side=tk.LEFT, padx=5)
         
+        # Live readout of how much the current tolerance keys out
+        self.removed_label = ttk.Label(tolerance_frame, text="", width=32)
+        self.removed_label.pack(side=tk.LEFT, padx=5)
+        
+        self.suggest_button = ttk.Button(tolerance_frame, text="Use Suggested",
+                                         command=self.apply_suggested_tolerance)
+        self.suggest_button.pack(side=tk.LEFT, padx=5)
+        
+        # Soft keying: alpha ramps from the tolerance to tolerance + feather
+        edge_frame = ttk.LabelFrame(control_frame, text="Edges", padding=5)
+        edge_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
+        
+        ttk.Label(edge_frame, text="Feather:").pack(side=tk.LEFT, padx=5)
+        self.feather_var = tk.IntVar(value=0)
+        ttk.Spinbox(edge_frame, from_=0, to=100, width=5, textvariable=self.feather_var).pack(side=tk.LEFT, padx=5)
+        
+        self.edges_only_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(edge_frame, text="Only near edges", variable=self.edges_only_var).pack(side=tk.LEFT, padx=5)
+        
+        # Flood fill mode: only the region connected to the picked pixel(s) is removed
+        self.contiguous_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(edge_frame, text="Only region connected to picked point",
+                        variable=self.contiguous_var).pack(side=tk.LEFT, padx=5)
+        
         # Processing buttons
         process_frame = ttk.Frame(control_frame)
         process_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
@@ -83,6 +144,15 @@ class BackgroundRemoverApp:
         self.save_button = ttk.Button(process_frame, text="Save Result", command=self.save_result)
         self.save_button.pack(side=tk.LEFT, padx=5)
         
+        # What to save and how hard to compress it (0 = fastest, 9 = smallest)
+        self.save_output_var = tk.StringVar(value="image")
+        ttk.Combobox(process_frame, textvariable=self.save_output_var, values=keyed_output.OUTPUT_MODES,
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(process_frame, text="Compression:").pack(side=tk.LEFT, padx=5)
+        self.compress_var = tk.IntVar(value=keyed_output.DEFAULT_COMPRESS_LEVEL)
+        ttk.Spinbox(process_frame, from_=0, to=9, width=3, textvariable=self.compress_var).pack(side=tk.LEFT, padx=5)
+        
         self.status_label = ttk.Label(process_frame, text="")
         self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
@@ -110,6 +180,7 @@ class BackgroundRemoverApp:
         self.display_label = ttk.Label(self.image_frame)
         self.display_label.pack()
         self.display_label.bind("<Button-1>", self.on_image_click)
+        self.renderer = PreviewRenderer(self.display_label)
         
     def update_ui_state(self):
         # Update UI based on current state
@@ -119,6 +190,7 @@ class BackgroundRemoverApp:
         self.color_button["state"] = "normal" if has_image else "disabled"
         self.preview_button["state"] = "normal" if has_image else "disabled"
         self.save_button["state"] = "normal" if self.result_image is not None else "disabled"
+        self.suggest_button["state"] = "normal" if self.stats_ready() else "disabled"
     
     def open_image(self):
         # Open file dialog
@@ -145,14 +217,23 @@ class BackgroundRemoverApp:
             # Reset state
             self.result_image = None
             self.preview_displayed = False
+            self.preview_pending = False
+            self.save_pending = False
             
-            # Load image
-            self.image = Image.open(file_path).convert("RGBA")
+            # Load image (decodes are cached, reopening a file is instant)
+            self.image, self.image_array = image_cache.load_image_and_array(file_path, "RGBA")
+            self.distance_map = None
+            self.seed = None
+            # Keys and seeds were picked on the previous image
+            self.clear_keys()
+            self.color_spaces = color_metrics.ColorSpaceCache(self.image_array)
             self.original_size = self.image.size
             
             # Display image (resize if too large)
-            self.display_image = self.image.copy()
+            self.renderer.clear_cache()
+            self.display_image = self.image
             self.update_image_display()
+            self.update_removal_stats()
             
             # Update UI state
             self.status_label.config(text=f"Image loaded: {self.original_size[0]}x{self.original_size[1]} pixels")
@@ -163,22 +244,10 @@ class BackgroundRemoverApp:
     
     def update_image_display(self):
         if self.display_image:
-            # Resize for display if needed
-            max_width = 900
-            max_height = 500
-            
-            width, height = self.display_image.size
-            ratio = min(max_width/width, max_height/height)
-            
-            if ratio < 1:
-                new_size = (int(width * ratio), int(height * ratio))
-                display_img = self.display_image.resize(new_size, Image.LANCZOS)
-            else:
-                display_img = self.display_image
-            
-            # Create Tkinter-compatible image
-            self.tk_image = ImageTk.PhotoImage(display_img)
-            self.display_label.config(image=self.tk_image)
+            # Scaled copies are cached per image; interactive refreshes use a
+            # cheap filter and are refined with LANCZOS once idle
+            self.renderer.show(self.display_image, (900, 500))
+            self.tk_image = self.renderer.photo
             
             # Update canvas scrolling region
             self.image_frame.update_idletasks()
@@ -222,9 +291,10 @@ class BackgroundRemoverApp:
         orig_x = min(max(0, orig_x), orig_width - 1)
         orig_y = min(max(0, orig_y), orig_height - 1)
         
-        # Get pixel color (convert to RGB to ensure consistent format)
-        pixel = self.image.convert("RGB").getpixel((orig_x, orig_y))
+        # Get pixel color from the decoded array (RGB only, alpha dropped)
+        pixel = tuple(int(v) for v in self.image_array[orig_y, orig_x, :3])
         self.selected_color = pixel
+        self.seed = (orig_x, orig_y)
         
         # Update UI
         hex_color = f"#{pixel[0]:02x}{pixel[1]:02x}{pixel[2]:02x}"
@@ -234,6 +304,7 @@ class BackgroundRemoverApp:
         self.status_label.config(text=f"Color selected at ({orig_x}, {orig_y}): RGB{pixel}")
         self.picking_color = False
         self.color_button.config(text="Pick Color from Image")
+        self.update_removal_stats()
     
     def choose_color(self):
         # Open color chooser dialog
@@ -244,39 +315,135 @@ class BackgroundRemoverApp:
         
         if color[0]:  # If a color was selected (not canceled)
             self.selected_color = (int(color[0][0]), int(color[0][1]), int(color[0][2]))
+            self.seed = None  # Not picked from the image, nothing to flood from
             self.color_preview.config(bg=color[1])
             self.color_label.config(text=f"RGB: {self.selected_color}")
+            self.update_removal_stats()
+    
+    def add_key(self):
+        # Keep the current color and tolerance as an extra key
+        self.extra_keys.append((tuple(self.selected_color), self.tolerance))
+        if self.seed is not None:
+            self.key_seeds.append(self.seed)
+        self.keys_label.config(text=f"+{len(self.extra_keys)} key(s)")
+        self.status_label.config(text="Key added, pick the next background color")
+    
+    def clear_keys(self):
+        self.extra_keys = []
+        self.keys_mask = None
+        self.key_seeds = []
+        self.keys_label.config(text="")
     
     def update_tolerance(self, value):
         self.tolerance = int(float(value))
         self.tolerance_label.config(text=str(self.tolerance))
+        self.update_removed_label()
+    
+    def update_metric(self, event=None):
+        label = self.metric_var.get()
+        self.metric = next(key for key, value in color_metrics.METRICS.items() if value == label)
+        self.update_removal_stats()
+    
+    def update_removal_stats(self):
+        # Build (or reuse) the distance map for the selected color on the
+        # worker; its histogram answers "how much would tolerance T remove"
+        if self.image_array is None:
+            return
+        
+        self.removed_label.config(text="Measuring...")
+        self.stats_pending = True
+        self.update_ui_state()
+        self.stats_scheduler.request(self.image_array, tuple(self.selected_color), self.metric,
+                                     self.color_spaces, self.distance_map)
+    
+    def compute_removal_stats(self, image_array, color, metric, color_spaces, distance_map):
+        # Runs on the worker thread, must not touch Tk widgets
+        distance_map = keying.cached_distance_map(distance_map, image_array, color, metric, color_spaces)
+        return distance_map, distance_map.suggest_range()
+    
+    def show_removal_stats(self, result):
+        # Only the result of the latest request arrives here, on the Tk thread
+        self.distance_map, self.suggested_tolerance = result
+        self.stats_pending = False
+        self.update_removed_label()
+        self.update_ui_state()
+        
+        # Finish a preview (and save) that was waiting for the map
+        if self.preview_pending:
+            self.preview_pending = False
+            self.preview_result()
+            if self.save_pending and not self.preview_pending:
+                self.save_pending = False
+                self.save_result()
+    
+    def removal_stats_failed(self, error):
+        self.stats_pending = False
+        self.removed_label.config(text=f"Error: {error}")
+        if self.preview_pending:
+            self.preview_pending = False
+            self.save_pending = False
+            self.status_label.config(text=f"Error processing image: {error}")
+    
+    def stats_ready(self):
+        # The cached map may still be for the previous color or image
+        return (self.distance_map is not None
+                and self.distance_map.matches(self.image_array, self.selected_color, self.metric))
+    
+    def update_removed_label(self):
+        if not self.stats_ready():
+            return
+        
+        removed = self.distance_map.removed_fraction(self.tolerance) * 100
+        self.removed_label.config(
+            text=f"{removed:.1f}% removed (suggested: {self.suggested_tolerance})"
+        )
+    
+    def apply_suggested_tolerance(self):
+        if not self.stats_ready():
+            return
+        
+        self.tolerance_slider.set(self.suggested_tolerance)
+        self.update_tolerance(self.suggested_tolerance)
     
     def remove_background(self):
         if not self.image:
             return None
         
         try:
-            # Convert image to numpy array for faster processing
-            data = np.array(self.image)
-            
-            # Extract RGB components from data
-            r, g, b, a = data[:, :, 0], data[:, :, 1], data[:, :, 2], data[:, :, 3]
+            # The map comes from the stats worker (preview_result waits for
+            # it), so a new tolerance is just a threshold on the Tk thread
+            data = self.image_array.copy()
+            alpha = data[:, :, 3]
             
-            # Extract target color components
-            target_r, target_g, target_b = self.selected_color
+            # Set alpha channel to 0 (transparent) where the color is within
+            # tolerance, feathered up to tolerance + feather if requested
+            try:
+                feather = max(0, int(self.feather_var.get()))
+            except (tk.TclError, ValueError):
+                feather = 0
+            if feather == 0:
+                alpha = self.distance_map.alpha(self.tolerance, alpha)
+            elif self.edges_only_var.get():
+                alpha = self.distance_map.refined_alpha(self.tolerance, self.tolerance + feather, alpha=alpha)
+            else:
+                alpha = self.distance_map.soft_alpha(self.tolerance, self.tolerance + feather, alpha)
             
-            # Calculate Euclidean distance
-            distance = np.sqrt(
-                (r.astype(np.int16) - target_r) ** 2 +
-                (g.astype(np.int16) - target_g) ** 2 +
-                (b.astype(np.int16) - target_b) ** 2
-            )
+            # Extra keys are combined in one pass and cached until they change;
+            # loading an image or clearing the keys drops the cache
+            if self.extra_keys:
+                cache_key = (self.metric, tuple(self.extra_keys))
+                if self.keys_mask is None or self.keys_mask[0] != cache_key:
+                    self.keys_mask = (cache_key, keying.multi_key_mask(
+                        self.image_array, self.extra_keys, self.metric))
+                alpha[self.keys_mask[1]] = 0
             
-            # Create mask where distance is within tolerance
-            mask = distance <= self.tolerance
+            # Flood fill mode: restore keyed pixels not connected to a picked
+            # point. A color from the chooser has no point, so it keys globally
+            seeds = self.flood_seeds()
+            if seeds:
+                alpha = keying.contiguous_alpha(alpha, seeds, self.image_array[:, :, 3])
             
-            # Set alpha channel to 0 (transparent) where mask is True
-            data[:, :, 3] = np.where(mask, 0, a)
+            data[:, :, 3] = alpha
             
             # Create a new image from the modified array
             return Image.fromarray(data)
@@ -285,10 +452,26 @@ class BackgroundRemoverApp:
             self.status_label.config(text=f"Error processing image: {str(e)}")
             return None
     
+    def flood_seeds(self):
+        # Picked points for connected mode, empty when it is off
+        if not self.contiguous_var.get():
+            return []
+        return self.key_seeds + ([self.seed] if self.seed is not None else [])
+    
     def preview_result(self):
         if not self.image:
             return
         
+        # The distance map is built on the stats worker; until it matches the
+        # current image, color and metric, wait for it instead of building a
+        # second one here and freezing the window
+        if not self.stats_ready():
+            self.preview_pending = True
+            self.status_label.config(text="Measuring colors for the preview...")
+            if not self.stats_pending:
+                self.update_removal_stats()
+            return
+        
         # Process the image
         self.result_image = self.remove_background()
         
@@ -297,7 +480,11 @@ class BackgroundRemoverApp:
             self.display_image = self.result_image
             self.update_image_display()
             self.preview_displayed = True
-            self.status_label.config(text="Preview generated - click 'Save Result' to save")
+            if self.contiguous_var.get() and not self.flood_seeds():
+                self.status_label.config(text="Preview generated - no point picked, so the whole "
+                                              "image was keyed; pick one for connected only")
+            else:
+                self.status_label.config(text="Preview generated - click 'Save Result' to save")
             self.update_ui_state()
         else:
             self.status_label.config(text="Error generating preview")
@@ -307,6 +494,10 @@ class BackgroundRemoverApp:
             if not self.preview_displayed:
                 self.preview_result()
             
+            if self.preview_pending:
+                # Saved once the preview waiting for the distance map is done
+                self.save_pending = True
+                return
             if not self.result_image:
                 return
         
@@ -314,16 +505,21 @@ class BackgroundRemoverApp:
         file_path = filedialog.asksaveasfilename(
             title="Save Result",
             defaultextension=".png",
-            filetypes=[("PNG files", "*.png")]
+            filetypes=[("PNG files", "*.png"), ("WebP files (lossless)", "*.webp")]
         )
         
         if not file_path:
             return
         
         try:
-            # Save the result
-            self.result_image.save(file_path, "PNG")
-            self.status_label.config(text=f"Result saved to {os.path.basename(file_path)}")
+            # Save the result, as an image, its alpha mask, or both
+            try:
+                compress_level = min(9, max(0, int(self.compress_var.get())))
+            except (tk.TclError, ValueError):
+                compress_level = keyed_output.DEFAULT_COMPRESS_LEVEL
+            saved = keyed_output.save_keyed(self.result_image, file_path, self.save_output_var.get(),
+                                            compress_level)
+            self.status_label.config(text=f"Result saved to {', '.join(map(os.path.basename, saved))}")
         except Exception as e:
             self.status_label.config(text=f"Error saving file: {str(e)}")
 
@@ -0,0 +1,411 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import channel_swap
+import color_metrics
+import keyed_output
+import keying
+import tiled
+
+# Output format name -> file extension
+OUTPUT_FORMATS = {
+    "png": ".png",
+    "webp": ".webp",
+    "tiff": ".tif",
+}
+
+
+def parse_color(value):
+    """
+    Parse a key color given as #RRGGBB, RRGGBB or R,G,B.
+
+    Returns:
+        tuple: (R, G, B) ints in 0-255
+    """
+    text = value.strip()
+    try:
+        if "," in text:
+            color = tuple(int(part) for part in text.split(","))
+        else:
+            text = text.lstrip("#")
+            if len(text) != 6:
+                raise ValueError(value)
+            color = tuple(int(text[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid color: {value} (use #RRGGBB or R,G,B)")
+    if len(color) != 3 or not all(0 <= c <= 255 for c in color):
+        raise argparse.ArgumentTypeError(f"Invalid color: {value} (use #RRGGBB or R,G,B)")
+    return color
+
+
+# Options that do not change the written pixels or encoding
+_UNRECORDED_OPTIONS = ("strip_rows",)
+
+
+def output_path_for(input_path, output_dir, output_format, output="image", relative_path=None):
+    """
+    Build the output path: <name>_nobg.<format extension> in output_dir, or
+    <name>_nobg_mask.png (.tif for tiff) when only the mask is written.
+
+    With relative_path (see channel_swap.relative_input_path) the input's
+    subdirectories are mirrored under output_dir.
+    """
+    file_name = os.path.splitext(os.path.basename(input_path))[0]
+    subdir = os.path.dirname(relative_path) if relative_path else ""
+    path = os.path.join(output_dir, subdir, f"{file_name}_nobg{OUTPUT_FORMATS[output_format]}")
+    return keyed_output.mask_path_for(path) if output == "mask" else path
+
+
+def output_paths_for(output_path, output="image"):
+    """Every file written for output_path, the mask too for output="both"."""
+    if output == "both":
+        return [output_path, keyed_output.mask_path_for(output_path)]
+    return [output_path]
+
+
+def settings_path_for(output_path):
+    """Hidden sidecar next to an output that records the settings it was made with."""
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.bg_remove.json")
+
+
+def recorded_settings(options):
+    """The options that define an output, in the form stored in its sidecar."""
+    settings = {key: value for key, value in options.items() if key not in _UNRECORDED_OPTIONS}
+    # Through JSON and back, so tuples compare equal to the stored lists
+    return json.loads(json.dumps(settings, sort_keys=True))
+
+
+def read_settings(output_path):
+    try:
+        with open(settings_path_for(output_path), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_settings(output_path, options):
+    def save(path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(recorded_settings(options), file, sort_keys=True)
+    write_atomic(settings_path_for(output_path), save)
+
+
+def is_up_to_date(input_path, output_path, options=None):
+    """
+    True when output_path exists and is not older than input_path, and,
+    if options are given, was written with the same settings.
+    """
+    try:
+        if os.stat(output_path).st_mtime_ns < os.stat(input_path).st_mtime_ns:
+            return False
+    except OSError:
+        return False
+    return options is None or read_settings(output_path) == recorded_settings(options)
+
+
+def atomic_output(output_path):
+    """
+    Temporary path next to output_path to write to before os.replace.
+
+    The name is hidden and keeps the extension, so writers that pick the
+    format from the extension still work and watchers never see a partial
+    file under the final name.
+    """
+    directory, name = os.path.split(output_path)
+    # A worker process writes one file at a time, so the pid makes it unique
+    return os.path.join(directory, f".{name}.{os.getpid()}.part{os.path.splitext(name)[1]}")
+
+
+def write_atomic(output_path, save):
+    """
+    Call save(path) on a temporary path, then move it over output_path.
+    """
+    temp_path = atomic_output(output_path)
+    try:
+        save(temp_path)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def remove_background_file(input_path, output_path, target_color, color_range, metric="rgb",
+                           feather=0, strip_rows=None, output="image",
+                           compress_level=keyed_output.DEFAULT_COMPRESS_LEVEL, optimize=False):
+    """
+    Key one image file and write the result atomically.
+
+    Every output is written to a temporary file in the same directory and
+    moved over its final path with os.replace, so readers only ever see
+    complete files.
+
+    Args:
+        input_path (str): Image to key
+        output_path (str): Destination, the format follows its extension
+        target_color (tuple): Key color (R, G, B)
+        color_range (float): Maximum distance that is keyed out
+        metric (str): Distance metric, see color_metrics.METRICS
+        feather (float): Width of the soft edge after color_range, 0 for hard
+        strip_rows (int, optional): Stream the image in strips of this many
+            rows (PNG/TIFF output, "image" or "mask" only)
+        output (str): "image", "mask" (output_path is then the mask) or
+            "both" (the mask goes to keyed_output.mask_path_for)
+        compress_level (int): Encoder effort, 0 (fastest) to 9 (smallest)
+        optimize (bool): Spend extra encode time for the smallest file
+    """
+    if strip_rows:
+        if output == "both":
+            raise ValueError("Strip mode writes either the image or the mask")
+        channels = 1 if output == "mask" else 4
+
+        def transform(strip):
+            rgba = keying.remove_background_parallel(
+                strip, target_color, color_range, metric, feather=feather, workers=1)
+            return rgba[:, :, 3:] if channels == 1 else rgba
+
+        write_atomic(output_path, lambda path: tiled.process_strips(
+            input_path, path, transform, channels, strip_rows, compress_level))
+        return
+
+    img = Image.open(input_path)
+    # Palette and color-key transparency ("transparency" info) become alpha too
+    has_alpha = "A" in img.getbands() or "transparency" in img.info
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    # One thread per file, the batch is parallel across processes
+    rgba = keying.remove_background_parallel(
+        np.asarray(img), target_color, color_range, metric, feather=feather, workers=1)
+    result = Image.frombuffer("RGBA", img.size, rgba, "raw", "RGBA", 0, 1)
+
+    if output != "mask":
+        write_atomic(output_path, lambda path: keyed_output.save_image(
+            result, path, compress_level, optimize))
+    if output != "image":
+        mask_path = output_path if output == "mask" else keyed_output.mask_path_for(output_path)
+        write_atomic(mask_path, lambda path: keyed_output.save_mask(
+            result, path, compress_level, optimize))
+
+
+def _remove_job(job):
+    # Runs in a worker process; errors are returned, never raised, so one
+    # bad file cannot take down the whole batch
+    input_path, output_path, options = job
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        remove_background_file(input_path, output_path, **options)
+        # Recorded last, an interrupted job is redone on the next run
+        write_settings(output_path, options)
+        return input_path, output_path, None
+    except Exception as e:
+        return input_path, output_path, f"{type(e).__name__}: {e}"
+
+
+def _init_worker():
+    # Ctrl+C is handled by the parent, which shuts the pool down cleanly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def plan_jobs(input_paths, output_dir, output_format, options, force=False, patterns=None):
+    """
+    Pair inputs with their outputs, dropping those that are up to date.
+
+    An output is up to date when it is newer than its input and its sidecar
+    records the same options, so rerunning with another color, tolerance,
+    metric, feather or encoder setting redoes every file.
+
+    Args:
+        patterns (list, optional): The arguments input_paths were collected
+            from; their subdirectories are mirrored under output_dir
+
+    Returns:
+        tuple: (jobs, skipped) where jobs are (input, output, options)
+    """
+    jobs, skipped = [], []
+    output = options.get("output", "image")
+    for path in input_paths:
+        relative_path = channel_swap.relative_input_path(path, patterns) if patterns else None
+        output_path = output_path_for(path, output_dir, output_format, output, relative_path)
+        targets = output_paths_for(output_path, output)
+        if not force and all(is_up_to_date(path, target) for target in targets) \
+                and is_up_to_date(path, output_path, options):
+            skipped.append(path)
+        else:
+            jobs.append((path, output_path, options))
+    return jobs, skipped
+
+
+def run_jobs(jobs, executor=None, workers=1):
+    """
+    Run jobs in the executor (or inline when None) with workers processes.
+
+    Yields:
+        tuple: (input_path, output_path, error) per file, error is None on
+        success
+    """
+    if not jobs:
+        return
+    if executor is None:
+        yield from map(_remove_job, jobs)
+        return
+
+    # Hand out several files per task to keep IPC overhead low on big batches
+    chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+    yield from executor.map(_remove_job, jobs, chunksize=chunksize)
+
+
+def collect_watch_inputs(patterns, recursive, output_dir):
+    # Never pick up our own results (anywhere under the output dir) or
+    # temporary files
+    output_dir = os.path.abspath(output_dir)
+    return [
+        path for path in channel_swap.collect_inputs(patterns, recursive)
+        if not os.path.basename(path).startswith(".")
+        and os.path.commonpath([output_dir, os.path.abspath(path)]) != output_dir
+    ]
+
+
+def watch(patterns, output_dir, output_format, options, executor, workers=1, recursive=False,
+          interval=2.0, report=None):
+    """
+    Poll the inputs and key every new or changed file until interrupted.
+
+    A file is only processed once its size and mtime are unchanged between
+    two polls, so files that are still being copied in are left alone.
+    Files that failed are retried only after they change.
+    """
+    last_seen = {}
+    failed = {}
+    print(f"Watching {', '.join(patterns)} every {interval:g}s, Ctrl+C to stop.")
+    try:
+        while True:
+            seen = {}
+            stable = []
+            for path in collect_watch_inputs(patterns, recursive, output_dir):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen[path] = (stat.st_size, stat.st_mtime_ns)
+                if last_seen.get(path) == seen[path] and failed.get(path) != seen[path]:
+                    stable.append(path)
+            last_seen = seen
+
+            jobs, _ = plan_jobs(stable, output_dir, output_format, options, patterns=patterns)
+            for input_path, output_path, error in run_jobs(jobs, executor, workers):
+                log_result(input_path, output_path, error, report)
+                if error:
+                    failed[input_path] = seen[input_path]
+                else:
+                    failed.pop(input_path, None)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+
+def log_result(input_path, output_path, error, report=None):
+    if error:
+        print(f"FAILED {input_path}: {error}", file=sys.stderr)
+    else:
+        print(f"{input_path} -> {output_path}")
+    if report:
+        report.write(f"{input_path}\t{output_path}\t{'error' if error else 'ok'}\t{error or ''}\n")
+        report.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove a solid background color from images in bulk.")
+    parser.add_argument("inputs", nargs="+", help="Image files, glob patterns or directories")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory to write results to")
+    parser.add_argument("-c", "--color", type=parse_color, default=(0, 255, 0),
+                        help="Key color as #RRGGBB or R,G,B (default: #00FF00)")
+    parser.add_argument("-t", "--tolerance", type=float, default=30,
+                        help="Maximum color distance that is removed (default: 30)")
+    parser.add_argument("-m", "--metric", default="rgb", choices=list(color_metrics.METRICS),
+                        help="Color distance metric (default: rgb)")
+    parser.add_argument("--feather", type=float, default=0,
+                        help="Soften edges over this much extra distance (default: 0, hard)")
+    parser.add_argument("-f", "--format", default="png", choices=list(OUTPUT_FORMATS),
+                        help="Output format (default: png)")
+    parser.add_argument("--output", default="image", choices=keyed_output.OUTPUT_MODES,
+                        help="Write the RGBA image, only the alpha mask, or both (default: image)")
+    parser.add_argument("--compress-level", type=int, default=keyed_output.DEFAULT_COMPRESS_LEVEL,
+                        choices=range(10), metavar="0-9",
+                        help="Encoder effort, 0 is fastest, 9 smallest (default: 6)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Spend extra encode time for the smallest files")
+    parser.add_argument("-j", "--workers", type=channel_swap.positive_int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Descend into subdirectories")
+    parser.add_argument("--force", action="store_true",
+                        help="Process files even if their output is newer and was made "
+                             "with the same settings")
+    parser.add_argument("--strip-rows", type=channel_swap.positive_int, default=None,
+                        help="Process images in strips of this many rows to bound memory "
+                             "(png/tiff only)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process new or changed files as they appear")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="Seconds between polls in --watch mode (default: 2)")
+    parser.add_argument("--report", help="Write a tab-separated per-file report to this path")
+    args = parser.parse_args(argv)
+
+    if args.strip_rows and args.format == "webp":
+        parser.error("--strip-rows writes png or tiff only")
+    if args.strip_rows and args.output == "both":
+        parser.error("--strip-rows writes either the image or the mask")
+
+    options = {
+        "target_color": args.color,
+        "color_range": args.tolerance,
+        "metric": args.metric,
+        "feather": args.feather,
+        "strip_rows": args.strip_rows,
+        "output": args.output,
+        "compress_level": args.compress_level,
+        "optimize": args.optimize,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    workers = args.workers or os.cpu_count() or 1
+
+    report = open(args.report, "w") if args.report else None
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    try:
+        if args.watch:
+            watch(args.inputs, args.output_dir, args.format, options, executor, workers,
+                  args.recursive, args.interval, report)
+            return 0
+
+        input_paths = collect_watch_inputs(args.inputs, args.recursive, args.output_dir)
+        if not input_paths:
+            print("No input images found.", file=sys.stderr)
+            return 2
+
+        jobs, skipped = plan_jobs(input_paths, args.output_dir, args.format, options, args.force,
+                                  args.inputs)
+        failed = 0
+        for input_path, output_path, error in run_jobs(jobs, executor, workers):
+            failed += bool(error)
+            log_result(input_path, output_path, error, report)
+    finally:
+        if executor:
+            executor.shutdown()
+        if report:
+            report.close()
+
+    print(f"Processed {len(jobs) - failed}/{len(jobs)} images ({failed} failed, "
+          f"{len(skipped)} up to date).")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
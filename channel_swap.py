@@ -0,0 +1,280 @@
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import tiled
+
+SWAP_OPTIONS = ["RG", "RB", "GB"]
+CHANNEL_ORDERS = ["RGB", "RBG", "GRB", "GBR", "BRG", "BGR"]
+
+# Two-channel swap options expressed as full output channel orders
+SWAP_PRESETS = {"RG": "GRB", "RB": "BGR", "GB": "RBG"}
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+
+
+def channel_indices(order):
+    """
+    Resolve a swap option (RG, RB, GB) or channel order (e.g. BRG) to the
+    source channel index of each output channel.
+    """
+    order = SWAP_PRESETS.get(order, order)
+    if order not in CHANNEL_ORDERS:
+        raise ValueError(f"Invalid swap option: {order}")
+    return tuple("RGB".index(channel) for channel in order)
+
+
+def permute_channels(img, order):
+    """
+    Reorder the channels of a PIL image in a single pass.
+
+    This uses a permutation-matrix convert, so no planar copies are made the
+    way img.split() followed by Image.merge() does.
+
+    Args:
+        img (PIL.Image.Image): Input image, converted to RGB if needed
+        order (str): Swap option (RG, RB, GB) or channel order (e.g. BRG)
+
+    Returns:
+        PIL.Image.Image: New RGB image with the channels reordered
+    """
+    indices = channel_indices(order)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    matrix = []
+    for source in indices:
+        row = [0, 0, 0, 0]
+        row[source] = 1
+        matrix.extend(row)
+    return img.convert('RGB', tuple(matrix))
+
+
+def permute_array(arr, order, band_rows=256):
+    """
+    Reorder the RGB channels of an HxWx3 or HxWx4 array in place.
+
+    Work is done in bands of rows, so the only temporary is one band's worth
+    of pixels. Any alpha channel is left untouched.
+
+    Returns:
+        np.ndarray: The same array, for chaining
+    """
+    indices = list(channel_indices(order))
+    if indices == [0, 1, 2]:
+        return arr
+
+    for top in range(0, arr.shape[0], band_rows):
+        band = arr[top:top + band_rows, :, :3]
+        band[...] = band[:, :, indices]
+    return arr
+
+
+def swap_channels(input_path, output_path, swap_option):
+    """
+    Swap color channels in an image based on the swap_option.
+
+    Unlike the GUI wrapper in color-channel-switcher.py this raises on error
+    instead of showing a dialog, so it can run unattended.
+
+    Args:
+        input_path (str): Path to the input image
+        output_path (str): Path to save the output image
+        swap_option (str): Which channels to swap (RG, RB, GB) or a full
+            channel order (RGB, RBG, GRB, GBR, BRG, BGR)
+    """
+    # Validate before paying for the decode
+    channel_indices(swap_option)
+
+    # Open the image and reorder its channels in one pass
+    img = Image.open(input_path)
+    new_img = permute_channels(img, swap_option)
+
+    # Save the result
+    new_img.save(output_path)
+
+
+def collect_inputs(patterns, recursive=False):
+    """
+    Expand globs and directories into a sorted list of image files.
+
+    Args:
+        patterns (list): File paths, glob patterns or directories
+        recursive (bool): Descend into subdirectories of directory arguments
+
+    Returns:
+        list: Unique image file paths
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for dir_path, _, names in os.walk(pattern):
+                    files.update(os.path.join(dir_path, name) for name in names)
+            else:
+                files.update(os.path.join(pattern, name) for name in os.listdir(pattern))
+        else:
+            files.update(glob.glob(pattern, recursive=recursive))
+
+    return sorted(
+        path for path in files
+        if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def pattern_root(pattern):
+    """Directory an input argument (file, glob pattern or directory) starts at."""
+    if os.path.isdir(pattern):
+        return pattern
+    root = os.path.dirname(pattern)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root or "."
+
+
+def relative_input_path(path, patterns):
+    """
+    Path of an input relative to the argument it was found through.
+
+    The deepest matching root wins, so "photos" and "photos/raw" given
+    together still mirror "raw/". Files outside every root keep their
+    base name only.
+    """
+    path = os.path.abspath(path)
+    best = None
+    for pattern in patterns:
+        root = os.path.abspath(pattern_root(pattern))
+        if os.path.commonpath([root, path]) == root and (best is None or len(root) > len(best)):
+            best = root
+    return os.path.relpath(path, best) if best else os.path.basename(path)
+
+
+def output_path_for(input_path, output_dir, swap_option, relative_path=None):
+    """
+    Build the output path, using the same naming as the GUI.
+
+    With relative_path (see relative_input_path) the input's subdirectories
+    are mirrored under output_dir, so inputs sharing a base name in
+    different folders do not overwrite each other.
+    """
+    file_name, file_ext = os.path.splitext(os.path.basename(input_path))
+    subdir = os.path.dirname(relative_path) if relative_path else ""
+    return os.path.join(output_dir, subdir, f"{file_name}_swapped_{swap_option}{file_ext}")
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid number: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Must be at least 1, got {number}")
+    return number
+
+
+def _swap_job(job):
+    # Runs in a worker process; errors are returned, never raised, so one
+    # bad file cannot take down the whole batch
+    input_path, output_path, swap_option, strip_rows = job
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        if strip_rows:
+            tiled.swap_channels_tiled(input_path, output_path, swap_option, strip_rows)
+        else:
+            swap_channels(input_path, output_path, swap_option)
+        return input_path, output_path, None
+    except Exception as e:
+        return input_path, output_path, f"{type(e).__name__}: {e}"
+
+
+def batch_swap(input_paths, output_dir, swap_option, workers=None, strip_rows=None, patterns=None):
+    """
+    Swap channels of many images in parallel.
+
+    Args:
+        input_paths (list): Image files to process
+        output_dir (str): Directory the results are written to
+        swap_option (str): Which channels to swap (RG, RB, GB) or channel order
+        workers (int, optional): Number of worker processes. Defaults to the
+            number of CPUs.
+        strip_rows (int, optional): Stream each image through tiled.py in
+            strips of this many rows, for images larger than memory. Output
+            is written as PNG or TIFF.
+        patterns (list, optional): The arguments input_paths were collected
+            from; their subdirectories are mirrored under output_dir
+
+    Yields:
+        tuple: (input_path, output_path, error) per file, error is None on
+        success
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for path in input_paths:
+        relative_path = relative_input_path(path, patterns) if patterns else None
+        output_path = output_path_for(path, output_dir, swap_option, relative_path)
+        if strip_rows:
+            output_path = tiled.tiled_output_path(output_path)
+        jobs.append((path, output_path, swap_option, strip_rows))
+    if not jobs:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from map(_swap_job, jobs)
+        return
+
+    # Hand out several files per task to keep IPC overhead low on big batches
+    chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_swap_job, jobs, chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Swap color channels of images in bulk.")
+    parser.add_argument("inputs", nargs="+", help="Image files, glob patterns or directories")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory to write results to")
+    parser.add_argument("-s", "--swap", default="RG", type=str.upper,
+                        choices=SWAP_OPTIONS + CHANNEL_ORDERS,
+                        help="Channels to swap (RG, RB, GB) or output order such as BRG "
+                             "(default: RG)")
+    parser.add_argument("-j", "--workers", type=positive_int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Descend into subdirectories")
+    parser.add_argument("--strip-rows", type=positive_int, default=None,
+                        help="Process images in strips of this many rows to bound memory "
+                             "(writes PNG/TIFF)")
+    parser.add_argument("--report", help="Write a tab-separated per-file report to this path")
+    args = parser.parse_args(argv)
+
+    input_paths = collect_inputs(args.inputs, args.recursive)
+    if not input_paths:
+        print("No input images found.", file=sys.stderr)
+        return 2
+
+    report = open(args.report, "w") if args.report else None
+    failed = 0
+    try:
+        for input_path, output_path, error in batch_swap(input_paths, args.output_dir,
+                                                         args.swap, args.workers,
+                                                         args.strip_rows, args.inputs):
+            if error:
+                failed += 1
+                print(f"FAILED {input_path}: {error}", file=sys.stderr)
+            if report:
+                report.write(f"{input_path}\t{output_path}\t{'error' if error else 'ok'}\t{error or ''}\n")
+    finally:
+        if report:
+            report.close()
+
+    print(f"Processed {len(input_paths) - failed}/{len(input_paths)} images ({failed} failed).")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
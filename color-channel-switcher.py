@@ -1,8 +1,9 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
-from PIL import Image
 import os
 
+import color_lut
+
 def swap_channels(input_path, output_path, swap_option):
     """
     Swap color channels in an image based on the swap_option.
@@ -10,36 +11,26 @@ def swap_channels(input_path, output_path, swap_option):
     Args:
         input_path (str): Path to the input image
         output_path (str): Path to save the output image
-        swap_option (str): Which channels to swap (RG, RB, GB)
+        swap_option: Which channels to swap (RG, RB, GB), another
+            color_lut preset, a .cube file, a 3x3 matrix, or an already
+            compiled color_lut.ColorTransform
     """
     try:
-        # Open the image
-        img = Image.open(input_path)
-        
-        # Convert to RGB if it's not already
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Split into channels
-        r, g, b = img.split()
-        
-        # Swap based on the option
-        if swap_option == 'RG':
-            new_img = Image.merge('RGB', (g, r, b))
-        elif swap_option == 'RB':
-            new_img = Image.merge('RGB', (b, g, r))
-        elif swap_option == 'GB':
-            new_img = Image.merge('RGB', (r, b, g))
-        else:
-            raise ValueError(f"Invalid swap option: {swap_option}")
-        
-        # Save the result
-        new_img.save(output_path)
+        color_lut.transform_file(input_path, output_path, swap_option)
         return True
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {str(e)}")
         return False
 
+def option_label(swap_option):
+    """Short name of a swap option for the output file name."""
+    text = swap_option.strip()
+    if text.upper() in color_lut.PRESETS:
+        return text.upper()
+    if text.lower().endswith(".cube"):
+        return os.path.splitext(os.path.basename(text))[0]
+    return "matrix"
+
 def main():
     # Create a root window but hide it
     root = tk.Tk()
@@ -58,22 +49,31 @@ def main():
         print("No file selected. Exiting.")
         return
     
-    # Ask which channels to swap
-    swap_options = ["RG", "RB", "GB"]
+    # Ask which channels to swap, or for another transform
     swap_option = simpledialog.askstring(
         "Swap Channels",
-        "Which channels to swap? (RG, RB, GB):",
+        "Which channels to swap? (RG, RB, GB)\n"
+        "Or a preset (GRAY, SEPIA), the path of a .cube LUT,\n"
+        "or a 3x3 matrix as 9 comma-separated numbers:",
         initialvalue="RG"
     )
     
-    if not swap_option or swap_option.upper() not in swap_options:
-        messagebox.showerror("Error", "Invalid swap option. Please choose from RG, RB, or GB.")
+    if not swap_option:
+        messagebox.showerror("Error", "No option given. Enter RG, RB or GB, a preset such as "
+                             "SEPIA, a .cube file or 9 matrix values.")
+        return
+    
+    # Compile it once here, so a bad option is reported before any dialogs
+    try:
+        transform = color_lut.parse_transform(swap_option)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
         return
     
     # Generate output path
     file_dir, file_name = os.path.split(file_path)
     file_name, file_ext = os.path.splitext(file_name)
-    output_path = os.path.join(file_dir, f"{file_name}_swapped_{swap_option.upper()}{file_ext}")
+    output_path = os.path.join(file_dir, f"{file_name}_swapped_{option_label(swap_option)}{file_ext}")
     
     # Ask for save location
     save_path = filedialog.asksaveasfilename(
@@ -92,7 +92,7 @@ def main():
         return
     
     # Process the image
-    if swap_channels(file_path, save_path, swap_option.upper()):
+    if swap_channels(file_path, save_path, transform):
         messagebox.showinfo("Success", f"Image processed successfully and saved to:\n{save_path}")
         
         # Ask if the user wants to open the image
@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-from PIL import Image, ImageTk
+
+import color_lut
+import image_cache
+from preview_render import PreviewRenderer
 
 def swap_and_preview():
     """
@@ -15,36 +18,34 @@ def swap_and_preview():
             file_entry.delete(0, tk.END)
             file_entry.insert(0, file_path)
 
+    def select_lut():
+        lut_path = filedialog.askopenfilename(
+            title="Select a LUT",
+            filetypes=[("Cube LUTs", "*.cube"), ("All files", "*.*")]
+        )
+        if lut_path:
+            swap_var.set(lut_path)
+
     def preview_images():
         file_path = file_entry.get()
         if not file_path:
             messagebox.showerror("Error", "Please select an image file.")
             return
 
-        swap_option = swap_var.get()
-        if swap_option not in ["RG", "RB", "GB"]:
-            messagebox.showerror("Error", "Invalid swap option. Please select RG, RB, or GB.")
+        # A preset, a .cube file or a 3x3 matrix, compiled to a lookup table
+        try:
+            transform = color_lut.parse_transform(swap_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
         try:
-            # Open the image
-            # Open the image Test
-            img = Image.open(file_path)
+            # Only a screen-sized copy is shown, so load (and cache) just that;
+            # pressing Preview again or changing the option skips the decode
+            img = image_cache.load_thumbnail(file_path, preview_max_size(), 'RGB')
 
-            # Convert to RGB if it's not already
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            # Split into channels
-            r, g, b = img.split()
-
-            # Swap based on the option
-            if swap_option == 'RG':
-                swapped_img = Image.merge('RGB', (g, r, b))
-            elif swap_option == 'RB':
-                swapped_img = Image.merge('RGB', (b, g, r))
-            elif swap_option == 'GB':
-                swapped_img = Image.merge('RGB', (r, b, g))
+            # Swap (or transform) based on the option
+            swapped_img = transform.apply_image(img)
 
             # Display the images side by side
             display_side_by_side(img, swapped_img)
@@ -54,49 +55,49 @@ def swap_and_preview():
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
+    def preview_max_size():
+        # Two images side by side on the screen
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
+        return screen_width // 2 - 50, screen_height - 100
+
     def display_side_by_side(original, swapped):
         """
-        Display the original and swapped images side by side in a new window.
+        Display the original and swapped images side by side in the preview window.
         """
-        # Create a new window
-        preview_window = tk.Toplevel()
-        preview_window.title("Preview")
-
-        # Resize images to fit the screen
-        screen_width = root.winfo_screenwidth()
-        screen_height = root.winfo_screenheight()
-        max_width = screen_width // 2 - 50
-        max_height = screen_height - 100
-
-        def resize_image(image):
-            width_ratio = max_width / image.width
-            height_ratio = max_height / image.height
-            scale_factor = min(width_ratio, height_ratio)
-            new_width = int(image.width * scale_factor)
-            new_height = int(image.height * scale_factor)
-            return image.resize((new_width, new_height), Image.LANCZOS)
-
-        original_resized = resize_image(original)
-        swapped_resized = resize_image(swapped)
-
-        # Convert images to Tkinter format
-        original_tk = ImageTk.PhotoImage(original_resized)
-        swapped_tk = ImageTk.PhotoImage(swapped_resized)
-
-        # Create labels to display the images
-        original_label = tk.Label(preview_window, image=original_tk)
-        swapped_label = tk.Label(preview_window, image=swapped_tk)
-        original_label.image = original_tk  # Keep a reference!
-        swapped_label.image = swapped_tk  # Keep a reference!
-
-        # Pack the labels side by side
-        original_label.pack(side=tk.LEFT, padx=10, pady=10)
-        swapped_label.pack(side=tk.LEFT, padx=10, pady=10)
+        # Reuse the preview window and its labels while it is open
+        if not preview["window"] or not preview["window"].winfo_exists():
+            window = tk.Toplevel()
+            window.title("Preview")
+
+            # Create labels to display the images
+            original_label = tk.Label(window)
+            swapped_label = tk.Label(window)
+
+            # Pack the labels side by side
+            original_label.pack(side=tk.LEFT, padx=10, pady=10)
+            swapped_label.pack(side=tk.LEFT, padx=10, pady=10)
+
+            preview["window"] = window
+            preview["renderers"] = (
+                PreviewRenderer(original_label, upscale=True),
+                PreviewRenderer(swapped_label, upscale=True),
+            )
+
+        # Resize images to fit the screen, updating the labels in place
+        max_size = preview_max_size()
+        original_renderer, swapped_renderer = preview["renderers"]
+        original_renderer.show(original, max_size)
+        swapped_renderer.show(swapped, max_size)
+        preview["window"].lift()
 
     # Create the main window
     root = tk.Tk()
     root.title("Color Switcher")
 
+    # Preview window, created on first use
+    preview = {"window": None, "renderers": None}
+
     # File selection
     file_frame = tk.Frame(root)
     file_frame.pack(pady=10)
@@ -117,10 +118,15 @@ def swap_and_preview():
     swap_label = tk.Label(swap_frame, text="Select swap option:")
     swap_label.pack(side=tk.LEFT, padx=5)
 
+    # Editable, so a 3x3 matrix ("r1,r2,r3, g1,g2,g3, b1,b2,b3") can be typed in
     swap_var = tk.StringVar(value="RG")
-    swap_dropdown = ttk.Combobox(swap_frame, textvariable=swap_var, values=["RG", "RB", "GB"], state="readonly")
+    swap_dropdown = ttk.Combobox(swap_frame, textvariable=swap_var, width=30,
+                                 values=["RG", "RB", "GB"] + list(color_lut.MATRIX_PRESETS))
     swap_dropdown.pack(side=tk.LEFT, padx=5)
 
+    lut_button = tk.Button(swap_frame, text="LUT...", command=select_lut)
+    lut_button.pack(side=tk.LEFT, padx=5)
+
     # Preview button
     preview_button = tk.Button(root, text="Preview", command=preview_images)
     preview_button.pack(pady=20)
@@ -0,0 +1,391 @@
+"""
+Color transforms compiled to lookup tables.
+
+A transform is compiled once into the cheapest table that represents it:
+
+    separable  Each output channel depends on one input channel, e.g. a
+               channel swap, a per-channel gain or a 1D .cube curve. Stored
+               as a source channel and a 256-entry uint8 table per output
+               channel, so applying it is one table lookup per sample.
+    matrix     A 3x3 channel-mixing matrix plus offsets, e.g. GRAY or
+               SEPIA. Applied exactly rather than sampled: every output
+               channel is the sum of three 256-entry product tables, one
+               per input channel.
+    3D         Any other transform that mixes channels, e.g. a 3D .cube
+               LUT. Stored as an NxNxN grid of output colors (17 or 33 per
+               side is usual) and applied with trilinear interpolation
+               between the 8 surrounding grid points.
+
+PIL images are transformed by Pillow's own C paths (Image.point, a matrix
+convert and ImageFilter.Color3DLUT), arrays by the NumPy versions here, in
+bands of rows. The channel swaps of channel_swap.py are presets:
+
+    import color_lut
+    transform = color_lut.parse_transform("RG")
+    transform = color_lut.parse_transform("0.393,0.769,0.189, 0.349,0.686,0.168, 0.272,0.534,0.131")
+    transform = color_lut.load_cube("film.cube")
+    swapped = transform.apply_image(img)
+"""
+import functools
+import os
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+import channel_swap
+
+DEFAULT_GRID_SIZE = 33
+_BAND_ROWS = 256
+# Trilinear interpolation keeps several float copies of a band, and smaller
+# bands stay in cache
+_GRID_BAND_ROWS = 32
+
+# Channel-mixing presets on top of the channel_swap orders
+MATRIX_PRESETS = {
+    "GRAY": ((0.299, 0.587, 0.114), (0.299, 0.587, 0.114), (0.299, 0.587, 0.114)),
+    "SEPIA": ((0.393, 0.769, 0.189), (0.349, 0.686, 0.168), (0.272, 0.534, 0.131)),
+}
+PRESETS = channel_swap.SWAP_OPTIONS + channel_swap.CHANNEL_ORDERS + list(MATRIX_PRESETS)
+
+_IDENTITY = np.arange(256, dtype=np.uint8)
+
+
+class ColorTransform:
+    """
+    A compiled color transform, see the module docstring.
+
+    Build one with from_order, from_tables, from_matrix, from_function,
+    load_cube or parse_transform rather than directly.
+
+    Attributes:
+        sources (tuple): Separable only, input channel of each output channel
+        tables (np.ndarray): Separable only, 3x256 uint8 tables
+        matrix (np.ndarray): Matrix only, 3x3 float64, rows are output channels
+        offset (np.ndarray): Matrix only, 3 float64 offsets in 0-255 units
+        grid (np.ndarray): 3D only, NxNxNx3 float32 output colors in 0-255,
+            indexed [r, g, b] at the grid points
+    """
+
+    def __init__(self, sources=None, tables=None, grid=None, matrix=None, offset=None):
+        self.sources = tuple(sources) if sources is not None else None
+        self.tables = tables
+        self.grid = grid
+        self.matrix = matrix
+        self.offset = offset
+        self._cell_tables = None
+        self._products = None
+        self._pil_filter = None
+
+    @property
+    def separable(self):
+        return self.tables is not None
+
+    @property
+    def mixing(self):
+        """True for a (non-separable) 3x3 matrix, applied without a grid."""
+        return self.matrix is not None
+
+    @property
+    def is_permutation(self):
+        """True for a pure channel reorder, such as the swap presets."""
+        return self.separable and all(np.array_equal(table, _IDENTITY) for table in self.tables)
+
+    @property
+    def grid_size(self):
+        return None if self.grid is None else self.grid.shape[0]
+
+    def apply_image(self, img):
+        """
+        Transform a PIL image, keeping any alpha channel.
+
+        Returns:
+            PIL.Image.Image: New RGB (or RGBA) image
+        """
+        alpha = img.getchannel("A") if img.mode in ("RGBA", "LA") else None
+        rgb = img if img.mode == "RGB" else img.convert("RGB")
+
+        if self.separable:
+            if self.sources != (0, 1, 2):
+                # Reorder first with a permutation-matrix convert
+                rgb = channel_swap.permute_channels(rgb, "".join("RGB"[s] for s in self.sources))
+            if not self.is_permutation:
+                rgb = rgb.point(self.tables.ravel().tolist())
+        elif self.mixing:
+            # Each row followed by its offset, rounded and clipped by Pillow
+            rows = np.column_stack([self.matrix, self.offset])
+            rgb = rgb.convert("RGB", tuple(rows.ravel().tolist()))
+        else:
+            if self._pil_filter is None:
+                # Pillow wants red to change fastest, values in 0-1
+                table = (self.grid.transpose(2, 1, 0, 3) / 255.0).ravel().tolist()
+                self._pil_filter = ImageFilter.Color3DLUT(self.grid_size, table)
+            rgb = rgb.filter(self._pil_filter)
+
+        if alpha is not None:
+            rgb = rgb.convert("RGBA")
+            rgb.putalpha(alpha)
+        return rgb
+
+    def apply_array(self, arr, out=None, band_rows=None):
+        """
+        Transform an HxWx3 or HxWx4 uint8 array, keeping any alpha channel.
+
+        Args:
+            arr (np.ndarray): Input image
+            out (np.ndarray, optional): Destination, may be arr itself
+            band_rows (int, optional): Rows transformed per step; bounds the
+                temporaries
+
+        Returns:
+            np.ndarray: The transformed image (out, if given)
+        """
+        if out is None:
+            out = np.empty_like(arr)
+        if out is not arr and arr.shape[2] > 3:
+            out[:, :, 3:] = arr[:, :, 3:]
+        if band_rows is None:
+            band_rows = _BAND_ROWS if self.separable else _GRID_BAND_ROWS
+
+        for top in range(0, arr.shape[0], band_rows):
+            band = arr[top:top + band_rows, :, :3]
+            target = out[top:top + band_rows, :, :3]
+            if self.separable:
+                # Gather every output channel from its source before writing,
+                # out may be arr
+                channels = [self.tables[c][band[:, :, source]] for c, source in enumerate(self.sources)]
+                for c, channel in enumerate(channels):
+                    target[:, :, c] = channel
+            elif self.mixing:
+                channels = [self._mix(band, c) for c in range(3)]
+                for c, channel in enumerate(channels):
+                    target[:, :, c] = channel
+            else:
+                target[...] = self._interpolate(band)
+        return out
+
+    def _mix(self, band, channel):
+        # One output channel: the sum of each input channel's product table.
+        # The offset and the rounding half are folded into the red table.
+        if self._products is None:
+            values = np.arange(256, dtype=np.float64)
+            products = self.matrix[:, :, None] * values
+            products[:, 0] += (self.offset + 0.5)[:, None]
+            self._products = products.astype(np.float32)
+        products = self._products[channel]
+        total = products[0][band[:, :, 0]]
+        total += products[1][band[:, :, 1]]
+        total += products[2][band[:, :, 2]]
+        np.clip(total, 0, 255, out=total)
+        return total.astype(np.uint8)
+
+    def _cells(self):
+        # Grid cell and position within it for every 8-bit value, so a
+        # pixel's cell is three small table lookups instead of float math
+        if self._cell_tables is None:
+            size = self.grid.shape[0]
+            position = np.arange(256, dtype=np.float32) * np.float32((size - 1) / 255.0)
+            cell = np.minimum(position.astype(np.intp), size - 2)
+            self._cell_tables = (cell * size * size, cell * size, cell, position - cell)
+        return self._cell_tables
+
+    def _interpolate(self, band):
+        # Trilinear interpolation: flat index of each pixel's lower grid
+        # corner, then the 8 corners blended along b, g and r in turn
+        size = self.grid.shape[0]
+        flat = self.grid.reshape(-1, 3)
+        r_cell, g_cell, b_cell, weights = self._cells()
+        r, g, b = band[:, :, 0], band[:, :, 1], band[:, :, 2]
+        base = r_cell[r] + g_cell[g] + b_cell[b]
+        wr, wg, wb = weights[r][:, :, None], weights[g][:, :, None], weights[b][:, :, None]
+
+        def along_b(offset):
+            low = np.take(flat, base + offset, axis=0)
+            low += (np.take(flat, base + offset + 1, axis=0) - low) * wb
+            return low
+
+        r_step, g_step = size * size, size
+        c00, c01 = along_b(0), along_b(g_step)
+        c10, c11 = along_b(r_step), along_b(r_step + g_step)
+        c00 += (c01 - c00) * wg
+        c10 += (c11 - c10) * wg
+        c00 += (c10 - c00) * wr
+        c00 += 0.5
+        np.clip(c00, 0, 255, out=c00)
+        return c00.astype(np.uint8)
+
+
+def from_order(order):
+    """Channel swap (RG, RB, GB) or channel order (e.g. BRG) as a transform."""
+    tables = np.tile(_IDENTITY, (3, 1))
+    return ColorTransform(channel_swap.channel_indices(order), tables)
+
+
+def from_tables(tables, sources=(0, 1, 2)):
+    """
+    Per-channel curves as a transform.
+
+    Args:
+        tables: Three 256-entry sequences of output values, 0-255
+        sources (tuple): Input channel each table reads
+    """
+    tables = np.clip(np.rint(np.asarray(tables, dtype=np.float64)), 0, 255).astype(np.uint8)
+    if tables.shape != (3, 256):
+        raise ValueError(f"Expected 3 tables of 256 entries, got shape {tables.shape}")
+    return ColorTransform(sources, tables)
+
+
+def from_function(func, size=DEFAULT_GRID_SIZE):
+    """
+    Sample any color function on a size^3 grid.
+
+    Args:
+        func: Maps an (..., 3) float32 array of RGB in 0-255 to the same
+            shape of output colors in 0-255
+        size (int): Grid points per axis, 2-65
+    """
+    if not 2 <= size <= 65:
+        raise ValueError(f"Grid size must be 2-65, got {size}")
+    axis = np.linspace(0, 255, size, dtype=np.float32)
+    nodes = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1)
+    grid = np.clip(np.asarray(func(nodes), dtype=np.float32), 0, 255)
+    return ColorTransform(grid=np.ascontiguousarray(grid))
+
+
+def from_matrix(matrix, offset=(0, 0, 0)):
+    """
+    3x3 channel-mixing matrix, out = matrix @ rgb + offset, as a transform.
+
+    A matrix with at most one non-zero per row (swaps, gains) is separable
+    and compiled to 256-entry tables; any other is applied exactly as a
+    matrix, never through a sampled grid.
+
+    Args:
+        matrix: 3x3 nested sequence, rows are output channels
+        offset: Added to each output channel, in 0-255 units
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    offset = np.asarray(offset, dtype=np.float64)
+    if matrix.shape != (3, 3) or offset.shape != (3,):
+        raise ValueError("Expected a 3x3 matrix and 3 offsets")
+
+    nonzero = matrix != 0
+    if (nonzero.sum(axis=1) <= 1).all():
+        # argmax of an all-zero row is 0, and its table is the constant offset
+        sources = nonzero.argmax(axis=1).tolist()
+        values = np.arange(256, dtype=np.float64)
+        tables = [matrix[c, sources[c]] * values + offset[c] for c in range(3)]
+        return from_tables(tables, sources)
+    return ColorTransform(matrix=matrix, offset=offset)
+
+
+def load_cube(path):
+    """
+    Read an Adobe/Resolve .cube file (LUT_1D_SIZE or LUT_3D_SIZE).
+
+    1D LUTs become separable tables, 3D LUTs keep their own grid size.
+    Only the default 0-1 domain is supported.
+
+    Returns:
+        ColorTransform
+    """
+    size_1d = size_3d = None
+    rows = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            keyword, value = (line.split(None, 1) + [""])[:2]
+            if keyword == "LUT_1D_SIZE":
+                size_1d = int(value)
+            elif keyword == "LUT_3D_SIZE":
+                size_3d = int(value)
+            elif keyword in ("DOMAIN_MIN", "DOMAIN_MAX"):
+                expected = 0.0 if keyword == "DOMAIN_MIN" else 1.0
+                if any(float(v) != expected for v in value.split()):
+                    raise ValueError(f"{path}: only the 0-1 domain is supported")
+            elif keyword in ("TITLE", "LUT_1D_INPUT_RANGE", "LUT_3D_INPUT_RANGE"):
+                continue
+            else:
+                rows.append(line.split())
+
+    if (size_1d is None) == (size_3d is None):
+        raise ValueError(f"{path}: expected exactly one of LUT_1D_SIZE and LUT_3D_SIZE")
+    try:
+        data = np.asarray(rows, dtype=np.float32) * 255
+    except ValueError:
+        raise ValueError(f"{path}: malformed LUT data")
+    expected = size_1d if size_1d is not None else size_3d ** 3
+    if data.shape != (expected, 3):
+        raise ValueError(f"{path}: expected {expected} rows of 3 values, got {len(rows)}")
+
+    if size_1d is not None:
+        # Resample each curve to one entry per 8-bit input value
+        positions = np.linspace(0, size_1d - 1, 256)
+        tables = [np.interp(positions, np.arange(size_1d), data[:, c]) for c in range(3)]
+        return from_tables(tables)
+
+    if not 2 <= size_3d <= 65:
+        raise ValueError(f"{path}: LUT_3D_SIZE must be 2-65, got {size_3d}")
+    # Rows have red changing fastest, i.e. [b, g, r] order
+    grid = data.reshape(size_3d, size_3d, size_3d, 3).transpose(2, 1, 0, 3)
+    return ColorTransform(grid=np.ascontiguousarray(np.clip(grid, 0, 255)))
+
+
+@functools.lru_cache(maxsize=None)
+def preset(name):
+    """Compiled transform for a name in PRESETS, built once."""
+    name = name.upper()
+    if name in MATRIX_PRESETS:
+        return from_matrix(MATRIX_PRESETS[name])
+    return from_order(name)
+
+
+def parse_transform(spec):
+    """
+    Build a transform from user input.
+
+    Args:
+        spec (str): A preset name (RG, RB, GB, BRG, SEPIA, ...), the path of
+            a .cube file, or 9 numbers (a row-major 3x3 matrix) or 12 (each
+            row followed by its offset), separated by commas or spaces
+
+    Returns:
+        ColorTransform
+
+    Raises:
+        ValueError: If spec is none of the above
+    """
+    text = spec.strip()
+    if text.upper() in PRESETS:
+        return preset(text.upper())
+    if text.lower().endswith(".cube"):
+        if not os.path.isfile(text):
+            raise ValueError(f"LUT file not found: {text}")
+        return load_cube(text)
+
+    try:
+        numbers = [float(part) for part in text.replace(",", " ").split()]
+    except ValueError:
+        numbers = []
+    if len(numbers) == 9:
+        return from_matrix(np.reshape(numbers, (3, 3)))
+    if len(numbers) == 12:
+        rows = np.reshape(numbers, (3, 4))
+        return from_matrix(rows[:, :3], rows[:, 3])
+    raise ValueError(f"Invalid transform: {spec} (use a preset such as {', '.join(PRESETS[:3])}, "
+                     f"a .cube file or 9 matrix values)")
+
+
+def transform_file(input_path, output_path, transform):
+    """
+    Apply a transform (or a spec for parse_transform) to an image file.
+
+    Returns:
+        ColorTransform: The transform used
+    """
+    if isinstance(transform, str):
+        transform = parse_transform(transform)
+    img = Image.open(input_path)
+    transform.apply_image(img).save(output_path)
+    return transform
@@ -0,0 +1,212 @@
+"""
+Perceptual color-distance kernels used by keying.py.
+
+All kernels work on whole arrays. Color-space conversions of an image are
+kept in a ColorSpaceCache, so switching metric or tolerance never converts
+the full frame twice.
+"""
+import numpy as np
+
+# Selectable metrics and their labels for the GUIs
+METRICS = {
+    "rgb": "RGB distance",
+    "lab76": "Lab ΔE76",
+    "lab2000": "Lab ΔE2000",
+    "hue": "Hue + saturation",
+}
+
+# sRGB (D65) to XYZ, and the D65 white point
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+# Gamma expansion for every 8-bit value, applied as a table lookup
+_SRGB_TO_LINEAR = np.where(
+    np.arange(256) / 255.0 <= 0.04045,
+    np.arange(256) / 255.0 / 12.92,
+    ((np.arange(256) / 255.0 + 0.055) / 1.055) ** 2.4,
+).astype(np.float32)
+
+_BAND_ROWS = 256
+
+
+def rgb_to_lab(img_rgb):
+    """
+    Convert an HxWx3 uint8 sRGB image to CIELAB (D65).
+
+    Returns:
+        np.ndarray: HxWx3 float32 array of L, a, b
+    """
+    img_rgb = np.asarray(img_rgb)
+    lab = np.empty(img_rgb.shape[:2] + (3,), dtype=np.float32)
+    matrix = (_RGB_TO_XYZ / _WHITE[:, None]).T
+
+    # Convert in bands of rows so the float temporaries stay small
+    for top in range(0, img_rgb.shape[0], _BAND_ROWS):
+        linear = _SRGB_TO_LINEAR[img_rgb[top:top + _BAND_ROWS, :, :3]]
+        xyz = linear @ matrix
+        f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+        band = lab[top:top + _BAND_ROWS]
+        band[:, :, 0] = 116 * f[:, :, 1] - 16
+        band[:, :, 1] = 500 * (f[:, :, 0] - f[:, :, 1])
+        band[:, :, 2] = 200 * (f[:, :, 1] - f[:, :, 2])
+    return lab
+
+
+def rgb_to_hue_sat(img_rgb):
+    """
+    Compute HSV hue (degrees, 0..360) and saturation (0..1) planes.
+
+    Returns:
+        tuple: (hue, saturation) HxW float32 arrays
+    """
+    img_rgb = np.asarray(img_rgb)
+    hue = np.empty(img_rgb.shape[:2], dtype=np.float32)
+    sat = np.empty(img_rgb.shape[:2], dtype=np.float32)
+
+    for top in range(0, img_rgb.shape[0], _BAND_ROWS):
+        band = img_rgb[top:top + _BAND_ROWS, :, :3].astype(np.float32)
+        r, g, b = band[:, :, 0], band[:, :, 1], band[:, :, 2]
+        high = band.max(axis=2)
+        spread = high - band.min(axis=2)
+        safe_spread = np.where(spread == 0, 1, spread)
+
+        h = np.where(high == r, (g - b) / safe_spread,
+                     np.where(high == g, 2 + (b - r) / safe_spread, 4 + (r - g) / safe_spread))
+        h = np.where(spread == 0, 0, h) * 60
+        hue[top:top + _BAND_ROWS] = np.mod(h, 360)
+        sat[top:top + _BAND_ROWS] = np.where(high == 0, 0, spread / np.where(high == 0, 1, high))
+    return hue, sat
+
+
+def delta_e76(lab, target_lab):
+    """CIE76 color difference between every pixel and target_lab."""
+    diff = lab - np.asarray(target_lab, dtype=np.float32)
+    return np.sqrt(np.einsum('...c,...c->...', diff, diff))
+
+
+def delta_e2000(lab, target_lab):
+    """CIEDE2000 color difference between every pixel and target_lab."""
+    lab = np.asarray(lab, dtype=np.float32)
+    distance = np.empty(lab.shape[:-1], dtype=np.float32)
+
+    # The formula needs a couple of dozen float temporaries, so work in bands
+    # of rows to keep them small
+    for top in range(0, lab.shape[0], _BAND_ROWS):
+        distance[top:top + _BAND_ROWS] = _delta_e2000_band(lab[top:top + _BAND_ROWS], target_lab)
+    return distance
+
+
+def _delta_e2000_band(lab, target_lab):
+    L1, a1, b1 = lab[..., 0], lab[..., 1], lab[..., 2]
+    L2, a2, b2 = (np.float32(v) for v in target_lab)
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_mean7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_mean7 / (C_mean7 + np.float32(25.0 ** 7))))
+
+    a1p = a1 * (1 + G)
+    a2p = a2 * (1 + G)
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.mod(np.degrees(np.arctan2(b1, a1p)), 360)
+    h2p = np.mod(np.degrees(np.arctan2(b2, a2p)), 360)
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(C1p * C2p == 0, 0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp / 2))
+
+    Lp_mean = (L1 + L2) / 2
+    Cp_mean = (C1p + C2p) / 2
+    hp_sum = h1p + h2p
+    hp_mean = np.where(
+        C1p * C2p == 0, hp_sum,
+        np.where(np.abs(h1p - h2p) <= 180, hp_sum / 2,
+                 np.where(hp_sum < 360, (hp_sum + 360) / 2, (hp_sum - 360) / 2)))
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_mean - 30))
+         + 0.24 * np.cos(np.radians(2 * hp_mean))
+         + 0.32 * np.cos(np.radians(3 * hp_mean + 6))
+         - 0.20 * np.cos(np.radians(4 * hp_mean - 63)))
+    d_theta = 30 * np.exp(-(((hp_mean - 275) / 25) ** 2))
+    Cp_mean7 = Cp_mean ** 7
+    R_C = 2 * np.sqrt(Cp_mean7 / (Cp_mean7 + np.float32(25.0 ** 7)))
+    S_L = 1 + (0.015 * (Lp_mean - 50) ** 2) / np.sqrt(20 + (Lp_mean - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_mean
+    S_H = 1 + 0.015 * Cp_mean * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    dL = dLp / S_L
+    dC = dCp / S_C
+    dH = dHp / S_H
+    return np.sqrt(dL ** 2 + dC ** 2 + dH ** 2 + R_T * dC * dH)
+
+
+def hue_sat_distance(hue, sat, target_hue, target_sat):
+    """
+    Hue-angle plus saturation distance, ignoring brightness.
+
+    The hue difference in degrees (0..180) is weighted by the lower of the two
+    saturations, since hue is meaningless for grays, and combined with the
+    saturation difference in percent. Shadows on a colored backdrop keep
+    their hue and saturation, so they stay close to the key color.
+    """
+    d_hue = np.abs(hue - np.float32(target_hue))
+    d_hue = np.minimum(d_hue, 360 - d_hue) * np.minimum(sat, np.float32(target_sat))
+    d_sat = (sat - np.float32(target_sat)) * 100
+    return np.hypot(d_hue, d_sat)
+
+
+class ColorSpaceCache:
+    """
+    Lazily converted color spaces of one image.
+
+    The conversions are computed on first use and kept for as long as the
+    cache lives, so switching between metrics or tolerances reuses them.
+    """
+
+    def __init__(self, img_rgb):
+        self.img_rgb = img_rgb
+        self._lab = None
+        self._hue_sat = None
+
+    def lab(self):
+        if self._lab is None:
+            self._lab = rgb_to_lab(self.img_rgb)
+        return self._lab
+
+    def hue_sat(self):
+        if self._hue_sat is None:
+            self._hue_sat = rgb_to_hue_sat(self.img_rgb)
+        return self._hue_sat
+
+
+def color_distance(spaces, target_color, metric):
+    """
+    Distance of every pixel to target_color under a perceptual metric.
+
+    Args:
+        spaces (ColorSpaceCache): Cached conversions of the image
+        target_color (sequence): Target (R, G, B) color
+        metric (str): "lab76", "lab2000" or "hue"
+
+    Returns:
+        np.ndarray: HxW float32 distances
+    """
+    target = np.array([[target_color[:3]]], dtype=np.uint8)
+    if metric == "lab76":
+        return delta_e76(spaces.lab(), rgb_to_lab(target)[0, 0])
+    if metric == "lab2000":
+        return delta_e2000(spaces.lab(), rgb_to_lab(target)[0, 0])
+    if metric == "hue":
+        target_hue, target_sat = rgb_to_hue_sat(target)
+        hue, sat = spaces.hue_sat()
+        return hue_sat_distance(hue, sat, target_hue[0, 0], target_sat[0, 0])
+    raise ValueError(f"Unknown color metric: {metric}")
@@ -1,13 +1,33 @@
-import json
+import sys
 
-# Load the JSON data from the file
-with open('rubberducks.json', 'r') as file:
-    rubber_ducks_data = json.load(file)
+from RubberDucksFormatter import iter_ducks
+from flock_snapshot import load_flock
 
-#print out the number of ducks
-print(4)
+flock_path = sys.argv[1] if len(sys.argv) > 1 else 'RubberDucks.json'
 
-# Iterate over the ducks and print their names and colors
-for duck in rubber_ducks_data['ducks']:
-    print(duck['name'])
-    print(duck['color'])
\ No newline at end of file
+try:
+    # Read the ducks from the binary snapshot, rebuilt if the JSON changed
+    snapshot = load_flock(flock_path)
+except OSError:
+    # The snapshot could not be written, stream the ducks from the file instead
+    snapshot = None
+
+if snapshot is not None:
+    with snapshot:
+        #print out the number of ducks
+        print(len(snapshot))
+
+        # Iterate over the ducks and print their names and colors
+        for duck in snapshot:
+            print(duck['name'])
+            print(duck['color'])
+else:
+    # Count in a first streaming pass, so the number still comes first
+    # without holding the ducks in memory
+    with open(flock_path, 'r', encoding='utf-8') as file:
+        print(sum(1 for _ in iter_ducks(file)))
+
+    with open(flock_path, 'r', encoding='utf-8') as file:
+        for duck in iter_ducks(file):
+            print(duck['name'])
+            print(duck['color'])
@@ -0,0 +1,115 @@
+import sys
+
+from RubberDucksFormatter import iter_flock
+
+
+class Duck:
+    """One duck; __slots__ keeps each record to three references."""
+
+    __slots__ = ("name", "color", "flock")
+
+    def __init__(self, name, color, flock=None):
+        self.name = name
+        self.color = color
+        self.flock = flock
+
+    def __repr__(self):
+        return f"Duck(name={self.name!r}, color={self.color!r})"
+
+
+class DuckRegistry:
+    """
+    Ducks from one or more flock files, indexed by name and color.
+
+    Color strings (and flock names) are interned, so a million ducks share
+    a handful of color objects. Lookups by name or color are a dict access
+    and per-color counts come from the index sizes, with no scan over the
+    ducks.
+    """
+
+    def __init__(self):
+        self.ducks = []
+        self.mama_ducks = {}
+        self._by_name = {}
+        self._by_color = {}
+
+    @classmethod
+    def from_files(cls, *paths):
+        registry = cls()
+        for path in paths:
+            registry.load(path)
+        return registry
+
+    def load(self, path):
+        """
+        Stream a flock file into the registry.
+
+        The "mamaDuck" of the file, if any, is kept in mama_ducks under the
+        file path rather than among the ducks.
+
+        Returns:
+            int: Number of ducks added
+        """
+        flock = sys.intern(path)
+        added = 0
+        with open(path, "r", encoding="utf-8") as file:
+            for kind, value in iter_flock(file):
+                if kind == "duck":
+                    self.add(value["name"], value["color"], flock)
+                    added += 1
+                elif kind == "mamaDuck":
+                    self.mama_ducks[flock] = Duck(value["name"], sys.intern(value["color"]), flock)
+        return added
+
+    def add(self, name, color, flock=None):
+        duck = Duck(name, sys.intern(color), flock)
+        self.ducks.append(duck)
+        # Most names are unique, so a name maps to its duck and only
+        # becomes a list once a second duck shares it
+        other = self._by_name.get(name)
+        if other is None:
+            self._by_name[name] = duck
+        elif isinstance(other, list):
+            other.append(duck)
+        else:
+            self._by_name[name] = [other, duck]
+        self._by_color.setdefault(duck.color, []).append(duck)
+        return duck
+
+    def __len__(self):
+        return len(self.ducks)
+
+    def __iter__(self):
+        return iter(self.ducks)
+
+    def by_name(self, name):
+        """
+        Every duck called name (names are not unique across flocks).
+
+        Returns:
+            tuple: The ducks in load order; a snapshot, so changing it
+            cannot corrupt the index
+        """
+        ducks = self._by_name.get(name)
+        if ducks is None:
+            return ()
+        return tuple(ducks) if isinstance(ducks, list) else (ducks,)
+
+    def by_color(self, color):
+        """
+        Every duck of the given color, in load order.
+
+        Returns:
+            tuple: A snapshot of the index entry, like by_name
+        """
+        return tuple(self._by_color.get(color, ()))
+
+    def colors(self):
+        return list(self._by_color)
+
+    def count(self, color):
+        return len(self._by_color.get(color, ()))
+
+    def count_per_color(self):
+        """Mapping of color to number of ducks, from the index alone."""
+        return {color: len(ducks) for color, ducks in self._by_color.items()}
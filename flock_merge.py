@@ -0,0 +1,363 @@
+"""
+Merge several flock files into one, keeping one duck per name.
+
+    python flock_merge.py RubberDucks.json DanielsFlock.json -o merged.json
+
+Two deduplication modes:
+
+    hash  A dict of names, the merged ducks keep first-seen order. Memory
+          grows with the number of distinct names.
+    sort  An external sort: ducks are sorted in runs of --run-size, spilled
+          to temporary files and k-way merged, so memory stays bounded for
+          inputs of any size. The merged ducks come out sorted by name.
+
+When a name has more than one color, --policy picks the one to keep:
+"first" or "last" in input order, "majority" (ties go to the earliest), or
+"error" to stop at the first conflict. The mamaDuck of the first file that
+has one is kept.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+from RubberDucksFormatter import iter_flock, write_lines
+
+POLICIES = ("first", "last", "majority", "error")
+DEDUP_MODES = ("hash", "sort")
+DEFAULT_RUN_SIZE = 250000
+
+
+class ColorConflict(ValueError):
+    """Raised by the "error" policy when a name has several colors."""
+
+
+class FileStats:
+    """Ducks and bytes read from one input file, and the time it took."""
+
+    __slots__ = ("path", "ducks", "bytes", "seconds")
+
+    def __init__(self, path):
+        self.path = path
+        self.ducks = 0
+        self.bytes = os.path.getsize(path)
+        self.seconds = 0.0
+
+    def ducks_per_second(self):
+        return self.ducks / self.seconds if self.seconds else 0.0
+
+    def megabytes_per_second(self):
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+class MergeResult:
+    """Counts of a merge, plus the per-file stats."""
+
+    def __init__(self, files):
+        self.files = files
+        self.ducks_in = 0
+        self.ducks_out = 0
+        self.conflicts = 0
+        self.seconds = 0.0
+
+
+def resolve_color(name, colors, policy, paths=None):
+    """
+    Pick the color kept for name.
+
+    Args:
+        name (str): Duck name
+        colors (list): (file index, color) for every duck called name, in
+            input order
+        policy (str): One of POLICIES
+        paths (list): Input paths, used in the "error" message
+
+    Returns:
+        str: The color to keep
+    """
+    if policy == "first":
+        return colors[0][1]
+    if policy == "last":
+        return colors[-1][1]
+    if policy == "majority":
+        counts = {}
+        for _, color in colors:
+            counts[color] = counts.get(color, 0) + 1
+        # Dicts keep insertion order, so max() settles ties on the earliest
+        return max(counts, key=counts.get)
+
+    first = colors[0][1]
+    for index, color in colors[1:]:
+        if color != first:
+            where = f" (in {paths[index]})" if paths else ""
+            raise ColorConflict(f"{name} is both {first} and {color}{where}")
+    return first
+
+
+def read_flocks(paths, files, chunk_size=1 << 16):
+    """
+    Stream every duck of every file in input order.
+
+    Yields:
+        tuple: (file index, name, color)
+
+    Returns:
+        dict: The first mamaDuck found, or None (as the generator's value)
+    """
+    mama = None
+    for index, path in enumerate(paths):
+        stats = files[index]
+        start = time.perf_counter()
+        with open(path, "r", encoding="utf-8") as file:
+            for kind, value in iter_flock(file, chunk_size):
+                if kind == "duck":
+                    stats.ducks += 1
+                    yield index, value["name"], value["color"]
+                elif kind == "mamaDuck" and mama is None:
+                    mama = value
+        # Includes the time spent indexing or spilling this file's ducks
+        stats.seconds = time.perf_counter() - start
+    return mama
+
+
+def merge_hash(ducks, policy, paths, result):
+    """
+    Deduplicate with a dict of names.
+
+    A name maps to its (interned) color until it is seen again; only then
+    is a list of (file index, color) kept for it, so unique names stay cheap.
+
+    Returns:
+        generator: Merged (name, color) in first-seen order
+    """
+    merged = {}
+    for index, name, color in ducks:
+        result.ducks_in += 1
+        color = sys.intern(color)
+        seen = merged.get(name)
+        if seen is None:
+            merged[name] = color
+        elif isinstance(seen, list):
+            seen.append((index, color))
+        else:
+            merged[name] = [(None, seen), (index, color)]
+
+    def resolved():
+        for name, seen in merged.items():
+            if isinstance(seen, list):
+                if len({color for _, color in seen}) > 1:
+                    result.conflicts += 1
+                yield name, resolve_color(name, seen, policy, paths)
+            else:
+                yield name, seen
+
+    return resolved()
+
+
+def _write_run(run, directory):
+    # One JSON array per line: [name, sequence, file index, color]
+    run.sort()
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".run",
+                                     delete=False) as file:
+        write_lines((json.dumps(record) for record in run), file)
+    return file.name
+
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            yield tuple(json.loads(line))
+
+
+def merge_sorted(ducks, policy, paths, result, run_size=DEFAULT_RUN_SIZE, temp_dir=None):
+    """
+    Deduplicate with an external sort.
+
+    Ducks are sorted in runs of run_size by (name, input position); full
+    runs are written to temporary files and all runs are k-way merged with
+    heapq.merge, which brings every duck of a name together in input order.
+
+    Returns:
+        generator: Merged (name, color) sorted by name
+    """
+    if run_size < 1:
+        raise ValueError(f"run_size must be at least 1, got {run_size}")
+    directory = tempfile.mkdtemp(prefix="flock_merge_", dir=temp_dir)
+    run_paths = []
+    run = []
+
+    def remove_runs():
+        for path in run_paths:
+            os.remove(path)
+        os.rmdir(directory)
+
+    try:
+        for sequence, (index, name, color) in enumerate(ducks):
+            run.append((name, sequence, index, sys.intern(color)))
+            result.ducks_in += 1
+            if len(run) >= run_size:
+                run_paths.append(_write_run(run, directory))
+                run = []
+    except BaseException:
+        remove_runs()
+        raise
+    run.sort()
+
+    def resolved():
+        try:
+            records = heapq.merge(run, *(_read_run(path) for path in run_paths))
+            for name, group in itertools.groupby(records, key=lambda record: record[0]):
+                colors = [(index, color) for _, _, index, color in group]
+                if len(colors) > 1 and len({color for _, color in colors}) > 1:
+                    result.conflicts += 1
+                yield name, resolve_color(name, colors, policy, paths)
+        finally:
+            remove_runs()
+
+    return resolved()
+
+
+def iter_flock_lines(ducks, mama=None):
+    """
+    Lines of a flock file in the same 4-space layout as the inputs.
+
+    Args:
+        ducks (iterable): (name, color) pairs
+        mama (dict): Optional mamaDuck
+    """
+    def entry(name, color, indent):
+        pad = " " * indent
+        return (f"{pad}{{\n{pad}    \"name\": {json.dumps(name)},\n"
+                f"{pad}    \"color\": {json.dumps(color)}\n{pad}}}")
+
+    yield "{"
+    yield '    "ducks": ['
+    previous = None
+    for name, color in ducks:
+        # Each entry is held back one step, the last one has no comma
+        if previous is not None:
+            yield previous + ","
+        previous = entry(name, color, 8)
+    if previous is not None:
+        yield previous
+    if mama is None:
+        yield "    ]"
+    else:
+        yield "    ],"
+        yield '    "mamaDuck": ' + entry(mama["name"], mama["color"], 4).lstrip()
+    yield "}"
+
+
+def merge_flocks(paths, sink, dedup="hash", policy="first", run_size=DEFAULT_RUN_SIZE,
+                 temp_dir=None, chunk_size=1 << 16):
+    """
+    Merge flock files into sink, one duck per name.
+
+    Args:
+        paths (list): Flock JSON files, earlier files come first in input order
+        sink: Object with a write(str) method
+        dedup (str): "hash" or "sort", see the module docstring
+        policy (str): Color conflict policy, one of POLICIES
+        run_size (int): Ducks per sorted run in "sort" mode
+        temp_dir (str): Where "sort" mode spills its runs
+        chunk_size (int): Characters read per step from each file
+
+    Returns:
+        MergeResult: Duck and conflict counts and per-file throughput
+    """
+    if dedup not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {dedup}")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown conflict policy: {policy}")
+
+    start = time.perf_counter()
+    result = MergeResult([FileStats(path) for path in paths])
+    mama = []
+
+    def ducks():
+        # Keep the generator's return value, the mamaDuck
+        mama.append((yield from read_flocks(paths, result.files, chunk_size)))
+
+    if dedup == "hash":
+        merged = merge_hash(ducks(), policy, paths, result)
+    else:
+        merged = merge_sorted(ducks(), policy, paths, result, run_size, temp_dir)
+
+    def counted():
+        for duck in merged:
+            result.ducks_out += 1
+            yield duck
+
+    write_lines(iter_flock_lines(counted(), mama[0]), sink, chunk_size)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def print_report(result, out=sys.stderr):
+    """Per-file throughput table and the merge totals."""
+    print(f"{'file':40s} {'ducks':>10s} {'MB':>8s} {'s':>7s} {'ducks/s':>11s} {'MB/s':>7s}",
+          file=out)
+    for stats in result.files:
+        print(f"{stats.path:40s} {stats.ducks:10d} {stats.bytes / 1e6:8.2f} {stats.seconds:7.2f} "
+              f"{stats.ducks_per_second():11.0f} {stats.megabytes_per_second():7.2f}", file=out)
+    print(f"Merged {result.ducks_in} ducks into {result.ducks_out} "
+          f"({result.ducks_in - result.ducks_out} duplicates, {result.conflicts} color conflicts) "
+          f"in {result.seconds:.2f} s.", file=out)
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid number: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Must be at least 1, got {number}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge flock files, keeping one duck per name.")
+    parser.add_argument("inputs", nargs="+", help="Flock JSON files, in priority order")
+    parser.add_argument("-o", "--output", help="Merged flock file (default: stdout)")
+    parser.add_argument("--dedup", default="hash", choices=DEDUP_MODES,
+                        help="hash keeps input order, sort uses bounded memory (default: hash)")
+    parser.add_argument("--policy", default="first", choices=POLICIES,
+                        help="Which color to keep when a name has several (default: first)")
+    parser.add_argument("--run-size", type=positive_int, default=DEFAULT_RUN_SIZE,
+                        help=f"Ducks per sorted run in sort mode (default: {DEFAULT_RUN_SIZE})")
+    parser.add_argument("--temp-dir", help="Directory for sort mode's runs (default: system temp)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print the report")
+    args = parser.parse_args(argv)
+
+    options = {"dedup": args.dedup, "policy": args.policy, "run_size": args.run_size,
+               "temp_dir": args.temp_dir}
+    try:
+        if args.output:
+            # Written next to the output and moved into place when complete
+            directory = os.path.dirname(os.path.abspath(args.output))
+            temp_path = os.path.join(directory, f".{os.path.basename(args.output)}.{os.getpid()}.part")
+            try:
+                with open(temp_path, "w", encoding="utf-8") as sink:
+                    result = merge_flocks(args.inputs, sink, **options)
+                os.replace(temp_path, args.output)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        else:
+            result = merge_flocks(args.inputs, sys.stdout, **options)
+    except (OSError, ValueError) as error:
+        print(f"Merge failed: {error}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        print_report(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Binary snapshots of flock JSON files.
+
+A snapshot is compiled once from a flock file and then memory-mapped, so
+later runs skip JSON parsing entirely. Layout (little-endian):
+
+    header   magic, source size, source mtime (ns), duck count,
+             mama duck flag, string count, string data size
+    records  (name id, color id) uint32 pairs, the mamaDuck last if present
+    offsets  string_count + 1 uint32 offsets into the string data
+    strings  UTF-8 bytes of every distinct name and color
+
+The header's size and mtime are compared with the source file on open; a
+stale snapshot is rebuilt automatically.
+"""
+import mmap
+import os
+import struct
+from array import array
+
+import numpy as np
+
+from RubberDucksFormatter import iter_flock
+
+MAGIC = b"FLOCKSN1"
+_HEADER = struct.Struct("<8sQqIIIQ")
+RECORD_DTYPE = np.dtype([("name", "<u4"), ("color", "<u4")])
+
+
+def snapshot_path_for(json_path):
+    """Default snapshot location: next to the JSON file, with .snap appended."""
+    return json_path + ".snap"
+
+
+def compile_snapshot(json_path, snapshot_path=None):
+    """
+    Parse a flock file once and write its snapshot.
+
+    The file is streamed with iter_flock, so only the string table and the
+    8-byte records are held in memory. The snapshot is written to a
+    temporary file and moved into place, so readers never see half of it.
+
+    Returns:
+        str: Path of the snapshot
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(json_path)
+    # Stat before reading: if the file changes meanwhile the snapshot is stale
+    stat = os.stat(json_path)
+
+    ids = {}
+    blobs = []
+    records = array("I")
+    mama = None
+
+    def string_id(text):
+        index = ids.get(text)
+        if index is None:
+            index = ids[text] = len(blobs)
+            blobs.append(text.encode("utf-8"))
+        return index
+
+    with open(json_path, "r", encoding="utf-8") as file:
+        for kind, value in iter_flock(file):
+            if kind == "duck":
+                records.append(string_id(value["name"]))
+                records.append(string_id(value["color"]))
+            elif kind == "mamaDuck":
+                mama = (string_id(value["name"]), string_id(value["color"]))
+
+    duck_count = len(records) // 2
+    if mama is not None:
+        records.extend(mama)
+
+    offsets = np.zeros(len(blobs) + 1, dtype="<u4")
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    data_size = int(offsets[-1])
+
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as out:
+            out.write(_HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, duck_count,
+                                   int(mama is not None), len(blobs), data_size))
+            out.write(np.asarray(records, dtype="<u4").tobytes())
+            out.write(offsets.tobytes())
+            for blob in blobs:
+                out.write(blob)
+        os.replace(temp_path, snapshot_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return snapshot_path
+
+
+class FlockSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot.
+
+    Records and string offsets are NumPy views of the mapping, nothing is
+    copied on open; names are decoded only when a duck is read. Iterating
+    yields {"name", "color"} dicts, so the snapshot can stand in for the
+    "ducks" list anywhere, e.g. RubberDucksFormatter(snapshot).
+    """
+
+    def __init__(self, snapshot_path):
+        with open(snapshot_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.records = self.offsets = None
+        try:
+            self._map_tables(snapshot_path)
+        except BaseException:
+            # A snapshot that fails validation must not leak its mapping
+            self.close()
+            raise
+        # Colors repeat across many ducks, so their decoded strings are kept
+        self._colors = {}
+
+    def _map_tables(self, snapshot_path):
+        (magic, self.source_size, self.source_mtime_ns, self.duck_count,
+         has_mama, string_count, data_size) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a flock snapshot: {snapshot_path}")
+
+        offset = _HEADER.size
+        record_count = self.duck_count + has_mama
+        self._data_start = (offset + record_count * RECORD_DTYPE.itemsize
+                            + (string_count + 1) * 4)
+        if self._data_start + data_size > len(self._mmap):
+            raise ValueError(f"Truncated flock snapshot: {snapshot_path}")
+        self.records = np.frombuffer(self._mmap, RECORD_DTYPE, record_count, offset)
+        offset += record_count * RECORD_DTYPE.itemsize
+        self.offsets = np.frombuffer(self._mmap, "<u4", string_count + 1, offset)
+        self._has_mama = bool(has_mama)
+
+    def close(self):
+        # Drop the views first, an mmap with live exports cannot be closed
+        self.records = self.offsets = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A caller still holds a view of the records or offsets; the
+            # mapping is released once the last view is collected
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_fresh(self, json_path):
+        """True if json_path still has the size and mtime it was compiled from."""
+        try:
+            stat = os.stat(json_path)
+        except OSError:
+            return False
+        return stat.st_size == self.source_size and stat.st_mtime_ns == self.source_mtime_ns
+
+    def _check_open(self):
+        if self.records is None:
+            raise ValueError("Flock snapshot is closed")
+
+    def string(self, index):
+        self._check_open()
+        start = self._data_start + int(self.offsets[index])
+        end = self._data_start + int(self.offsets[index + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def _duck(self, name_id, color_id):
+        color = self._colors.get(color_id)
+        if color is None:
+            color = self._colors[color_id] = self.string(color_id)
+        return {"name": self.string(name_id), "color": color}
+
+    @property
+    def mama_duck(self):
+        if not self._has_mama:
+            return None
+        return self._duck(*self.records[self.duck_count].tolist())
+
+    def __len__(self):
+        return self.duck_count
+
+    def __getitem__(self, index):
+        if not -self.duck_count <= index < self.duck_count:
+            raise IndexError("duck index out of range")
+        return self._duck(*self.records[index % self.duck_count].tolist())
+
+    def __iter__(self, block=1 << 16):
+        # Name offsets are gathered a block at a time with NumPy and turned
+        # into Python ints, which are much faster to slice with. Only those
+        # lists live across a yield, no view of the mapping, so close()
+        # works while an iteration is suspended
+        data = self._data_start
+        mm = self._mmap
+        colors = self._colors
+        for top in range(0, self.duck_count, block):
+            self._check_open()
+            records = self.records[top:min(top + block, self.duck_count)]
+            names = records["name"]
+            starts = (self.offsets[names] + data).tolist()
+            ends = (self.offsets[names + 1] + data).tolist()
+            color_ids = records["color"].tolist()
+            del records, names
+            for start, end, color_id in zip(starts, ends, color_ids):
+                color = colors.get(color_id)
+                if color is None:
+                    color = colors[color_id] = self.string(color_id)
+                yield {"name": mm[start:end].decode("utf-8"), "color": color}
+
+
+def load_flock(json_path, snapshot_path=None):
+    """
+    Open the snapshot of json_path, compiling or rebuilding it if missing
+    or stale.
+
+    Returns:
+        FlockSnapshot: Close it (or use it as a context manager) when done
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(json_path)
+    try:
+        snapshot = FlockSnapshot(snapshot_path)
+    except (OSError, ValueError, struct.error):
+        snapshot = None
+    if snapshot is not None and snapshot.is_fresh(json_path):
+        return snapshot
+    if snapshot is not None:
+        snapshot.close()
+
+    compile_snapshot(json_path, snapshot_path)
+    return FlockSnapshot(snapshot_path)
@@ -0,0 +1,199 @@
+"""
+Shared image loading with an LRU cache of decoded images.
+
+Entries are keyed by (path, mtime, size, mode, ...), so an edited file is
+decoded again while repeat previews and option changes skip the JPEG/PNG
+decode. The cache holds decoded arrays, PIL images and display-sized
+thumbnails under one byte budget.
+
+Cached objects are shared: copy them before modifying pixels in place.
+Arrays are returned read-only to make accidental writes fail loudly.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+DEFAULT_BUDGET_BYTES = 512 * 1024 * 1024
+
+# Modes whose pixel layout Image.frombuffer can use in place
+_SHARED_MODES = ("RGBA", "RGBX", "L")
+
+
+class ImageCache:
+    """Thread-safe LRU cache bounded by the total size of its entries."""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                # Would evict everything else and still not fit
+                return
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+
+
+_cache = ImageCache()
+
+
+def set_cache_budget(max_bytes):
+    """Change the byte budget of the shared cache, evicting if needed."""
+    _cache.set_budget(max_bytes)
+
+
+def clear_cache():
+    """Drop every cached image."""
+    _cache.clear()
+
+
+def _file_key(path, *extra):
+    # mtime and size catch the file being replaced between loads
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size) + extra
+
+
+def _image_nbytes(img):
+    # PIL stores 3-band images with 4 bytes per pixel
+    bands = len(img.getbands())
+    return img.width * img.height * (4 if bands == 3 else bands)
+
+
+def _decode(path, mode, exif_transpose):
+    img = Image.open(path)
+    if exif_transpose:
+        img = ImageOps.exif_transpose(img)
+    if img.mode != mode:
+        img = img.convert(mode)
+    else:
+        img.load()
+    return img
+
+
+def load_image(path, mode="RGB", exif_transpose=False):
+    """
+    Load a decoded PIL image, from the cache when possible.
+
+    Args:
+        path (str): Image file
+        mode (str): PIL mode to convert to
+        exif_transpose (bool): Apply the EXIF orientation, as cv2.imread does
+
+    Returns:
+        PIL.Image.Image: Shared decoded image, copy it before modifying
+    """
+    key = _file_key(path, "image", mode, exif_transpose)
+    img = _cache.get(key)
+    if img is None:
+        img = _decode(path, mode, exif_transpose)
+        _cache.put(key, img, _image_nbytes(img))
+    return img
+
+
+def load_array(path, mode="RGB", exif_transpose=False):
+    """
+    Load a decoded image as a read-only HxWxC uint8 array, from the cache
+    when possible.
+    """
+    key = _file_key(path, "array", mode, exif_transpose)
+    arr = _cache.get(key)
+    if arr is None:
+        arr = np.array(_decode(path, mode, exif_transpose))
+        arr.flags.writeable = False
+        _cache.put(key, arr, arr.nbytes)
+    return arr
+
+
+def load_image_and_array(path, mode="RGBA", exif_transpose=False):
+    """
+    Load an image both as a PIL image and as a read-only array, decoding
+    the file once and caching the pair as a single entry.
+
+    For modes Pillow can wrap without copying (RGBA, RGBX, L) the image is
+    a view of the array, so only one full-resolution copy is kept.
+
+    Returns:
+        tuple: (PIL.Image.Image, np.ndarray), shared, copy before modifying
+    """
+    key = _file_key(path, "image+array", mode, exif_transpose)
+    pair = _cache.get(key)
+    if pair is None:
+        img = _decode(path, mode, exif_transpose)
+        arr = np.array(img)
+        arr.flags.writeable = False
+        nbytes = arr.nbytes
+        if mode in _SHARED_MODES:
+            img = Image.frombuffer(mode, img.size, arr, "raw", mode, 0, 1)
+        else:
+            nbytes += _image_nbytes(img)
+        pair = (img, arr)
+        _cache.put(key, pair, nbytes)
+    return pair
+
+
+def load_thumbnail(path, max_size, mode="RGB", exif_transpose=False):
+    """
+    Load a display-sized copy of an image that fits within max_size.
+
+    JPEGs are decoded in draft mode straight at a reduced scale, so the full
+    resolution image is never built. Thumbnails are cached separately from
+    full images.
+
+    Args:
+        path (str): Image file
+        max_size (tuple): (max_width, max_height)
+        mode (str): PIL mode to convert to
+        exif_transpose (bool): Apply the EXIF orientation
+
+    Returns:
+        PIL.Image.Image: Shared thumbnail, copy it before modifying
+    """
+    max_size = (int(max_size[0]), int(max_size[1]))
+    key = _file_key(path, "thumbnail", mode, exif_transpose, max_size)
+    thumb = _cache.get(key)
+    if thumb is None:
+        thumb = Image.open(path)
+        if thumb.format == "JPEG":
+            # Orientation may swap the axes, so draft for the larger side
+            side = max(max_size) if exif_transpose else None
+            thumb.draft(mode, (side, side) if side else max_size)
+        if exif_transpose:
+            thumb = ImageOps.exif_transpose(thumb)
+        if thumb.mode != mode:
+            thumb = thumb.convert(mode)
+        thumb.thumbnail(max_size, Image.LANCZOS)
+        _cache.put(key, thumb, _image_nbytes(thumb))
+    return thumb
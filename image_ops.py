@@ -0,0 +1,206 @@
+"""
+Array-in, array-out image operations shared by the GUIs and batch tools.
+
+Nothing here imports tkinter, and OpenCV is only imported the first time
+a resize can use it, so batch workers start quickly and run on machines
+without a display. Arrays are HxWx3 RGB or HxWx4 RGBA uint8 unless noted.
+
+    import image_ops
+    rgba = image_ops.key(arr, (0, 177, 64), 40, feather=8)
+    flat = image_ops.composite(rgba, (255, 255, 255))
+    thumb = image_ops.resize(flat, image_ops.fit_size(flat.shape[1::-1], (700, 400)))
+"""
+import numpy as np
+from PIL import Image
+
+import channel_swap
+import color_lut
+import keying
+
+FAST_FILTER = Image.BILINEAR
+FINAL_FILTER = Image.LANCZOS
+
+_cv2 = None
+
+
+def _opencv():
+    # Imported on first use; False once it is known to be missing
+    global _cv2
+    if _cv2 is None:
+        try:
+            import cv2
+            _cv2 = cv2
+        except ImportError:
+            _cv2 = False
+    return _cv2
+
+
+def _check_channels(arr, channels):
+    # Fail with a clear message rather than a numpy broadcast error
+    if arr.ndim != 3 or arr.shape[2] not in channels:
+        expected = " or ".join(f"HxWx{c}" for c in channels)
+        raise ValueError(f"Expected an {expected} image, got shape {arr.shape}")
+
+
+def fit_size(size, max_size, upscale=False):
+    """Largest size with the aspect ratio of size that fits within max_size."""
+    width, height = size
+    ratio = min(max_size[0] / width, max_size[1] / height)
+    if ratio >= 1 and not upscale:
+        return width, height
+    return max(1, int(width * ratio)), max(1, int(height * ratio))
+
+
+def scale_image(image, size, final=False):
+    """
+    Resize a PIL image to size for display.
+
+    The fast path point-samples large reductions down to twice the target
+    size and box-averages 2x2 blocks with Image.reduce, which touches only a
+    small fraction of the source pixels. Smaller reductions use
+    Image.reduce plus a bilinear resize. The final path uses LANCZOS.
+    """
+    size = tuple(size)
+    if image.size == size:
+        return image
+    if final:
+        return image.resize(size, FINAL_FILTER, reducing_gap=3.0)
+
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor >= 4:
+        return image.resize((size[0] * 2, size[1] * 2), Image.NEAREST).reduce(2)
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(size, FAST_FILTER)
+
+
+def swap(arr, order, out=None):
+    """
+    Reorder the RGB channels of an array, keeping any alpha channel.
+
+    Args:
+        arr (np.ndarray): HxWx3 or HxWx4 uint8 image
+        order (str): Swap option (RG, RB, GB) or channel order (e.g. BRG)
+        out (np.ndarray, optional): Destination; pass arr itself to swap in
+            place in bands without a full-size temporary
+
+    Returns:
+        np.ndarray: The reordered image (out, if given)
+    """
+    _check_channels(arr, (3, 4))
+    if out is arr:
+        return channel_swap.permute_array(arr, order)
+
+    indices = list(channel_swap.channel_indices(order)) + list(range(3, arr.shape[2]))
+    if out is None:
+        return arr[:, :, indices]
+    out[...] = arr[:, :, indices]
+    return out
+
+
+def transform(arr, spec, out=None):
+    """
+    Apply a color transform, keeping any alpha channel.
+
+    Args:
+        arr (np.ndarray): HxWx3 or HxWx4 uint8 image
+        spec: color_lut.ColorTransform, or a preset name, .cube path or
+            matrix for color_lut.parse_transform
+        out (np.ndarray, optional): Destination, may be arr itself
+
+    Returns:
+        np.ndarray: The transformed image (out, if given)
+    """
+    if isinstance(spec, str):
+        spec = color_lut.parse_transform(spec)
+    return spec.apply_array(arr, out=out)
+
+
+def key(arr, color, tolerance, metric="rgb", keys=None, feather=0, seeds=None, workers=None, out=None):
+    """
+    Key a background color out of an image.
+
+    Args:
+        arr (np.ndarray): HxWx3 RGB or HxWx4 RGBA uint8 image
+        color (sequence): Key color (R, G, B)
+        tolerance (float): Maximum distance that is keyed out
+        metric (str): Distance metric, see color_metrics.METRICS
+        keys (list, optional): Further (color, tolerance) pairs, keyed hard
+        feather (float): Width of the soft edge after tolerance, 0 for hard
+        seeds (list, optional): (x, y) pixels; when given only the keyed
+            regions connected to them are removed
+        workers (int, optional): Threads, defaults to the CPU count
+        out (np.ndarray, optional): HxWx4 uint8 buffer to write into
+
+    Returns:
+        np.ndarray: HxWx4 RGBA uint8 image
+    """
+    rgba = keying.remove_background_parallel(arr, color, tolerance, metric, keys=keys,
+                                             feather=feather, workers=workers, out=out)
+    if seeds is not None:
+        base_alpha = arr[:, :, 3] if arr.shape[2] == 4 else None
+        rgba[:, :, 3] = keying.contiguous_alpha(rgba[:, :, 3], seeds, base_alpha)
+    return rgba
+
+
+def composite(rgba, background=(255, 255, 255), band_rows=256, out=None):
+    """
+    Flatten an RGBA image over a background (alpha "over" blending).
+
+    Args:
+        rgba (np.ndarray): HxWx4 uint8 image
+        background (sequence or np.ndarray): (R, G, B) color, or an HxWx3
+            uint8 image of the same size
+        band_rows (int): Rows blended at a time, bounds the uint16 temporaries
+        out (np.ndarray, optional): HxWx3 uint8 buffer to write into
+
+    Returns:
+        np.ndarray: HxWx3 RGB uint8 image
+    """
+    _check_channels(rgba, (4,))
+    height, width = rgba.shape[:2]
+    background = np.asarray(background, dtype=np.uint16)
+    if background.shape not in ((3,), (height, width, 3)):
+        raise ValueError(f"Background must be an (R, G, B) color or an {height}x{width}x3 image, "
+                         f"got shape {background.shape}")
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+
+    for top in range(0, height, band_rows):
+        band = rgba[top:top + band_rows]
+        alpha = band[:, :, 3:].astype(np.uint16)
+        bg = background[top:top + band_rows] if background.ndim == 3 else background
+        # Rounded (fg * a + bg * (255 - a)) / 255, exact for a = 0 and 255
+        blended = band[:, :, :3] * alpha
+        blended += bg * (255 - alpha)
+        blended += 127
+        blended //= 255
+        out[top:top + band_rows] = blended
+    return out
+
+
+def resize(arr, size, final=False):
+    """
+    Resize an array to size (width, height).
+
+    Reductions use OpenCV's INTER_AREA when it is installed, which averages
+    every source pixel in one fast pass; enlargements use bilinear, or
+    Lanczos when final. Without OpenCV, scale_image is used.
+
+    Returns:
+        np.ndarray: Resized uint8 array with the same number of channels
+    """
+    size = (int(size[0]), int(size[1]))
+    if size[0] < 1 or size[1] < 1:
+        raise ValueError(f"Size must be at least 1x1, got {size[0]}x{size[1]}")
+    if (arr.shape[1], arr.shape[0]) == size:
+        return arr
+
+    cv2 = _opencv()
+    if cv2:
+        if size[0] <= arr.shape[1] and size[1] <= arr.shape[0]:
+            interpolation = cv2.INTER_AREA
+        else:
+            interpolation = cv2.INTER_LANCZOS4 if final else cv2.INTER_LINEAR
+        return cv2.resize(arr, size, interpolation=interpolation)
+    return np.asarray(scale_image(Image.fromarray(arr), size, final))
@@ -0,0 +1,103 @@
+"""
+Encoder settings for keyed (RGBA) results and their alpha masks.
+
+The format follows the file extension. PNG takes a zlib compress_level
+(0-9) and optimize, which makes Pillow search for the smallest encoding.
+WebP is always written lossless, so the key stays exact, with
+compress_level mapped to the encoder effort.
+
+Every setting trades encode time for file size: lower levels are faster
+and larger, optimize is slower and a little smaller, and lossless WebP is
+usually much smaller than PNG at a similar speed. Writing only the mask is
+far cheaper than the full image. Run benchmarks/bench_encode.py for the
+numbers on your own images.
+"""
+import os
+
+from PIL import Image
+
+DEFAULT_COMPRESS_LEVEL = 6
+
+# What to write for each keyed result
+OUTPUT_MODES = ("image", "mask", "both")
+
+MASK_EXTENSIONS = (".png", ".tif", ".tiff")
+
+
+def encoder_options(path, compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False):
+    """
+    Pillow save() keyword arguments for path's format.
+
+    Args:
+        path (str): Output path, its extension picks the format
+        compress_level (int): 0 (fastest, largest) to 9 (slowest, smallest)
+        optimize (bool): Spend extra time for the smallest file
+
+    Returns:
+        dict: Keyword arguments for PIL.Image.Image.save
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".png":
+        return {"compress_level": compress_level, "optimize": optimize}
+    if ext == ".webp":
+        # For lossless WebP, quality and method only trade effort for size
+        if optimize:
+            return {"lossless": True, "quality": 100, "method": 6}
+        return {"lossless": True, "quality": round(compress_level * 100 / 9),
+                "method": round(compress_level * 6 / 9)}
+    if ext in (".tif", ".tiff"):
+        return {"compression": "tiff_adobe_deflate"} if compress_level else {}
+    return {}
+
+
+def mask_path_for(path):
+    """Path of the mask written next to path: <name>_mask.png (or .tif)."""
+    root, ext = os.path.splitext(path)
+    return root + "_mask" + (ext if ext.lower() in MASK_EXTENSIONS else ".png")
+
+
+def save_image(image, path, compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False):
+    """Save image to path with the encoder settings for its format."""
+    image.save(path, **encoder_options(path, compress_level, optimize))
+
+
+def save_mask(image, path, compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False):
+    """
+    Save the alpha channel of an RGBA image as a single-channel image.
+
+    Raises:
+        ValueError: If path is not a MASK_EXTENSIONS format; WebP has no
+            grayscale mode and would store the mask as RGB
+    """
+    if os.path.splitext(path)[1].lower() not in MASK_EXTENSIONS:
+        raise ValueError(f"Masks are saved as PNG or TIFF, not {os.path.basename(path)}")
+    save_image(image.getchannel("A"), path, compress_level, optimize)
+
+
+def save_keyed(image, path, output="image", compress_level=DEFAULT_COMPRESS_LEVEL, optimize=False):
+    """
+    Write a keyed result as an RGBA image, a mask, or both.
+
+    Args:
+        image (PIL.Image.Image): RGBA result
+        path (str): Output path; with output="both" the mask goes to
+            mask_path_for(path), with output="mask" it must be .png or .tif
+        output (str): One of OUTPUT_MODES
+        compress_level (int): 0 (fastest) to 9 (smallest)
+        optimize (bool): Spend extra time for the smallest file
+
+    Returns:
+        list: Paths that were written
+    """
+    if output not in OUTPUT_MODES:
+        raise ValueError(f"Invalid output mode: {output}")
+    if output == "mask":
+        save_mask(image, path, compress_level, optimize)
+        return [path]
+
+    save_image(image, path, compress_level, optimize)
+    if output == "image":
+        return [path]
+    mask_path = mask_path_for(path)
+    save_mask(image, mask_path, compress_level, optimize)
+    return [path, mask_path]
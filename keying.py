@@ -0,0 +1,481 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import color_metrics
+
+
+def color_distance_sq(img_rgb, target_color):
+    """
+    Compute the squared Euclidean RGB distance of every pixel to a target color.
+
+    Args:
+        img_rgb (np.ndarray): HxWx3 (or HxWx4, alpha is ignored) uint8 image
+        target_color (sequence): Target (R, G, B) color
+
+    Returns:
+        np.ndarray: HxW int32 array of squared distances
+    """
+    target = np.asarray(target_color[:3], dtype=np.int32)
+
+    # Accumulate one channel at a time so only a single int32 plane is live
+    dist_sq = np.zeros(img_rgb.shape[:2], dtype=np.int32)
+    for c in range(3):
+        diff = img_rgb[:, :, c].astype(np.int32)
+        diff -= target[c]
+        diff *= diff
+        dist_sq += diff
+    return dist_sq
+
+
+def key_mask(img_rgb, target_color, color_range, metric="rgb"):
+    """
+    Return a boolean mask of the pixels that should become transparent.
+
+    A pixel is keyed out when its distance to target_color is within
+    color_range (distance <= color_range). For the default RGB metric squared
+    distances are compared so no square root is taken; other metrics are
+    listed in color_metrics.METRICS.
+    """
+    if metric != "rgb":
+        spaces = color_metrics.ColorSpaceCache(img_rgb)
+        return color_metrics.color_distance(spaces, target_color, metric) <= color_range
+    return color_distance_sq(img_rgb, target_color) <= color_range * color_range
+
+
+def alpha_mask(img_rgb, target_color, color_range, alpha=None, metric="rgb"):
+    """
+    Build the alpha channel for a keyed image.
+
+    Args:
+        img_rgb (np.ndarray): HxWx3 uint8 image
+        target_color (sequence): Target (R, G, B) color
+        color_range (float): Maximum distance that is keyed out
+        alpha (np.ndarray, optional): Existing HxW alpha channel to keep for
+            pixels that are not keyed out. Defaults to fully opaque.
+        metric (str): Distance metric, see color_metrics.METRICS
+
+    Returns:
+        np.ndarray: HxW uint8 alpha channel
+    """
+    return alpha_from_mask(key_mask(img_rgb, target_color, color_range, metric), alpha)
+
+
+def multi_key_mask(img_rgb, keys, metric="rgb", chunk_pixels=1 << 20):
+    """
+    Union mask of several (color, color_range) keys in a single pass.
+
+    The image is walked in bands of about chunk_pixels pixels and every key
+    is tested against a band while it is in cache, so temporaries stay the
+    size of one band no matter how many keys there are, instead of an
+    N x H x W distance tensor or N full passes.
+
+    Args:
+        img_rgb (np.ndarray): HxWx3 (or HxWx4) uint8 image
+        keys (list): (target_color, color_range) pairs
+        metric (str): Distance metric, see color_metrics.METRICS
+        chunk_pixels (int): Approximate number of pixels per band
+
+    Returns:
+        np.ndarray: HxW boolean mask, True where any key matches
+    """
+    height, width = img_rgb.shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    rows = max(1, chunk_pixels // max(1, width))
+
+    for top in range(0, height, rows):
+        band = img_rgb[top:top + rows]
+        band_mask = mask[top:top + rows]
+        spaces = None if metric == "rgb" else color_metrics.ColorSpaceCache(band)
+        for target_color, color_range in keys:
+            if metric == "rgb":
+                band_mask |= color_distance_sq(band, target_color) <= color_range * color_range
+            else:
+                band_mask |= color_metrics.color_distance(spaces, target_color, metric) <= color_range
+    return mask
+
+
+def alpha_from_mask(mask, alpha=None):
+    """Turn a keyed-out mask into an alpha channel, keeping alpha elsewhere."""
+    # uint8 scalars keep np.where from building an int64 image first
+    if alpha is None:
+        return np.where(mask, np.uint8(0), np.uint8(255))
+    return np.where(mask, np.uint8(0), alpha).astype(np.uint8, copy=False)
+
+
+def soft_ramp(distance, inner, outer):
+    """
+    Map distances to alpha: 0 up to inner, 255 from outer, linear between.
+    """
+    if outer <= inner:
+        return np.where(distance <= inner, 0, 255).astype(np.uint8)
+    ramp = (np.asarray(distance, dtype=np.float32) - inner) * (255.0 / (outer - inner))
+    return np.clip(ramp + 0.5, 0, 255).astype(np.uint8)
+
+
+def combine_alpha(soft, alpha):
+    """Multiply a keyed alpha with an existing alpha channel (both uint8)."""
+    return ((soft.astype(np.uint16) * alpha + 127) // 255).astype(np.uint8)
+
+
+def edge_band_indices(mask, radius):
+    """
+    Flat indices of the pixels within radius (Chebyshev) of a mask boundary.
+
+    Boundary pixels are found by comparing each pixel with its right and
+    lower neighbor, then grown by radius with a binary dilation, so memory
+    stays at one byte per pixel whatever the radius.
+    """
+    edges = np.zeros(mask.shape, dtype=bool)
+    horizontal = mask[:, 1:] != mask[:, :-1]
+    vertical = mask[1:, :] != mask[:-1, :]
+    edges[:, 1:] |= horizontal
+    edges[:, :-1] |= horizontal
+    edges[1:, :] |= vertical
+    edges[:-1, :] |= vertical
+
+    if radius > 0:
+        import cv2  # Only needed for edge refinement
+
+        kernel = np.ones((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+        edges = cv2.dilate(edges.view(np.uint8), kernel).view(bool)
+    return np.flatnonzero(edges)
+
+
+def connected_region(mask, seeds, connectivity=4):
+    """
+    Keep only the parts of a keyed-out mask that are connected to a seed.
+
+    Uses OpenCV's scanline flood fill, one fill per seed, on a uint8 copy
+    of the mask, so the cost is linear in the image size and no label
+    image is allocated.
+
+    Args:
+        mask (np.ndarray): HxW bool mask of keyed-out pixels
+        seeds (iterable): (x, y) pixel coordinates, e.g. the clicked points
+        connectivity (int): 4 or 8
+
+    Returns:
+        np.ndarray: HxW bool mask of the seed-connected keyed-out pixels
+    """
+    import cv2  # Only needed for this mode
+
+    height, width = mask.shape
+    region = mask.astype(np.uint8)
+    for x, y in seeds:
+        x, y = int(x), int(y)
+        # Seeds outside the mask, or already filled from another seed, do nothing
+        if 0 <= x < width and 0 <= y < height and region[y, x] == 1:
+            cv2.floodFill(region, None, (x, y), 2, 0, 0, connectivity | cv2.FLOODFILL_FIXED_RANGE)
+    return region == 2
+
+
+def contiguous_alpha(alpha, seeds, base_alpha=None, connectivity=4):
+    """
+    Undo the keying of pixels that are not connected to a seed.
+
+    Any pixel whose alpha was lowered counts as keyed out, so soft edges
+    connected to the removed region are kept as well.
+
+    Args:
+        alpha (np.ndarray): HxW uint8 keyed alpha channel
+        seeds (iterable): (x, y) pixel coordinates
+        base_alpha (np.ndarray, optional): Alpha before keying, 255 if None
+        connectivity (int): 4 or 8
+
+    Returns:
+        np.ndarray: HxW uint8 alpha channel
+    """
+    keyed = alpha < (255 if base_alpha is None else base_alpha)
+    region = connected_region(keyed, seeds, connectivity)
+    return np.where(region, alpha, 255 if base_alpha is None else base_alpha).astype(np.uint8)
+
+
+def remove_background(img, target_color=None, color_range=None, metric="rgb", keys=None):
+    """
+    Make every pixel close to target_color transparent.
+
+    Args:
+        img (np.ndarray): HxWx3 RGB or HxWx4 RGBA uint8 image
+        target_color (sequence): Target (R, G, B) color
+        color_range (float): Maximum distance that is keyed out
+        metric (str): Distance metric, see color_metrics.METRICS
+        keys (list, optional): Further (color, color_range) pairs; pixels
+            matching any key are keyed out, computed in one pass
+
+    Returns:
+        np.ndarray: HxWx4 RGBA uint8 image
+    """
+    height, width = img.shape[:2]
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[:, :, :3] = img[:, :, :3]
+
+    existing_alpha = img[:, :, 3] if img.shape[2] == 4 else None
+    if keys:
+        keys = list(keys)
+        if target_color is not None:
+            keys.append((target_color, color_range))
+        rgba[:, :, 3] = alpha_from_mask(multi_key_mask(img, keys, metric), existing_alpha)
+    else:
+        rgba[:, :, 3] = alpha_mask(img, target_color, color_range, existing_alpha, metric)
+    return rgba
+
+
+def _key_band(band, out_band, keys, feather_key, metric):
+    # Keys one band into its slice of the output; NumPy drops the GIL inside
+    # the distance arithmetic, so bands on different threads run in parallel
+    out_band[:, :, :3] = band[:, :, :3]
+    existing_alpha = band[:, :, 3] if band.shape[2] == 4 else None
+
+    if feather_key is None:
+        mask = multi_key_mask(band, keys, metric, chunk_pixels=band.shape[0] * band.shape[1])
+        out_band[:, :, 3] = alpha_from_mask(mask, existing_alpha)
+        return
+
+    (target_color, inner, outer) = feather_key
+    if metric == "rgb":
+        distance = np.sqrt(color_distance_sq(band, target_color), dtype=np.float32)
+    else:
+        distance = color_metrics.color_distance(color_metrics.ColorSpaceCache(band), target_color, metric)
+    alpha = soft_ramp(distance, inner, outer)
+    if existing_alpha is not None:
+        alpha = combine_alpha(alpha, existing_alpha)
+    if keys:
+        # Extra keys stay hard-edged
+        alpha[multi_key_mask(band, keys, metric, chunk_pixels=band.shape[0] * band.shape[1])] = 0
+    out_band[:, :, 3] = alpha
+
+
+def remove_background_parallel(img, target_color=None, color_range=None, metric="rgb", keys=None,
+                               feather=0, workers=None, band_rows=None, out=None):
+    """
+    remove_background split into row bands that are keyed on a thread pool.
+
+    Every band computes its distances, mask and alpha and writes them
+    straight into its rows of one preallocated RGBA buffer, so nothing is
+    gathered or copied afterwards and peak memory stays one output image
+    plus a band of temporaries per worker.
+
+    Args:
+        img (np.ndarray): HxWx3 RGB or HxWx4 RGBA uint8 image
+        target_color (sequence): Target (R, G, B) color
+        color_range (float): Maximum distance that is keyed out
+        metric (str): Distance metric, see color_metrics.METRICS
+        keys (list, optional): Further (color, color_range) pairs, keyed hard
+        feather (float): Width of the soft ramp after color_range, 0 for a
+            hard key
+        workers (int, optional): Threads to use, defaults to the CPU count
+        band_rows (int, optional): Rows per band, defaults to a few bands
+            per worker
+        out (np.ndarray, optional): HxWx4 uint8 buffer to write into
+
+    Returns:
+        np.ndarray: HxWx4 RGBA uint8 image (out, if given)
+    """
+    height, width = img.shape[:2]
+    if out is None:
+        out = np.empty((height, width, 4), dtype=np.uint8)
+    workers = workers or os.cpu_count() or 1
+
+    keys = list(keys or [])
+    feather_key = None
+    if target_color is not None:
+        if feather > 0:
+            feather_key = (target_color, color_range, color_range + feather)
+        else:
+            keys.append((target_color, color_range))
+
+    # A few bands per worker balance uneven bands without much overhead
+    if band_rows is None:
+        band_rows = max(16, -(-height // (workers * 4)))
+    bands = [(top, min(top + band_rows, height)) for top in range(0, height, band_rows)]
+
+    def run(rows):
+        top, bottom = rows
+        _key_band(img[top:bottom], out[top:bottom], keys, feather_key, metric)
+
+    if workers == 1 or len(bands) == 1:
+        for rows in bands:
+            run(rows)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() re-raises the first error from a band
+            list(executor.map(run, bands))
+    return out
+
+
+class DistanceMap:
+    """
+    Per-pixel distance to one target color, computed once.
+
+    For the "rgb" metric the squared RGB distance is stored as uint16,
+    saturating at 65535, so tolerances up to 255 are answered from the map
+    alone. Perceptual metrics (see color_metrics.METRICS) store the distance
+    in fixed point, 1/QUANT units, which covers every distance they produce.
+    Changing the tolerance is then a single comparison instead of a full
+    distance computation.
+    """
+
+    SATURATED = np.iinfo(np.uint16).max
+    MAX_EXACT_RANGE = 255
+    QUANT = 64
+
+    # ceil(distance) for every possible stored value, so a pixel with entry
+    # k is keyed out exactly when color_range >= k
+    _CEIL_SQRT = np.ceil(np.sqrt(np.arange(SATURATED + 1))).astype(np.uint16)
+    _CEIL_FIXED = np.ceil(np.arange(SATURATED + 1) / QUANT).astype(np.uint16)
+
+    def __init__(self, img_rgb, target_color, metric="rgb", spaces=None):
+        """
+        Args:
+            img_rgb (np.ndarray): HxWx3 (or HxWx4) uint8 image
+            target_color (sequence): Target (R, G, B) color
+            metric (str): One of color_metrics.METRICS
+            spaces (color_metrics.ColorSpaceCache, optional): Cached color
+                space conversions of img_rgb, used by perceptual metrics
+        """
+        self.img_rgb = img_rgb
+        self.target_color = tuple(int(v) for v in target_color[:3])
+        self.metric = metric
+        self._cumulative = None
+
+        if metric == "rgb":
+            values = color_distance_sq(img_rgb, self.target_color)
+            np.minimum(values, self.SATURATED, out=values)
+        else:
+            if spaces is None or spaces.img_rgb is not img_rgb:
+                spaces = color_metrics.ColorSpaceCache(img_rgb)
+            values = color_metrics.color_distance(spaces, self.target_color, metric)
+            values *= self.QUANT
+            np.rint(values, out=values)
+            np.minimum(values, self.SATURATED, out=values)
+        self.values = values.astype(np.uint16)
+
+    def matches(self, img_rgb, target_color, metric="rgb"):
+        """Return True if this map was built for img_rgb, target_color and metric."""
+        return (self.img_rgb is img_rgb
+                and self.metric == metric
+                and self.target_color == tuple(int(v) for v in target_color[:3]))
+
+    def mask(self, color_range):
+        """Boolean mask of the pixels within color_range of the target."""
+        if self.metric != "rgb":
+            return self.values <= color_range * self.QUANT
+
+        threshold = color_range * color_range
+        if threshold < self.SATURATED:
+            return self.values <= threshold
+
+        # Saturated entries may still be in range, check those exactly
+        saturated = self.values == self.SATURATED
+        mask = ~saturated
+        far_pixels = self.img_rgb[saturated][:, None]
+        mask[saturated] = color_distance_sq(far_pixels, self.target_color)[:, 0] <= threshold
+        return mask
+
+    def alpha(self, color_range, alpha=None):
+        """Alpha channel keyed at color_range, see alpha_mask."""
+        return alpha_from_mask(self.mask(color_range), alpha)
+
+    def _soft_table(self, inner, outer):
+        # Alpha for every possible stored value, so keying is one gather
+        if self.metric == "rgb":
+            distance = np.sqrt(np.arange(self.SATURATED + 1, dtype=np.float32))
+        else:
+            distance = np.arange(self.SATURATED + 1, dtype=np.float32) / self.QUANT
+        table = soft_ramp(distance, inner, outer)
+        if self.metric == "rgb":
+            # Saturated entries are further than any representable distance
+            table[self.SATURATED] = 255
+        return table
+
+    def _soft(self, inner, outer, index=None):
+        # Soft alpha of the pixels at the given flat indices (all if None)
+        values = self.values.ravel() if index is None else self.values.ravel()[index]
+        soft = self._soft_table(inner, outer)[values]
+        if self.metric == "rgb" and outer * outer >= self.SATURATED:
+            # Saturated entries may still be inside the ramp, check those exactly
+            saturated = np.flatnonzero(values == self.SATURATED)
+            pixels = self.img_rgb.reshape(-1, self.img_rgb.shape[-1])
+            far = pixels[saturated if index is None else index[saturated]]
+            distance = np.sqrt(color_distance_sq(far[:, None], self.target_color)[:, 0])
+            soft[saturated] = soft_ramp(distance, inner, outer)
+        return soft
+
+    def soft_alpha(self, inner, outer, alpha=None):
+        """
+        Feathered alpha: transparent within inner, opaque beyond outer and
+        linear in between, computed in one table lookup per pixel.
+        """
+        soft = self._soft(inner, outer).reshape(self.values.shape)
+        return soft if alpha is None else combine_alpha(soft, alpha)
+
+    def refined_alpha(self, inner, outer, radius=2, alpha=None):
+        """
+        Hard key at inner, feathered towards outer only near the mask edge.
+
+        Only pixels within radius of the boundary of the hard mask get the
+        soft ramp; the rest keep the hard key.
+        """
+        mask = self.mask(inner)
+        result = alpha_from_mask(mask, alpha)
+
+        band = edge_band_indices(mask, radius)
+        soft = self._soft(inner, outer, band)
+        if alpha is not None:
+            soft = combine_alpha(soft, alpha.ravel()[band])
+        result.ravel()[band] = soft
+        return result
+
+    def cumulative_counts(self):
+        """
+        Number of pixels keyed out at each integer color range.
+
+        Built once from a histogram of the map, without producing any mask.
+
+        Returns:
+            np.ndarray: counts[t] is the number of pixels within range t, for
+            t in 0..MAX_EXACT_RANGE
+        """
+        if self._cumulative is None:
+            ceil_table = self._CEIL_SQRT if self.metric == "rgb" else self._CEIL_FIXED
+            histogram = np.bincount(ceil_table[self.values].ravel(),
+                                    minlength=self.MAX_EXACT_RANGE + 2)
+            self._cumulative = np.cumsum(histogram[:self.MAX_EXACT_RANGE + 1])
+        return self._cumulative
+
+    def removed_fraction(self, color_range):
+        """Fraction of pixels (0..1) that color_range would key out."""
+        total = self.values.size
+        if color_range > self.MAX_EXACT_RANGE:
+            return float(self.mask(color_range).sum()) / total
+        if color_range < 0:
+            return 0.0
+        return float(self.cumulative_counts()[int(color_range)]) / total
+
+    def suggest_range(self, max_range=MAX_EXACT_RANGE):
+        """
+        Suggest a color range at the knee of the removed-pixels curve.
+
+        Past the knee, raising the range starts eating into the foreground
+        much more slowly than it removed the background, so it is a good
+        starting point. The knee is the point furthest above the straight
+        line joining the ends of the normalized curve.
+        """
+        curve = self.cumulative_counts()[:max_range + 1].astype(np.float64)
+        if curve[-1] == curve[0]:
+            return 0
+        curve = (curve - curve[0]) / (curve[-1] - curve[0])
+        chord = np.linspace(0.0, 1.0, len(curve))
+        return int(np.argmax(curve - chord))
+
+
+def cached_distance_map(distance_map, img_rgb, target_color, metric="rgb", spaces=None):
+    """
+    Return distance_map if it still matches img_rgb, target_color and metric,
+    otherwise build a new one (reusing the conversions in spaces).
+    """
+    if distance_map is not None and distance_map.matches(img_rgb, target_color, metric):
+        return distance_map
+    return DistanceMap(img_rgb, target_color, metric, spaces)
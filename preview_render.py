@@ -0,0 +1,172 @@
+"""
+Fast preview display for the Tk tools.
+
+Interactive refreshes downscale with point sampling and Image.reduce plus a
+bilinear filter, and paste into one persistent PhotoImage. Once updates
+stop, the view is redrawn with LANCZOS. Scaled versions of the last few
+source images are cached, so redisplaying an image does not rescale it; the
+cache holds only weak references to the sources, never the full-size images
+themselves.
+"""
+import tkinter as tk
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageTk
+
+# Scaling lives in image_ops so headless code can use it without Tk
+from image_ops import fit_size, scale_image
+
+
+def new_frame(mode, size):
+    """
+    Allocate an image whose pixels live in one contiguous block.
+
+    ImageTk.PhotoImage.paste hands such images straight to Tk; any other
+    image is first converted into a temporary block. Block allocation is
+    not public Pillow API, so any failure falls back to Image.new.
+    """
+    try:
+        frame = Image.Image()._new(Image.core.new_block(mode, size))
+        if frame.mode == mode and frame.size == tuple(size):
+            return frame
+    except Exception:
+        pass
+    # Still correct, one extra copy on paste
+    return Image.new(mode, size)
+
+
+class PreviewRenderer:
+    """
+    Show images in one Tk label, updating its PhotoImage in place.
+
+    Args:
+        label (tk.Label): Persistent widget the preview is shown in
+        max_size (tuple): Default (max_width, max_height) of the preview
+        upscale (bool): Enlarge images smaller than max_size
+        refine_delay (int): Milliseconds without updates before the
+            LANCZOS pass runs; None disables it
+        cache_size (int): Number of source images whose scaled copies are kept
+    """
+
+    def __init__(self, label, max_size=(700, 400), upscale=False, refine_delay=150, cache_size=4):
+        self.label = label
+        self.max_size = max_size
+        self.upscale = upscale
+        self.refine_delay = refine_delay
+        self.cache_size = cache_size
+
+        self.photo = None
+        self.displayed = None
+        self._photo_mode = None
+        self._frame = None
+        self._scaled = OrderedDict()
+        self._refine_job = None
+        # A pending refine must not fire into a destroyed label
+        label.bind("<Destroy>", self._on_destroy, add="+")
+
+    def show(self, image, max_size=None, final=False):
+        """
+        Display image scaled to fit max_size.
+
+        Returns:
+            PIL.Image.Image: The scaled image that is on screen
+        """
+        size = fit_size(image.size, max_size or self.max_size, self.upscale)
+        self._cancel_refine()
+
+        # A cached LANCZOS copy is always good enough
+        scaled = self._get_scaled(image, size, True)
+        final = final or scaled is not None
+        if scaled is None:
+            scaled = self._get_scaled(image, size, False)
+        if scaled is None:
+            scaled = scale_image(image, size, final)
+            self._put_scaled(image, size, final, scaled)
+
+        self._paste(scaled)
+        if not final and scaled is not image and self.refine_delay is not None:
+            self._refine_job = self.label.after(
+                self.refine_delay, lambda: self.show(image, max_size, final=True))
+        return scaled
+
+    def show_array(self, arr, max_size=None):
+        """
+        Display an HxWx3 (RGB) or HxWx4 (RGBA) uint8 array.
+
+        When the array already fits, its pixels are unpacked once into a
+        reused block-backed frame that Tk copies from directly, with no
+        intermediate PIL image or byte string. Larger arrays go through show().
+
+        Returns:
+            PIL.Image.Image: The image that is on screen
+        """
+        height, width = arr.shape[:2]
+        if fit_size((width, height), max_size or self.max_size, self.upscale) != (width, height):
+            return self.show(Image.fromarray(arr), max_size)
+
+        self._cancel_refine()
+        mode = "RGBA" if arr.shape[2] == 4 else "RGB"
+        if self._frame is None or self._frame.size != (width, height) or self._frame.mode != mode:
+            self._frame = new_frame(mode, (width, height))
+
+        # The only copy on our side of Tk
+        self._frame.frombytes(np.ascontiguousarray(arr))
+        self._paste(self._frame)
+        return self._frame
+
+    def _paste(self, scaled):
+        self.displayed = scaled
+        if (self.photo is not None and self._photo_mode == scaled.mode
+                and (self.photo.width(), self.photo.height()) == scaled.size):
+            # Same size and mode: reuse the Tk image, no new widget or image object
+            self.photo.paste(scaled)
+            return
+
+        self.photo = ImageTk.PhotoImage(scaled.mode, scaled.size)
+        self.photo.paste(scaled)
+        self._photo_mode = scaled.mode
+        self.label.config(image=self.photo)
+        self.label.image = self.photo  # Keep a reference
+
+    def _cancel_refine(self):
+        if self._refine_job is not None:
+            try:
+                self.label.after_cancel(self._refine_job)
+            except tk.TclError:
+                pass
+            self._refine_job = None
+
+    def _on_destroy(self, event):
+        if event.widget is self.label:
+            self._cancel_refine()
+
+    def _get_scaled(self, image, size, final):
+        # Keyed by identity, but an entry only matches while its weak
+        # reference still points at this very image; a recycled id of a
+        # collected image finds a dead reference
+        key = (id(image), size, final)
+        entry = self._scaled.get(key)
+        if entry is None or entry[0]() is not image:
+            return None
+        self._scaled.move_to_end(key)
+        return entry[1]
+
+    def _put_scaled(self, image, size, final, scaled):
+        key = (id(image), size, final)
+        entries = self._scaled
+
+        def forget(_, key=key):
+            # The source was collected, its scaled copy is of no further use
+            entry = entries.get(key)
+            if entry is not None and entry[0]() is None:
+                del entries[key]
+
+        entries[key] = (weakref.ref(image, forget), scaled)
+        while len(entries) > self.cache_size * 2:
+            entries.popitem(last=False)
+
+    def clear_cache(self):
+        """Forget cached scaled images, e.g. after a new file is loaded."""
+        self._scaled.clear()
@@ -0,0 +1,97 @@
+import threading
+
+
+class PreviewScheduler:
+    """
+    Run preview jobs on a single background worker, keeping only the latest
+    request.
+
+    Requests that arrive while the worker is busy replace each other, so a
+    fast slider drag costs at most one job in flight plus one pending. Every
+    request bumps a generation counter; a result is only delivered if no newer
+    request was made in the meantime. Delivery happens on the Tk main thread
+    through root.after.
+    """
+
+    def __init__(self, root, compute, deliver, on_error=None):
+        """
+        Args:
+            root (tk.Tk): Tk root used to marshal results to the main thread
+            compute (callable): compute(*args) -> result, run on the worker
+            deliver (callable): deliver(result), run on the Tk main thread
+            on_error (callable, optional): on_error(exception), run on the Tk
+                main thread when compute raises
+        """
+        self.root = root
+        self.compute = compute
+        self.deliver = deliver
+        self.on_error = on_error
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = None
+        self._generation = 0
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def request(self, *args):
+        """Schedule compute(*args), superseding any request not yet started."""
+        with self._lock:
+            self._generation += 1
+            self._pending = (self._generation, args)
+        self._wakeup.set()
+
+    def cancel(self):
+        """Drop the pending request and any result still in flight."""
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+
+    def close(self):
+        """Stop the worker thread."""
+        with self._lock:
+            self._closed = True
+            self._pending = None
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if self._closed:
+                    return
+                job = self._pending
+                self._pending = None
+                self._wakeup.clear()
+
+            if job is None:
+                continue
+
+            generation, args = job
+            if generation != self._generation:
+                # Superseded before it started
+                continue
+
+            try:
+                result = self.compute(*args)
+                callback = self._deliver
+            except Exception as e:
+                result = e
+                callback = self._report_error
+
+            try:
+                self.root.after(0, callback, generation, result)
+            except RuntimeError:
+                # Tk main loop has shut down
+                return
+
+    def _deliver(self, generation, result):
+        # Runs on the Tk main thread
+        if generation == self._generation:
+            self.deliver(result)
+
+    def _report_error(self, generation, error):
+        if generation == self._generation and self.on_error is not None:
+            self.on_error(error)
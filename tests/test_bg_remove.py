@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import bg_remove
+
+GREEN = (0, 255, 0)
+
+
+def make_inputs(root, names):
+    for name in names:
+        path = root / name
+        os.makedirs(path.parent, exist_ok=True)
+        pixels = np.zeros((6, 8, 3), dtype=np.uint8)
+        pixels[:] = GREEN
+        pixels[2:4, 2:6] = (200, 30, 30)
+        Image.fromarray(pixels).save(path)
+
+
+def run(tmp_path, *extra):
+    return bg_remove.main([str(tmp_path / "in"), "-r", "-o", str(tmp_path / "out"), "-j", "1", *extra])
+
+
+def test_parse_color():
+    assert bg_remove.parse_color("#00ff80") == (0, 255, 128)
+    assert bg_remove.parse_color("1,2,3") == (1, 2, 3)
+
+
+def test_outputs_mirror_subdirectories(tmp_path):
+    make_inputs(tmp_path / "in", ["a/x.png", "b/x.png"])
+    assert run(tmp_path) == 0
+
+    for folder in ("a", "b"):
+        alpha = np.asarray(Image.open(tmp_path / "out" / folder / "x_nobg.png"))[:, :, 3]
+        assert alpha[0, 0] == 0 and alpha[2, 2] == 255
+
+
+def test_rerun_skips_only_with_the_same_settings(tmp_path, capsys):
+    make_inputs(tmp_path / "in", ["x.png"])
+    run(tmp_path)
+    output = tmp_path / "out" / "x_nobg.png"
+    first = os.stat(output).st_mtime_ns
+
+    capsys.readouterr()
+    run(tmp_path)
+    assert "0/0 images" in capsys.readouterr().out
+    assert os.stat(output).st_mtime_ns == first
+
+    # A different tolerance must redo the file instead of skipping it
+    run(tmp_path, "-t", "5")
+    assert "1/1 images" in capsys.readouterr().out
+    assert bg_remove.read_settings(str(output))["color_range"] == 5
+
+
+def test_changed_input_is_redone(tmp_path):
+    make_inputs(tmp_path / "in", ["x.png"])
+    input_path = str(tmp_path / "in" / "x.png")
+    output_path = str(tmp_path / "out" / "x_nobg.png")
+    options = {"target_color": GREEN, "color_range": 30}
+    os.makedirs(tmp_path / "out")
+    Image.new("RGBA", (1, 1)).save(output_path)
+    bg_remove.write_settings(output_path, options)
+
+    assert bg_remove.is_up_to_date(input_path, output_path, options)
+    os.utime(input_path, ns=(os.stat(output_path).st_mtime_ns + 10 ** 9,) * 2)
+    assert not bg_remove.is_up_to_date(input_path, output_path, options)
+
+
+def test_palette_transparency_is_kept(tmp_path):
+    pixels = np.full((4, 4), 1, dtype=np.uint8)
+    pixels[0, 0] = 0
+    img = Image.fromarray(pixels, "P")
+    img.putpalette([255, 255, 255, 200, 30, 30] + [0] * 762)
+    input_path = str(tmp_path / "p.png")
+    img.save(input_path, transparency=0)
+
+    output_path = str(tmp_path / "p_nobg.png")
+    bg_remove.remove_background_file(input_path, output_path, GREEN, 30)
+    alpha = np.asarray(Image.open(output_path))[:, :, 3]
+    assert alpha[0, 0] == 0 and alpha[1, 1] == 255
+
+
+def test_outputs_are_not_collected_as_inputs(tmp_path):
+    make_inputs(tmp_path, ["x.png", "out/sub/x_nobg.png"])
+    inputs = bg_remove.collect_watch_inputs([str(tmp_path)], True, str(tmp_path / "out"))
+    assert inputs == [str(tmp_path / "x.png")]
+
+
+def test_rejects_zero_workers(tmp_path):
+    with pytest.raises(SystemExit):
+        bg_remove.main([str(tmp_path), "-o", str(tmp_path / "out"), "-j", "0"])
+
+
+@pytest.mark.parametrize("rows", ["0", "-3"])
+def test_rejects_strip_rows_below_one(tmp_path, rows):
+    make_inputs(tmp_path, ["in/x.png"])
+    with pytest.raises(SystemExit):
+        run(tmp_path, "--strip-rows", rows)
+    assert not os.path.exists(tmp_path / "out")
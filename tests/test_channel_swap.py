@@ -0,0 +1,77 @@
+import argparse
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import channel_swap
+
+
+@pytest.mark.parametrize("order, expected", [
+    ("RG", (1, 0, 2)), ("RB", (2, 1, 0)), ("GB", (0, 2, 1)), ("BRG", (2, 0, 1)), ("RGB", (0, 1, 2)),
+])
+def test_channel_indices(order, expected):
+    assert channel_swap.channel_indices(order) == expected
+
+
+def test_channel_indices_rejects_unknown():
+    with pytest.raises(ValueError):
+        channel_swap.channel_indices("XY")
+
+
+def test_permute_paths_agree():
+    arr = np.random.default_rng(0).integers(0, 256, (9, 7, 3), dtype=np.uint8)
+    expected = arr[:, :, [2, 0, 1]]
+    np.testing.assert_array_equal(np.asarray(channel_swap.permute_channels(Image.fromarray(arr), "BRG")), expected)
+    np.testing.assert_array_equal(channel_swap.permute_array(arr.copy(), "BRG", band_rows=4), expected)
+
+
+@pytest.mark.parametrize("pattern, root", [
+    ("photos", "photos"),
+    ("photos/a.png", "photos"),
+    ("photos/**/*.png", "photos"),
+    ("*.png", "."),
+])
+def test_pattern_root(tmp_path, monkeypatch, pattern, root):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("photos")
+    assert channel_swap.pattern_root(pattern) == root
+
+
+def test_output_paths_mirror_subdirectories(tmp_path):
+    for folder in ("a", "b"):
+        os.makedirs(tmp_path / "in" / folder)
+        Image.new("RGB", (4, 4), (10, 20, 30)).save(tmp_path / "in" / folder / "x.png")
+    patterns = [str(tmp_path / "in")]
+    inputs = channel_swap.collect_inputs(patterns, recursive=True)
+
+    results = list(channel_swap.batch_swap(inputs, str(tmp_path / "out"), "RG", workers=1, patterns=patterns))
+
+    assert [error for _, _, error in results] == [None, None]
+    outputs = sorted(os.path.relpath(output, tmp_path / "out") for _, output, _ in results)
+    assert outputs == [os.path.join("a", "x_swapped_RG.png"), os.path.join("b", "x_swapped_RG.png")]
+    assert Image.open(tmp_path / "out" / "a" / "x_swapped_RG.png").getpixel((0, 0)) == (20, 10, 30)
+
+
+def test_relative_input_path_prefers_deepest_root(tmp_path):
+    os.makedirs(tmp_path / "a" / "b")
+    path = str(tmp_path / "a" / "b" / "x.png")
+    assert channel_swap.relative_input_path(path, [str(tmp_path), str(tmp_path / "a")]) == os.path.join("b", "x.png")
+
+
+@pytest.mark.parametrize("value", ["0", "-2", "two"])
+def test_positive_int_rejects(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        channel_swap.positive_int(value)
+
+
+def test_cli_rejects_negative_workers(tmp_path):
+    with pytest.raises(SystemExit):
+        channel_swap.main([str(tmp_path), "-o", str(tmp_path / "out"), "-j", "-1"])
+
+
+@pytest.mark.parametrize("rows", ["0", "-3"])
+def test_cli_rejects_strip_rows_below_one(tmp_path, rows):
+    with pytest.raises(SystemExit):
+        channel_swap.main([str(tmp_path), "-o", str(tmp_path / "out"), "--strip-rows", rows])
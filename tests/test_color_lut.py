@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import color_lut
+
+
+def write_cube(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def exact_mix(arr, matrix, offset=(0, 0, 0)):
+    return np.clip(arr.astype(np.float64) @ np.asarray(matrix, dtype=np.float64).T + offset, 0, 255)
+
+
+@pytest.fixture
+def photo():
+    return np.random.default_rng(0).integers(0, 256, (64, 48, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("name", ["SEPIA", "GRAY"])
+def test_matrix_presets_are_exact(photo, name):
+    transform = color_lut.preset(name)
+    assert transform.mixing and transform.grid is None
+    expected = exact_mix(photo, color_lut.MATRIX_PRESETS[name])
+    # Rounded to nearest: off by at most half a level (ties either way)
+    assert np.abs(transform.apply_array(photo) - expected).max() <= 0.5 + 1e-6
+    image = np.asarray(transform.apply_image(Image.fromarray(photo)))
+    assert np.abs(image - expected).max() <= 0.5 + 1e-6
+
+
+def test_matrix_with_offsets_in_place(photo):
+    transform = color_lut.parse_transform("1,0.2,0,10, 0,1,0.3,-20, 0.1,0,1,0")
+    rows = np.array([[1, 0.2, 0, 10], [0, 1, 0.3, -20], [0.1, 0, 1, 0]])
+    expected = np.floor(exact_mix(photo, rows[:, :3], rows[:, 3]) + 0.5)
+    rgba = np.dstack([photo, np.full(photo.shape[:2], 7, np.uint8)])
+    transform.apply_array(rgba, out=rgba, band_rows=5)
+    assert np.array_equal(rgba[:, :, :3], expected)
+    assert (rgba[:, :, 3] == 7).all()
+
+
+def test_swap_matrix_stays_separable():
+    transform = color_lut.parse_transform("0,1,0, 1,0,0, 0,0,1")
+    assert transform.separable and transform.is_permutation
+    assert transform.sources == (1, 0, 2)
+
+
+def test_load_cube_1d(tmp_path):
+    path = write_cube(tmp_path / "invert.cube", [
+        "# an inverting curve",
+        'TITLE "invert"',
+        "LUT_1D_SIZE 2",
+        "DOMAIN_MIN 0 0 0",
+        "DOMAIN_MAX 1 1 1",
+        "1 1 1",
+        "0 0 0",
+    ])
+    transform = color_lut.load_cube(path)
+    assert transform.separable
+    arr = np.array([[[0, 100, 255]]], dtype=np.uint8)
+    assert transform.apply_array(arr).tolist() == [[[255, 155, 0]]]
+
+
+def test_load_cube_3d_red_fastest_and_tab_separated(tmp_path):
+    # Identity 2^3 cube; red changes fastest in the rows
+    rows = [f"{r} {g} {b}" for b in (0, 1) for g in (0, 1) for r in (0, 1)]
+    path = write_cube(tmp_path / "identity.cube", ["LUT_3D_SIZE\t2", "TITLE\t\"id\""] + rows)
+    transform = color_lut.load_cube(path)
+    assert transform.grid_size == 2
+    assert np.array_equal(transform.grid[1, 0, 0], [255, 0, 0])
+    arr = np.array([[[10, 128, 250]]], dtype=np.uint8)
+    assert np.abs(transform.apply_array(arr).astype(int) - arr).max() <= 1
+
+
+@pytest.mark.parametrize("lines", [
+    ["1 1 1"],
+    ["LUT_1D_SIZE 2", "LUT_3D_SIZE 2", "0 0 0", "1 1 1"],
+    ["LUT_1D_SIZE 3", "0 0 0", "1 1 1"],
+    ["LUT_1D_SIZE 2", "0 0 x", "1 1 1"],
+    ["LUT_1D_SIZE 2", "DOMAIN_MAX 2 2 2", "0 0 0", "1 1 1"],
+])
+def test_load_cube_rejects_malformed(tmp_path, lines):
+    with pytest.raises(ValueError):
+        color_lut.load_cube(write_cube(tmp_path / "bad.cube", lines))
+
+
+def test_parse_transform_rejects_unknown():
+    with pytest.raises(ValueError):
+        color_lut.parse_transform("not a transform")
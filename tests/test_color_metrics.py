@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import color_metrics
+
+# Sharma, Wu and Dalal (2005), "The CIEDE2000 color-difference formula:
+# implementation notes, supplementary test data and mathematical
+# observations": L1, a1, b1, L2, a2, b2, ΔE00
+SHARMA_PAIRS = [
+    (50.0000, 2.6772, -79.7751, 50.0000, 0.0000, -82.7485, 2.0425),
+    (50.0000, 3.1571, -77.2803, 50.0000, 0.0000, -82.7485, 2.8615),
+    (50.0000, 2.8361, -74.0200, 50.0000, 0.0000, -82.7485, 3.4412),
+    (50.0000, -1.3802, -84.2814, 50.0000, 0.0000, -82.7485, 1.0000),
+    (50.0000, -1.1848, -84.8006, 50.0000, 0.0000, -82.7485, 1.0000),
+    (50.0000, -0.9009, -85.5211, 50.0000, 0.0000, -82.7485, 1.0000),
+    (50.0000, 0.0000, 0.0000, 50.0000, -1.0000, 2.0000, 2.3669),
+    (50.0000, -1.0000, 2.0000, 50.0000, 0.0000, 0.0000, 2.3669),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0009, 7.1792),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0010, 7.1792),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0011, 7.2195),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0012, 7.2195),
+    (50.0000, -0.0010, 2.4900, 50.0000, 0.0009, -2.4900, 4.8045),
+    (50.0000, -0.0010, 2.4900, 50.0000, 0.0010, -2.4900, 4.8045),
+    (50.0000, -0.0010, 2.4900, 50.0000, 0.0011, -2.4900, 4.7461),
+    (50.0000, 2.5000, 0.0000, 50.0000, 0.0000, -2.5000, 4.3065),
+    (50.0000, 2.5000, 0.0000, 73.0000, 25.0000, -18.0000, 27.1492),
+    (50.0000, 2.5000, 0.0000, 61.0000, -5.0000, 29.0000, 22.8977),
+    (50.0000, 2.5000, 0.0000, 56.0000, -27.0000, -3.0000, 31.9030),
+    (50.0000, 2.5000, 0.0000, 58.0000, 24.0000, 15.0000, 19.4535),
+    (50.0000, 2.5000, 0.0000, 50.0000, 3.1736, 0.5854, 1.0000),
+    (50.0000, 2.5000, 0.0000, 50.0000, 3.2972, 0.0000, 1.0000),
+    (50.0000, 2.5000, 0.0000, 50.0000, 1.8634, 0.5757, 1.0000),
+    (50.0000, 2.5000, 0.0000, 50.0000, 3.2592, 0.3350, 1.0000),
+    (60.2574, -34.0099, 36.2677, 60.4626, -34.1751, 39.4387, 1.2644),
+    (63.0109, -31.0961, -5.8663, 62.8187, -29.7946, -4.0864, 1.2630),
+    (61.2901, 3.7196, -5.3901, 61.4292, 2.2480, -4.9620, 1.8731),
+    (35.0831, -44.1164, 3.7933, 35.0232, -40.0716, 1.5901, 1.8645),
+    (22.7233, 20.0904, -46.6940, 23.0331, 14.9730, -42.5619, 2.0373),
+    (36.4612, 47.8580, 18.3852, 36.2715, 50.5065, 21.2231, 1.4146),
+    (90.8027, -2.0831, 1.4410, 91.1528, -1.6435, 0.0447, 1.4441),
+    (90.9257, -0.5406, -0.9208, 88.6381, -0.8985, -0.7239, 1.5381),
+    (6.7747, -0.2908, -2.4247, 5.8714, -0.0985, -2.2286, 0.6377),
+    (2.0776, 0.0795, -1.1350, 0.9033, -0.0636, -0.5514, 0.9082),
+]
+
+
+@pytest.mark.parametrize("pair", SHARMA_PAIRS)
+def test_delta_e2000_matches_sharma_reference(pair):
+    lab1 = np.array([pair[0:3]], dtype=np.float32)
+    lab2 = np.array([pair[3:6]], dtype=np.float32)
+    # Lab planes are float32 in use, the reference is given to 4 decimals
+    assert color_metrics.delta_e2000(lab1, pair[3:6])[0] == pytest.approx(pair[6], abs=1e-4)
+    assert color_metrics.delta_e2000(lab2, pair[0:3])[0] == pytest.approx(pair[6], abs=1e-4)
+
+
+def test_delta_e2000_bands_match_one_pass(monkeypatch):
+    lab = color_metrics.rgb_to_lab(np.random.default_rng(5).integers(0, 256, (23, 7, 3), dtype=np.uint8))
+    target = color_metrics.rgb_to_lab(np.array([[[0, 200, 40]]], dtype=np.uint8))[0, 0]
+    expected = color_metrics.delta_e2000(lab, target)
+    monkeypatch.setattr(color_metrics, "_BAND_ROWS", 4)
+    result = color_metrics.delta_e2000(lab, target)
+    assert result.dtype == np.float32 and result.shape == (23, 7)
+    assert np.array_equal(result, expected)
+
+
+def test_delta_e76_is_euclidean():
+    lab = np.array([[[50, 0, 0], [53, 4, 0]]], dtype=np.float32)
+    assert color_metrics.delta_e76(lab, (50, 0, 0)).tolist() == [[0, 5]]
+
+
+@pytest.mark.parametrize("rgb, lab", [
+    ((255, 255, 255), (100, 0, 0)),
+    ((0, 0, 0), (0, 0, 0)),
+    ((255, 0, 0), (53.24, 80.09, 67.20)),
+    ((0, 0, 255), (32.30, 79.19, -107.86)),
+])
+def test_rgb_to_lab_known_colors(rgb, lab):
+    result = color_metrics.rgb_to_lab(np.array([[rgb]], dtype=np.uint8))[0, 0]
+    assert result == pytest.approx(lab, abs=0.02)
+
+
+def test_rgb_to_hue_sat():
+    img = np.array([[[255, 0, 0], [0, 255, 0], [0, 0, 255], [128, 128, 128], [255, 0, 128]]],
+                   dtype=np.uint8)
+    hue, sat = color_metrics.rgb_to_hue_sat(img)
+    assert hue[0].tolist() == pytest.approx([0, 120, 240, 0, 330], abs=0.3)
+    assert sat[0].tolist() == pytest.approx([1, 1, 1, 0, 1])
+
+
+def test_hue_distance_ignores_brightness():
+    img = np.array([[[0, 200, 0], [0, 100, 0], [200, 0, 0]]], dtype=np.uint8)
+    distance = color_metrics.color_distance(color_metrics.ColorSpaceCache(img), (0, 255, 0), "hue")
+    assert distance[0, 0] == distance[0, 1] == 0
+    assert distance[0, 2] > 100
+
+
+def test_color_space_cache_converts_once():
+    spaces = color_metrics.ColorSpaceCache(np.zeros((2, 2, 3), dtype=np.uint8))
+    assert spaces.lab() is spaces.lab()
+    assert spaces.hue_sat() is spaces.hue_sat()
+
+
+def test_unknown_metric():
+    spaces = color_metrics.ColorSpaceCache(np.zeros((1, 1, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        color_metrics.color_distance(spaces, (0, 0, 0), "cmyk")
@@ -0,0 +1,31 @@
+import json
+
+from duck_registry import DuckRegistry
+
+
+def test_lookups_return_snapshots():
+    registry = DuckRegistry()
+    registry.add("Ben", "Brown")
+    registry.add("Ben", "Blue")
+    registry.add("Ann", "Brown")
+
+    assert [duck.color for duck in registry.by_name("Ben")] == ["Brown", "Blue"]
+    assert isinstance(registry.by_name("Ann"), tuple)
+    assert registry.by_name("Nobody") == () and registry.by_color("Pink") == ()
+
+    browns = registry.by_color("Brown")
+    assert [duck.name for duck in browns] == ["Ben", "Ann"]
+    registry.add("Cat", "Brown")
+    # Earlier results do not change, and the index is out of callers' reach
+    assert len(browns) == 2
+    assert registry.count("Brown") == 3
+    assert registry.count_per_color() == {"Brown": 3, "Blue": 1}
+
+
+def test_load_keeps_mama_duck_apart(tmp_path):
+    path = tmp_path / "flock.json"
+    path.write_text(json.dumps({"ducks": [{"name": "Ben", "color": "Brown"}],
+                                "mamaDuck": {"name": "Mama", "color": "Yellow"}}))
+    registry = DuckRegistry.from_files(str(path))
+    assert len(registry) == 1
+    assert registry.mama_ducks[str(path)].name == "Mama"
@@ -0,0 +1,102 @@
+import io
+import json
+import os
+
+import pytest
+
+import flock_merge
+
+
+def write_flock(path, ducks, mama=None):
+    flock = {"ducks": [{"name": name, "color": color} for name, color in ducks]}
+    if mama is not None:
+        flock["mamaDuck"] = {"name": mama[0], "color": mama[1]}
+    path.write_text(json.dumps(flock), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def flocks(tmp_path):
+    first = write_flock(tmp_path / "a.json", [("Ben", "Brown"), ("Ann", "Blue"), ("Cat", "Red")])
+    second = write_flock(tmp_path / "b.json", [("Ann", "Green"), ("Dan", "Gold"), ("Cat", "Red")],
+                         mama=("Mama", "Yellow"))
+    third = write_flock(tmp_path / "c.json", [("Ann", "Green")])
+    return [first, second, third]
+
+
+def merged(paths, **options):
+    sink = io.StringIO()
+    result = flock_merge.merge_flocks(paths, sink, **options)
+    return json.loads(sink.getvalue()), result
+
+
+def colors(flock):
+    return {duck["name"]: duck["color"] for duck in flock["ducks"]}
+
+
+@pytest.mark.parametrize("policy, ann", [("first", "Blue"), ("last", "Green"), ("majority", "Green")])
+def test_policies(flocks, policy, ann):
+    flock, result = merged(flocks, policy=policy)
+    assert colors(flock)["Ann"] == ann
+    assert result.ducks_in == 7 and result.ducks_out == 4
+    assert result.conflicts == 1
+
+
+def test_hash_keeps_first_seen_order_and_mama(flocks):
+    flock, _ = merged(flocks)
+    assert [duck["name"] for duck in flock["ducks"]] == ["Ben", "Ann", "Cat", "Dan"]
+    assert flock["mamaDuck"] == {"name": "Mama", "color": "Yellow"}
+
+
+@pytest.mark.parametrize("run_size", [1, 2, 3, 1000])
+def test_sort_matches_hash(flocks, tmp_path, run_size):
+    by_hash, _ = merged(flocks, policy="majority")
+    by_sort, result = merged(flocks, dedup="sort", policy="majority", run_size=run_size,
+                             temp_dir=str(tmp_path))
+    assert [duck["name"] for duck in by_sort["ducks"]] == ["Ann", "Ben", "Cat", "Dan"]
+    assert colors(by_sort) == colors(by_hash)
+    assert result.ducks_in == 7 and result.conflicts == 1
+    # Spilled runs are cleaned up
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("flock_merge_")]
+
+
+def test_majority_tie_goes_to_earliest():
+    colors_seen = [(0, "Blue"), (1, "Green"), (2, "Green"), (3, "Blue")]
+    assert flock_merge.resolve_color("Ann", colors_seen, "majority") == "Blue"
+
+
+@pytest.mark.parametrize("dedup", flock_merge.DEDUP_MODES)
+def test_error_policy(flocks, dedup):
+    with pytest.raises(flock_merge.ColorConflict, match="Ann is both Blue and Green"):
+        merged(flocks, dedup=dedup, policy="error")
+
+
+def test_empty_flock_layout(tmp_path):
+    path = write_flock(tmp_path / "empty.json", [])
+    sink = io.StringIO()
+    flock_merge.merge_flocks([path], sink)
+    assert sink.getvalue() == '{\n    "ducks": [\n    ]\n}\n'
+    assert json.loads(sink.getvalue()) == {"ducks": []}
+
+
+def test_cli_writes_output_atomically(flocks, tmp_path):
+    output = tmp_path / "merged.json"
+    assert flock_merge.main(flocks + ["-o", str(output), "-q"]) == 0
+    assert colors(json.loads(output.read_text(encoding="utf-8")))["Ann"] == "Blue"
+
+    # A failed merge leaves neither the output nor a partial file
+    failed = tmp_path / "failed.json"
+    assert flock_merge.main(flocks + ["-o", str(failed), "-q", "--policy", "error"]) == 1
+    assert not failed.exists()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_sort_rejects_run_size_below_one(flocks):
+    with pytest.raises(ValueError):
+        merged(flocks, dedup="sort", run_size=0)
+
+
+@pytest.mark.parametrize("run_size", ["0", "-5", "many"])
+def test_cli_rejects_bad_run_size(flocks, run_size):
+    with pytest.raises(SystemExit):
+        flock_merge.main(flocks + ["--dedup", "sort", "--run-size", run_size, "-q"])
@@ -0,0 +1,93 @@
+import json
+import mmap
+import os
+import struct
+
+import pytest
+
+import flock_snapshot
+
+FLOCK = {
+    "ducks": [{"name": f"Duck {i} é", "color": ("Brown", "Blue", "Red")[i % 3]} for i in range(10)],
+    "mamaDuck": {"name": "Mama", "color": "Yellow"},
+}
+
+
+@pytest.fixture
+def flock_path(tmp_path):
+    path = tmp_path / "flock.json"
+    path.write_text(json.dumps(FLOCK), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def mappings(monkeypatch):
+    # Every mapping the module opens, to check that none is leaked
+    opened = []
+
+    class TrackedMmap(mmap.mmap):
+        def __init__(self, *args, **kwargs):
+            opened.append(self)
+
+    monkeypatch.setattr(flock_snapshot.mmap, "mmap", TrackedMmap)
+    return opened
+
+
+def test_round_trip(flock_path):
+    with flock_snapshot.load_flock(flock_path) as snapshot:
+        assert len(snapshot) == 10
+        assert list(snapshot) == FLOCK["ducks"]
+        assert list(snapshot.__iter__(block=3)) == FLOCK["ducks"]
+        assert snapshot[-1] == FLOCK["ducks"][-1]
+        assert snapshot.mama_duck == FLOCK["mamaDuck"]
+        with pytest.raises(IndexError):
+            snapshot[10]
+
+
+def test_stale_snapshot_is_rebuilt(flock_path):
+    flock_snapshot.load_flock(flock_path).close()
+    with open(flock_path, "w", encoding="utf-8") as file:
+        json.dump({"ducks": FLOCK["ducks"][:2]}, file)
+    os.utime(flock_path, ns=(1, 1))
+    with flock_snapshot.load_flock(flock_path) as snapshot:
+        assert list(snapshot) == FLOCK["ducks"][:2]
+        assert snapshot.mama_duck is None
+
+
+def test_close_during_iteration(flock_path):
+    snapshot = flock_snapshot.load_flock(flock_path)
+    ducks = iter(snapshot)
+    assert next(ducks) == FLOCK["ducks"][0]
+    snapshot.close()
+    with pytest.raises(ValueError):
+        next(ducks)
+
+
+def test_close_with_caller_views(flock_path):
+    snapshot = flock_snapshot.load_flock(flock_path)
+    records = snapshot.records
+    snapshot.close()
+    assert len(records) == 11
+
+
+@pytest.mark.parametrize("damage", ["magic", "truncated", "tiny"])
+def test_invalid_snapshot_closes_its_mapping(flock_path, mappings, damage):
+    path = flock_snapshot.compile_snapshot(flock_path)
+    with open(path, "rb") as file:
+        data = file.read()
+    if damage == "magic":
+        data = b"NOTASNAP" + data[8:]
+    elif damage == "truncated":
+        data = data[:-5]
+    else:
+        data = data[:10]
+    with open(path, "wb") as file:
+        file.write(data)
+
+    with pytest.raises((ValueError, struct.error)):
+        flock_snapshot.FlockSnapshot(path)
+    assert len(mappings) == 1 and mappings[0].closed
+
+    # load_flock recompiles it
+    with flock_snapshot.load_flock(flock_path) as snapshot:
+        assert len(snapshot) == 10
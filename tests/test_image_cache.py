@@ -0,0 +1,26 @@
+import numpy as np
+from PIL import Image
+
+import image_cache
+
+
+def test_image_and_array_decode_once(tmp_path, monkeypatch):
+    pixels = np.random.default_rng(0).integers(0, 256, (12, 16, 4), dtype=np.uint8)
+    path = str(tmp_path / "in.png")
+    Image.fromarray(pixels).save(path)
+
+    decodes = []
+    decode = image_cache._decode
+    monkeypatch.setattr(image_cache, "_decode", lambda *args: decodes.append(args) or decode(*args))
+    image_cache.clear_cache()
+
+    img, arr = image_cache.load_image_and_array(path, "RGBA")
+    again = image_cache.load_image_and_array(path, "RGBA")
+
+    assert len(decodes) == 1
+    assert again[0] is img and again[1] is arr
+    np.testing.assert_array_equal(np.asarray(img), pixels)
+    np.testing.assert_array_equal(arr, pixels)
+    assert not arr.flags.writeable
+    # The image is a view of the array, so the entry is one copy of the pixels
+    assert image_cache._cache.current_bytes == pixels.nbytes
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import color_lut
+import image_ops
+import keying
+
+GREEN = (0, 255, 0)
+
+
+@pytest.fixture
+def noisy():
+    return np.random.default_rng(11).integers(0, 256, (31, 23, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def backdrop():
+    # Two green regions split by a red column, plus a stray green pixel
+    img = np.full((6, 9, 3), 40, dtype=np.uint8)
+    img[1:5, 1:4] = GREEN
+    img[1:5, 5:8] = GREEN
+    img[:, 4] = (200, 0, 0)
+    return img
+
+
+@pytest.mark.parametrize("channels", [3, 4])
+@pytest.mark.parametrize("order", ["RG", "BRG", "RGB"])
+def test_swap_matches_color_lut(noisy, channels, order):
+    arr = np.dstack([noisy, noisy[:, :, :1]]) if channels == 4 else noisy
+    expected = color_lut.preset(order).apply_array(arr)
+
+    np.testing.assert_array_equal(image_ops.swap(arr, order), expected)
+    np.testing.assert_array_equal(image_ops.swap(arr, order, out=np.empty_like(arr)), expected)
+    in_place = arr.copy()
+    assert image_ops.swap(in_place, order, out=in_place) is in_place
+    np.testing.assert_array_equal(in_place, expected)
+
+
+def test_transform_accepts_presets_and_transforms(noisy):
+    expected = color_lut.preset("SEPIA").apply_array(noisy)
+    np.testing.assert_array_equal(image_ops.transform(noisy, "SEPIA"), expected)
+    np.testing.assert_array_equal(image_ops.transform(noisy, color_lut.preset("SEPIA")), expected)
+
+
+@pytest.mark.parametrize("metric", ["rgb", "lab76"])
+def test_key_matches_keying(noisy, metric):
+    expected = keying.remove_background(noisy, GREEN, 120, metric, keys=[((255, 0, 0), 50)])
+    result = image_ops.key(noisy, GREEN, 120, metric, keys=[((255, 0, 0), 50)], workers=2)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_key_feather_ramps_past_tolerance():
+    img = np.array([[[0, 255, 0], [0, 245, 0], [0, 235, 0], [0, 225, 0]]], dtype=np.uint8)
+    result = image_ops.key(img, GREEN, 10, feather=20, workers=1)
+    assert result[0, :, 3].tolist() == [0, 0, 128, 255]
+    np.testing.assert_array_equal(result[:, :, :3], img)
+
+
+def test_key_seeds_keep_unconnected_regions(backdrop):
+    result = image_ops.key(backdrop, GREEN, 10, seeds=[(1, 1)], workers=1)
+    expected_alpha = keying.contiguous_alpha(keying.alpha_mask(backdrop, GREEN, 10), [(1, 1)])
+    np.testing.assert_array_equal(result[:, :, 3], expected_alpha)
+    # The seeded region is removed, the one across the red column is kept
+    assert (result[1:5, 1:4, 3] == 0).all()
+    assert (result[1:5, 5:8, 3] == 255).all()
+
+
+def test_key_seeds_restore_the_existing_alpha(backdrop):
+    rgba = np.dstack([backdrop, np.full(backdrop.shape[:2], 90, dtype=np.uint8)])
+    result = image_ops.key(rgba, GREEN, 10, seeds=[(1, 1)], workers=1)
+    assert (result[1:5, 1:4, 3] == 0).all()
+    assert (result[1:5, 5:8, 3] == 90).all()
+
+
+def test_composite_blends_over_a_color_and_an_image():
+    rgba = np.array([[[200, 100, 0, 0], [200, 100, 0, 255], [200, 100, 0, 128]]], dtype=np.uint8)
+    flat = image_ops.composite(rgba, (0, 0, 255))
+    assert flat.tolist() == [[[0, 0, 255], [200, 100, 0], [100, 50, 127]]]
+
+    background = np.full((1, 3, 3), 255, dtype=np.uint8)
+    np.testing.assert_array_equal(image_ops.composite(rgba, background, band_rows=1),
+                                  image_ops.composite(rgba, (255, 255, 255)))
+
+
+def test_composite_of_keyed_image_restores_the_kept_pixels(noisy):
+    rgba = image_ops.key(noisy, GREEN, 150, workers=1)
+    flat = image_ops.composite(rgba, (255, 255, 255), band_rows=7)
+    kept = rgba[:, :, 3] == 255
+    np.testing.assert_array_equal(flat[kept], noisy[kept])
+    assert (flat[rgba[:, :, 3] == 0] == 255).all()
+
+
+@pytest.mark.parametrize("channels", [3, 4])
+def test_resize_keeps_channels_and_flat_colors(channels):
+    arr = np.full((40, 60, channels), 77, dtype=np.uint8)
+    for size in [(15, 10), (90, 60)]:
+        result = image_ops.resize(arr, size)
+        assert result.shape == (size[1], size[0], channels)
+        assert (result == 77).all()
+    assert image_ops.resize(arr, (60, 40)) is arr
+
+
+def test_resize_without_opencv_uses_scale_image(noisy, monkeypatch):
+    monkeypatch.setattr(image_ops, "_cv2", False)
+    expected = np.asarray(image_ops.scale_image(Image.fromarray(noisy), (11, 15)))
+    np.testing.assert_array_equal(image_ops.resize(noisy, (11, 15)), expected)
+
+
+def test_fit_size():
+    assert image_ops.fit_size((4000, 3000), (700, 400)) == (533, 400)
+    assert image_ops.fit_size((100, 50), (700, 400)) == (100, 50)
+    assert image_ops.fit_size((100, 50), (700, 400), upscale=True) == (700, 350)
+
+
+def test_bad_orders_transforms_and_metrics(noisy):
+    with pytest.raises(ValueError):
+        image_ops.swap(noisy, "XY")
+    with pytest.raises(ValueError):
+        image_ops.transform(noisy, "NOT-A-PRESET")
+    with pytest.raises(ValueError):
+        image_ops.key(noisy, GREEN, 10, metric="xyz", workers=1)
+
+
+@pytest.mark.parametrize("call", [
+    lambda: image_ops.swap(np.zeros((4, 5), dtype=np.uint8), "RG"),
+    lambda: image_ops.composite(np.zeros((4, 5, 3), dtype=np.uint8)),
+    lambda: image_ops.composite(np.zeros((4, 5, 4), dtype=np.uint8), np.zeros((3, 5, 3), dtype=np.uint8)),
+    lambda: image_ops.composite(np.zeros((4, 5, 4), dtype=np.uint8), (1, 2)),
+    lambda: image_ops.resize(np.zeros((4, 5, 3), dtype=np.uint8), (0, 3)),
+])
+def test_bad_shapes_and_sizes(call):
+    with pytest.raises(ValueError):
+        call()
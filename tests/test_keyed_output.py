@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import keyed_output
+
+
+@pytest.fixture
+def keyed():
+    rgba = np.zeros((4, 6, 4), dtype=np.uint8)
+    rgba[:, 3:, 3] = 255
+    return Image.fromarray(rgba)
+
+
+def test_mask_is_single_channel(tmp_path, keyed):
+    path = str(tmp_path / "result.png")
+    assert keyed_output.save_keyed(keyed, path, "mask") == [path]
+    with Image.open(path) as mask:
+        assert mask.mode == "L"
+        assert np.array_equal(np.asarray(mask), np.asarray(keyed)[:, :, 3])
+
+
+def test_mask_rejects_webp(tmp_path, keyed):
+    path = tmp_path / "result.webp"
+    with pytest.raises(ValueError):
+        keyed_output.save_keyed(keyed, str(path), "mask")
+    assert not path.exists()
+
+
+def test_both_puts_webp_mask_in_png(tmp_path, keyed):
+    path = str(tmp_path / "result.webp")
+    saved = keyed_output.save_keyed(keyed, path, "both")
+    assert saved == [path, str(tmp_path / "result_mask.png")]
+    with Image.open(saved[1]) as mask:
+        assert mask.mode == "L"
@@ -0,0 +1,174 @@
+import numpy as np
+import pytest
+
+import keying
+
+
+@pytest.fixture
+def noisy():
+    return np.random.default_rng(7).integers(0, 256, (37, 29, 3), dtype=np.uint8)
+
+
+def test_key_mask_range_is_inclusive():
+    img = np.array([[[0, 255, 0], [3, 251, 0], [3, 250, 0]]], dtype=np.uint8)
+    # Distances 0, 5 and sqrt(34) ~ 5.83
+    assert keying.key_mask(img, (0, 255, 0), 5).tolist() == [[True, True, False]]
+    assert keying.alpha_mask(img, (0, 255, 0), 5).tolist() == [[0, 0, 255]]
+
+
+def test_remove_background_keeps_existing_alpha(noisy):
+    rgba = np.dstack([noisy, np.full(noisy.shape[:2], 100, np.uint8)])
+    result = keying.remove_background(rgba, (128, 128, 128), 90)
+    keyed = keying.key_mask(noisy, (128, 128, 128), 90)
+    assert np.array_equal(result[:, :, :3], noisy)
+    assert (result[:, :, 3][keyed] == 0).all() and (result[:, :, 3][~keyed] == 100).all()
+
+
+@pytest.mark.parametrize("color_range", [0, 1, 30, 100, 255, 256, 300, 441])
+def test_distance_map_mask_matches_key_mask(noisy, color_range):
+    # Ranges past 255 reach saturated entries, which are checked exactly
+    distance_map = keying.DistanceMap(noisy, (250, 10, 10))
+    expected = keying.key_mask(noisy, (250, 10, 10), color_range)
+    assert np.array_equal(distance_map.mask(color_range), expected)
+
+
+def test_cached_distance_map_is_reused_until_something_changes(noisy):
+    first = keying.cached_distance_map(None, noisy, (1, 2, 3))
+    assert keying.cached_distance_map(first, noisy, [1, 2, 3]) is first
+    assert keying.cached_distance_map(first, noisy, (1, 2, 4)) is not first
+    assert keying.cached_distance_map(first, noisy.copy(), (1, 2, 3)) is not first
+
+
+@pytest.mark.parametrize("color_range", [-1, 0, 30, 255, 300])
+def test_removed_fraction_matches_mask(noisy, color_range):
+    distance_map = keying.DistanceMap(noisy, (250, 10, 10))
+    expected = keying.key_mask(noisy, (250, 10, 10), color_range).mean() if color_range >= 0 else 0
+    assert distance_map.removed_fraction(color_range) == pytest.approx(expected)
+
+
+def test_suggest_range_finds_the_gap():
+    # A green backdrop with up to 6 levels of noise, and a far-away subject
+    rng = np.random.default_rng(3)
+    img = np.zeros((40, 40, 3), dtype=np.uint8)
+    img[:, :, 1] = 255 - rng.integers(0, 7, (40, 40))
+    img[10:30, 10:30] = (200, 40, 180)
+    suggested = keying.DistanceMap(img, (0, 255, 0)).suggest_range()
+    assert 6 <= suggested < 100
+    assert keying.DistanceMap(img, (0, 255, 0)).removed_fraction(suggested) == 1 - 400 / 1600
+
+
+@pytest.mark.parametrize("metric", ["lab76", "lab2000", "hue"])
+def test_perceptual_distance_map_quantization(noisy, metric):
+    import color_metrics
+    distance = color_metrics.color_distance(color_metrics.ColorSpaceCache(noisy), (250, 10, 10), metric)
+    distance_map = keying.DistanceMap(noisy, (250, 10, 10), metric)
+    # Stored in 1/QUANT steps, so only pixels within half a step of the
+    # threshold can land on the other side
+    for color_range in (5, 20, 60):
+        mismatch = distance_map.mask(color_range) != (distance <= color_range)
+        assert (np.abs(distance[mismatch] - color_range) <= 0.5 / keying.DistanceMap.QUANT).all()
+        assert distance_map.removed_fraction(color_range) == pytest.approx(
+            distance_map.mask(color_range).mean())
+
+
+def test_cached_distance_map_is_rebuilt_for_another_metric(noisy):
+    first = keying.cached_distance_map(None, noisy, (1, 2, 3))
+    assert keying.cached_distance_map(first, noisy, (1, 2, 3), "lab76") is not first
+
+
+def test_multi_key_mask_is_the_union(noisy):
+    keys = [((255, 0, 0), 120), ((0, 0, 255), 100), ((20, 200, 20), 80)]
+    expected = np.zeros(noisy.shape[:2], dtype=bool)
+    for color, color_range in keys:
+        expected |= keying.key_mask(noisy, color, color_range)
+    # Bands smaller than a row still cover every pixel
+    assert np.array_equal(keying.multi_key_mask(noisy, keys, chunk_pixels=7), expected)
+    result = keying.remove_background(noisy, keys[0][0], keys[0][1], keys=keys[1:])
+    assert np.array_equal(result[:, :, 3] == 0, expected)
+
+
+def test_connected_region_and_contiguous_alpha():
+    mask = np.array([
+        [1, 1, 0, 1],
+        [0, 1, 0, 1],
+        [0, 0, 0, 1],
+    ], dtype=bool)
+    region = keying.connected_region(mask, [(0, 0)])
+    assert region.tolist() == [[True, True, False, False], [False, True, False, False],
+                               [False, False, False, False]]
+    # Seeds off the mask, or outside the image, select nothing
+    assert not keying.connected_region(mask, [(2, 0), (9, 9)]).any()
+
+    alpha = np.where(mask, 0, 255).astype(np.uint8)
+    alpha[0, 3] = 40
+    result = keying.contiguous_alpha(alpha, [(3, 2)])
+    assert result[:, 3].tolist() == [40, 0, 0]
+    assert (result[:, :3] == 255).all()
+
+
+@pytest.mark.parametrize("metric", ["rgb", "lab76"])
+@pytest.mark.parametrize("workers, band_rows", [(1, None), (3, 4), (2, 100)])
+def test_parallel_matches_serial(noisy, metric, workers, band_rows):
+    keys = [((0, 0, 255), 60)]
+    expected = keying.remove_background(noisy, (255, 0, 0), 90, metric, keys=keys)
+    result = keying.remove_background_parallel(noisy, (255, 0, 0), 90, metric, keys=keys,
+                                               workers=workers, band_rows=band_rows)
+    assert np.array_equal(result, expected)
+
+
+@pytest.mark.parametrize("metric, color_range", [("rgb", 90), ("lab76", 40), ("lab2000", 25), ("hue", 30)])
+def test_single_key_parallel_matches_serial_for_every_metric(metric, color_range):
+    # Enough random pixels that any rounding between the paths would show up
+    img = np.random.default_rng(3).integers(0, 256, (200, 200, 3), dtype=np.uint8)
+    expected = keying.remove_background(img, (40, 200, 60), color_range, metric)
+    result = keying.remove_background_parallel(img, (40, 200, 60), color_range, metric,
+                                               workers=3, band_rows=64)
+    assert np.array_equal(result, expected)
+
+
+def test_parallel_feather_ramp():
+    img = np.array([[[0, 255, 0], [0, 245, 0], [0, 235, 0], [0, 225, 0]]], dtype=np.uint8)
+    result = keying.remove_background_parallel(img, (0, 255, 0), 10, feather=20, workers=1)
+    # Distances 0, 10, 20, 30: keyed up to 10, opaque from 30
+    assert result[0, :, 3].tolist() == [0, 0, 128, 255]
+
+
+def reference_band(mask, radius):
+    # Every pixel within Chebyshev radius of a pixel whose right or lower
+    # neighbor differs (either side of that pair counts as boundary)
+    height, width = mask.shape
+    edges = np.zeros(mask.shape, dtype=bool)
+    for y in range(height):
+        for x in range(width):
+            for ny, nx in ((y, x + 1), (y + 1, x)):
+                if ny < height and nx < width and mask[y, x] != mask[ny, nx]:
+                    edges[y, x] = edges[ny, nx] = True
+    band = np.zeros(mask.shape, dtype=bool)
+    for y, x in zip(*np.nonzero(edges)):
+        band[max(0, y - radius):y + radius + 1, max(0, x - radius):x + radius + 1] = True
+    return np.flatnonzero(band)
+
+
+@pytest.mark.parametrize("radius", [0, 1, 3])
+def test_edge_band_matches_reference(radius):
+    mask = np.random.default_rng(radius).random((23, 31)) < 0.3
+    np.testing.assert_array_equal(keying.edge_band_indices(mask, radius), reference_band(mask, radius))
+
+
+def test_edge_band_of_uniform_mask_is_empty():
+    assert len(keying.edge_band_indices(np.ones((10, 10), dtype=bool), 2)) == 0
+
+
+def test_soft_alpha_ramps_past_saturated_distances():
+    # Distances of 0, 150, 300 and 441 from black; the map saturates near 256
+    img = np.array([[[0, 0, 0], [150, 0, 0], [255, 141, 0], [255, 255, 255]]], dtype=np.uint8)
+    distance = np.sqrt((img.astype(float) ** 2).sum(axis=2))
+    distance_map = keying.DistanceMap(img, (0, 0, 0))
+
+    alpha = distance_map.soft_alpha(100, 355)
+    expected = np.clip(np.rint((distance - 100) * 255 / 255), 0, 255)
+    np.testing.assert_allclose(alpha, expected, atol=1)
+    assert 0 < alpha[0, 2] < 255
+
+    refined = distance_map.refined_alpha(100, 355, radius=3)
+    np.testing.assert_array_equal(refined, alpha)
@@ -0,0 +1,58 @@
+import gc
+
+import pytest
+from PIL import Image
+
+import preview_render
+
+
+class FakeLabel:
+    """Just enough of a Tk label for the cache and refine bookkeeping."""
+
+    def __init__(self):
+        self.bindings = {}
+        self.cancelled = []
+
+    def bind(self, event, callback, add=None):
+        self.bindings[event] = callback
+
+    def after_cancel(self, job):
+        self.cancelled.append(job)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_new_frame_is_usable(mode):
+    frame = preview_render.new_frame(mode, (5, 3))
+    assert frame.mode == mode and frame.size == (5, 3)
+    frame.frombytes(bytes(range(15 * len(mode))))
+    assert frame.getpixel((1, 0))[0] == len(mode)
+
+
+def test_new_frame_falls_back_when_blocks_fail(monkeypatch):
+    def broken(*args):
+        raise TypeError("signature changed")
+    monkeypatch.setattr(preview_render.Image.core, "new_block", broken, raising=False)
+    frame = preview_render.new_frame("RGB", (4, 2))
+    assert frame.mode == "RGB" and frame.size == (4, 2)
+
+
+def test_scaled_cache_does_not_keep_sources_alive():
+    renderer = preview_render.PreviewRenderer(FakeLabel())
+    source = Image.new("RGB", (800, 600))
+    scaled = source.resize((80, 60))
+    renderer._put_scaled(source, (80, 60), True, scaled)
+    assert renderer._get_scaled(source, (80, 60), True) is scaled
+
+    del source
+    gc.collect()
+    assert not renderer._scaled
+    # A new image, even one that reuses the id, misses the cache
+    assert renderer._get_scaled(Image.new("RGB", (800, 600)), (80, 60), True) is None
+
+
+def test_pending_refine_is_cancelled_on_destroy():
+    label = FakeLabel()
+    renderer = preview_render.PreviewRenderer(label)
+    renderer._refine_job = "after#1"
+    label.bindings["<Destroy>"](type("Event", (), {"widget": label})())
+    assert label.cancelled == ["after#1"] and renderer._refine_job is None
@@ -0,0 +1,135 @@
+import queue
+import threading
+
+import pytest
+
+from preview_scheduler import PreviewScheduler
+
+
+class FakeRoot:
+    # Stands in for tk.Tk: after() queues the callback, run_next() runs it on
+    # the test thread the way the Tk main loop would
+
+    def __init__(self):
+        self.calls = queue.Queue()
+
+    def after(self, delay, callback, *args):
+        self.calls.put((callback, args))
+
+    def run_next(self):
+        callback, args = self.calls.get(timeout=5)
+        callback(*args)
+
+
+class Recorder:
+    # compute() records its arguments and can be held at a gate so the test
+    # decides when a job finishes
+
+    def __init__(self):
+        self.started = queue.Queue()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.computed = []
+        self.delivered = []
+        self.errors = []
+
+    def compute(self, value):
+        self.started.put(value)
+        self.gate.wait(5)
+        self.computed.append(value)
+        if isinstance(value, Exception):
+            raise value
+        return value * 10
+
+
+@pytest.fixture
+def setup():
+    root = FakeRoot()
+    recorder = Recorder()
+    scheduler = PreviewScheduler(root, recorder.compute, recorder.delivered.append,
+                                 recorder.errors.append)
+    yield root, recorder, scheduler
+    scheduler.close()
+
+
+def test_delivers_a_result_on_the_main_thread(setup):
+    root, recorder, scheduler = setup
+    scheduler.request(1)
+    root.run_next()
+    assert recorder.delivered == [10]
+
+
+def test_only_the_newest_request_is_delivered(setup):
+    root, recorder, scheduler = setup
+    recorder.gate.clear()
+    scheduler.request(1)
+    assert recorder.started.get(timeout=5) == 1
+
+    # Both arrive while 1 is running; 2 is replaced by 3 before it starts
+    scheduler.request(2)
+    scheduler.request(3)
+    recorder.gate.set()
+
+    root.run_next()
+    root.run_next()
+    assert recorder.computed == [1, 3]
+    assert recorder.delivered == [30]
+
+
+def test_result_after_cancel_is_dropped(setup):
+    root, recorder, scheduler = setup
+    recorder.gate.clear()
+    scheduler.request(1)
+    recorder.started.get(timeout=5)
+    scheduler.cancel()
+    recorder.gate.set()
+
+    root.run_next()
+    assert recorder.computed == [1]
+    assert recorder.delivered == []
+
+
+def test_queued_result_is_dropped_after_a_newer_request(setup):
+    root, recorder, scheduler = setup
+    recorder.gate.clear()
+    scheduler.request(1)
+    recorder.started.get(timeout=5)
+    recorder.gate.set()
+    # Wait until 1's result is queued for the main thread, then supersede it
+    callback, args = root.calls.get(timeout=5)
+    scheduler.request(2)
+
+    callback(*args)
+    assert recorder.delivered == []
+    root.run_next()
+    assert recorder.delivered == [20]
+
+
+def test_worker_exceptions_reach_the_error_callback(setup):
+    root, recorder, scheduler = setup
+    error = ValueError("bad preview")
+    scheduler.request(error)
+    root.run_next()
+    assert recorder.errors == [error]
+    assert recorder.delivered == []
+
+
+def test_stale_exceptions_are_dropped(setup):
+    root, recorder, scheduler = setup
+    recorder.gate.clear()
+    scheduler.request(ValueError("stale"))
+    recorder.started.get(timeout=5)
+    scheduler.request(4)
+    recorder.gate.set()
+
+    root.run_next()
+    root.run_next()
+    assert recorder.errors == []
+    assert recorder.delivered == [40]
+
+
+def test_close_stops_the_worker():
+    scheduler = PreviewScheduler(FakeRoot(), lambda: None, lambda result: None)
+    scheduler.close()
+    scheduler._worker.join(5)
+    assert not scheduler._worker.is_alive()
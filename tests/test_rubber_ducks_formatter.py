@@ -0,0 +1,66 @@
+import io
+import json
+
+import pytest
+
+from RubberDucksFormatter import (RubberDucksFormatter, format_duck, iter_ducks, iter_flock,
+                                  iter_formatted_flock)
+
+FLOCK = {
+    "ducks": [
+        {"name": "Daffy", "color": "black"},
+        {"name": "Dewey é \\\"quoted\\\"", "color": "blue", "size": 12345.678},
+        {"name": "Huey", "color": "red", "tags": [1, 2, {"x": None}]},
+    ],
+    "mamaDuck": {"name": "Mama", "color": "yellow"},
+    "count": 1234567,
+}
+
+
+class CountingReader(io.StringIO):
+    """StringIO that records how many characters were read."""
+
+    chars_read = 0
+
+    def read(self, size=-1):
+        text = super().read(size)
+        self.chars_read += len(text)
+        return text
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_iter_flock_matches_json_at_any_chunk_size(chunk_size):
+    text = json.dumps(FLOCK, indent=4)
+    items = list(iter_flock(io.StringIO(text), chunk_size))
+    assert [value for kind, value in items if kind == "duck"] == FLOCK["ducks"]
+    assert ("mamaDuck", FLOCK["mamaDuck"]) in items
+    # A number ending at a chunk boundary is not cut short
+    assert ("count", 1234567) in items
+
+
+@pytest.mark.parametrize("text", ["{}", '{"ducks": []}', ' \n{ "ducks" : [ ] } \n'])
+def test_empty_flocks(text):
+    assert list(iter_ducks(io.StringIO(text), 2)) == []
+
+
+@pytest.mark.parametrize("text", ['{"ducks": [{"name": "a"}', '{"ducks" [', '[]', '{"ducks": [1 2]}'])
+def test_malformed_flocks_raise(text):
+    with pytest.raises(ValueError):
+        list(iter_flock(io.StringIO(text), 4))
+
+
+def test_syntax_error_is_raised_without_reading_to_the_end():
+    text = '{"ducks": [{"name": "Daffy" "color": "black"}' + ', {"name": "x", "color": "y"}' * 10000
+    file = CountingReader(text)
+    with pytest.raises(ValueError):
+        list(iter_flock(file, 16))
+    assert file.chars_read < 100
+
+
+def test_formatting():
+    assert format_duck(FLOCK["ducks"][0]) == "Duck Name: Daffy, Color: black"
+    formatter = RubberDucksFormatter(FLOCK["ducks"][:1])
+    assert formatter.format_ducks() == list(formatter.iter_formatted())
+    lines = list(iter_formatted_flock(io.StringIO(json.dumps(FLOCK)), 8))
+    assert lines[0] == "Duck Name: Daffy, Color: black"
+    assert lines[-1] == "Mama Duck Name: Mama, Color: yellow"
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import channel_swap
+import keying
+import tiled
+
+GREEN = (0, 255, 0)
+
+
+def make_image(channels, height=37, width=11):
+    rng = np.random.default_rng(7)
+    pixels = rng.integers(0, 256, size=(height, width, channels), dtype=np.uint8)
+    # Exact key color in part of the image so keying has something to remove
+    pixels[5:20, 2:8, :3] = GREEN
+    return pixels
+
+
+def save_input(tmp_path, pixels, name, **options):
+    path = tmp_path / name
+    if name.endswith(".npy"):
+        np.save(path, pixels)
+    else:
+        Image.fromarray(pixels).save(path, **options)
+    return str(path)
+
+
+def decode(path):
+    with Image.open(path) as img:
+        return np.asarray(img)
+
+
+@pytest.mark.parametrize("channels", [3, 4])
+@pytest.mark.parametrize("name, options", [
+    ("in.tif", {}),
+    ("in.tif", {"compression": "tiff_lzw"}),
+    ("in.png", {}),
+    ("in.npy", {}),
+])
+@pytest.mark.parametrize("out_name", ["out.png", "out.tif"])
+def test_swap_round_trip(tmp_path, channels, name, options, out_name):
+    pixels = make_image(channels)
+    input_path = save_input(tmp_path, pixels, name, **options)
+    output_path = str(tmp_path / out_name)
+
+    # 37 rows in strips of 8 leaves a short last strip
+    tiled.swap_channels_tiled(input_path, output_path, "BRG", strip_rows=8)
+
+    expected = channel_swap.permute_array(pixels.copy(), "BRG")
+    np.testing.assert_array_equal(decode(output_path), expected)
+
+
+@pytest.mark.parametrize("channels", [3, 4])
+@pytest.mark.parametrize("name, options", [
+    ("in.tif", {}),
+    ("in.tif", {"compression": "tiff_lzw"}),
+    ("in.npy", {}),
+])
+@pytest.mark.parametrize("out_name", ["out.png", "out.tif"])
+def test_key_round_trip(tmp_path, channels, name, options, out_name):
+    pixels = make_image(channels)
+    input_path = save_input(tmp_path, pixels, name, **options)
+    output_path = str(tmp_path / out_name)
+
+    tiled.remove_background_tiled(input_path, output_path, GREEN, 40, strip_rows=8, metric="lab76")
+
+    expected = keying.remove_background(pixels, GREEN, 40, "lab76")
+    np.testing.assert_array_equal(decode(output_path), expected)
+
+
+def test_readers_pick_the_streaming_path(tmp_path):
+    pixels = make_image(3)
+    plain = save_input(tmp_path, pixels, "plain.tif")
+    lzw = save_input(tmp_path, pixels, "lzw.tif", compression="tiff_lzw")
+    npy = save_input(tmp_path, pixels, "in.npy")
+
+    for path, kind in [(plain, tiled._TiffStripReader), (lzw, tiled._PilStripReader),
+                       (npy, tiled._NpyStripReader)]:
+        reader = tiled.open_strip_reader(path)
+        try:
+            assert isinstance(reader, kind)
+            np.testing.assert_array_equal(reader.read(30, 8), pixels[30:])
+        finally:
+            reader.close()
+
+
+def test_strip_rows_larger_than_the_image(tmp_path):
+    pixels = make_image(3)
+    input_path = save_input(tmp_path, pixels, "in.tif")
+    output_path = str(tmp_path / "out.tif")
+
+    tiled.swap_channels_tiled(input_path, output_path, "RGB", strip_rows=1000)
+
+    np.testing.assert_array_equal(decode(output_path), pixels)
+
+
+@pytest.mark.parametrize("strip_rows", [0, -3])
+def test_rejects_strip_rows_below_one(tmp_path, strip_rows):
+    input_path = save_input(tmp_path, make_image(3), "in.png")
+    with pytest.raises(ValueError):
+        tiled.swap_channels_tiled(input_path, str(tmp_path / "out.png"), "RG", strip_rows)
+    assert not (tmp_path / "out.png").exists()
+
+
+def test_rejects_a_transform_that_drops_rows(tmp_path):
+    input_path = save_input(tmp_path, make_image(3), "in.png")
+    with pytest.raises(ValueError):
+        tiled.process_strips(input_path, str(tmp_path / "out.png"), lambda strip: strip[1:], 3, 8)
@@ -0,0 +1,356 @@
+"""
+Strip-by-strip image processing for images that do not fit in memory.
+
+Images are read, transformed and written in bands of rows, so peak memory is
+bounded by the strip size rather than the image size:
+
+- Uncompressed 8-bit TIFFs are read strip by strip straight from the file and
+  .npy files are memory-mapped, so the rest of the image is never loaded.
+- Other formats (JPEG, compressed PNG/TIFF, ...) are decoded once by PIL and
+  then processed in strips, which still avoids the extra full-size copies.
+- Results are streamed to an uncompressed TIFF or a PNG, one strip at a time.
+"""
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+import channel_swap
+import keyed_output
+import keying
+
+DEFAULT_STRIP_ROWS = 256
+
+# TIFF tag ids and field types used by the reader and writer
+_TAG_WIDTH = 256
+_TAG_HEIGHT = 257
+_TAG_BITS_PER_SAMPLE = 258
+_TAG_COMPRESSION = 259
+_TAG_PHOTOMETRIC = 262
+_TAG_STRIP_OFFSETS = 273
+_TAG_SAMPLES_PER_PIXEL = 277
+_TAG_ROWS_PER_STRIP = 278
+_TAG_STRIP_BYTE_COUNTS = 279
+_TAG_PLANAR_CONFIG = 284
+_TAG_EXTRA_SAMPLES = 338
+_SHORT = 3
+_LONG = 4
+_TYPE_SIZES = {1: 1, 3: 2, 4: 4}
+_TYPE_CODES = {1: "B", 3: "H", 4: "I"}
+
+
+class _TiffStripReader:
+    # Reads rows of an uncompressed, chunky, 8-bit TIFF straight from its
+    # strips. Plain reads rather than a memory map keep resident memory at
+    # one strip, since mapped pages would stay counted against the worker.
+
+    def __init__(self, path, tags):
+        self.width = tags[_TAG_WIDTH][0]
+        self.height = tags[_TAG_HEIGHT][0]
+        self.channels = tags.get(_TAG_SAMPLES_PER_PIXEL, [1])[0]
+        self.rows_per_strip = tags.get(_TAG_ROWS_PER_STRIP, [self.height])[0]
+        self.strip_offsets = tags[_TAG_STRIP_OFFSETS]
+        self._file = open(path, "rb")
+        self._row_bytes = self.width * self.channels
+
+    def read(self, top, rows):
+        bottom = min(top + rows, self.height)
+        parts = []
+        row = top
+        while row < bottom:
+            strip = row // self.rows_per_strip
+            strip_end = min((strip + 1) * self.rows_per_strip, bottom)
+            start = self.strip_offsets[strip] + (row - strip * self.rows_per_strip) * self._row_bytes
+            self._file.seek(start)
+            data = np.fromfile(self._file, dtype=np.uint8, count=(strip_end - row) * self._row_bytes)
+            parts.append(data.reshape(strip_end - row, self.width, self.channels))
+            row = strip_end
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def close(self):
+        self._file.close()
+
+
+class _NpyStripReader:
+    # Memory-maps an HxWxC uint8 .npy file
+
+    def __init__(self, path):
+        self._data = np.load(path, mmap_mode='r')
+        if self._data.dtype != np.uint8 or self._data.ndim != 3:
+            raise ValueError(f"Expected an HxWxC uint8 array in {path}")
+        self.height, self.width, self.channels = self._data.shape
+
+    def read(self, top, rows):
+        return self._data[top:top + rows]
+
+    def close(self):
+        self._data = None
+
+
+class _PilStripReader:
+    # Fallback for formats that cannot be read strip-wise: decode once with PIL
+
+    def __init__(self, path):
+        self._img = Image.open(path)
+        if self._img.mode not in ('RGB', 'RGBA'):
+            self._img = self._img.convert('RGBA' if 'A' in self._img.getbands() else 'RGB')
+        self.width, self.height = self._img.size
+        self.channels = len(self._img.getbands())
+
+    def read(self, top, rows):
+        box = (0, top, self.width, min(top + rows, self.height))
+        return np.asarray(self._img.crop(box))
+
+    def close(self):
+        self._img.close()
+
+
+def _read_tiff_tags(f):
+    header = f.read(8)
+    if header[:4] not in (b"II*\x00", b"MM\x00*"):
+        return None, None
+    byte_order = "<" if header[:2] == b"II" else ">"
+    (ifd_offset,) = struct.unpack(byte_order + "I", header[4:8])
+
+    f.seek(ifd_offset)
+    (count,) = struct.unpack(byte_order + "H", f.read(2))
+    tags = {}
+    for _ in range(count):
+        tag, field_type, n, value = struct.unpack(byte_order + "HHI4s", f.read(12))
+        if field_type not in _TYPE_SIZES:
+            continue
+        size = _TYPE_SIZES[field_type] * n
+        if size > 4:
+            position = f.tell()
+            (offset,) = struct.unpack(byte_order + "I", value)
+            f.seek(offset)
+            value = f.read(size)
+            f.seek(position)
+        tags[tag] = list(struct.unpack(byte_order + _TYPE_CODES[field_type] * n, value[:size]))
+    return tags, byte_order
+
+
+def open_strip_reader(path):
+    """
+    Open an image for strip-wise reading.
+
+    Returns an object with width, height, channels, read(top, rows) returning
+    a (rows, width, channels) uint8 array, and close().
+    """
+    if path.lower().endswith(".npy"):
+        return _NpyStripReader(path)
+
+    if path.lower().endswith((".tif", ".tiff")):
+        with open(path, "rb") as f:
+            tags, byte_order = _read_tiff_tags(f)
+        streamable = (
+            tags is not None
+            and byte_order == "<"
+            and tags.get(_TAG_COMPRESSION, [1])[0] == 1
+            and tags.get(_TAG_PLANAR_CONFIG, [1])[0] == 1
+            and tags.get(_TAG_PHOTOMETRIC, [None])[0] == 2
+            and set(tags.get(_TAG_BITS_PER_SAMPLE, [8])) == {8}
+            and tags.get(_TAG_SAMPLES_PER_PIXEL, [1])[0] in (3, 4)
+        )
+        if streamable:
+            return _TiffStripReader(path, tags)
+
+    return _PilStripReader(path)
+
+
+class TiffStripWriter:
+    """
+    Write an uncompressed 8-bit gray/RGB/RGBA TIFF one strip at a time.
+
+    The header, IFD and strip table are written up front, so each strip is a
+    plain sequential write.
+    """
+
+    def __init__(self, path, width, height, channels, strip_rows=DEFAULT_STRIP_ROWS):
+        if channels not in (1, 3, 4):
+            raise ValueError("Only gray, RGB and RGBA output is supported")
+        row_bytes = width * channels
+        strip_count = (height + strip_rows - 1) // strip_rows
+
+        entries = [
+            (_TAG_WIDTH, _LONG, [width]),
+            (_TAG_HEIGHT, _LONG, [height]),
+            (_TAG_BITS_PER_SAMPLE, _SHORT, [8] * channels),
+            (_TAG_COMPRESSION, _SHORT, [1]),
+            (_TAG_PHOTOMETRIC, _SHORT, [1 if channels == 1 else 2]),
+            (_TAG_STRIP_OFFSETS, _LONG, [0] * strip_count),
+            (_TAG_SAMPLES_PER_PIXEL, _SHORT, [channels]),
+            (_TAG_ROWS_PER_STRIP, _LONG, [strip_rows]),
+            (_TAG_STRIP_BYTE_COUNTS, _LONG, [
+                min(strip_rows, height - i * strip_rows) * row_bytes for i in range(strip_count)
+            ]),
+            (_TAG_PLANAR_CONFIG, _SHORT, [1]),
+        ]
+        if channels == 4:
+            # Unassociated (straight) alpha
+            entries.append((_TAG_EXTRA_SAMPLES, _SHORT, [2]))
+
+        # Lay out: header, IFD, out-of-line tag values, pixel data
+        ifd_size = 2 + 12 * len(entries) + 4
+        extra_offset = 8 + ifd_size
+        extra_size = sum(
+            _TYPE_SIZES[t] * len(v) for _, t, v in entries if _TYPE_SIZES[t] * len(v) > 4
+        )
+        data_offset = extra_offset + extra_size
+        if data_offset + row_bytes * height > 0xFFFFFFFF:
+            raise ValueError("Image too large for a classic (non-BigTIFF) TIFF")
+
+        strip_offsets = [data_offset + i * strip_rows * row_bytes for i in range(strip_count)]
+        entries[5] = (_TAG_STRIP_OFFSETS, _LONG, strip_offsets)
+
+        ifd = [struct.pack("<H", len(entries))]
+        extra = []
+        for tag, field_type, values in entries:
+            packed = struct.pack("<" + _TYPE_CODES[field_type] * len(values), *values)
+            if len(packed) > 4:
+                ifd.append(struct.pack("<HHII", tag, field_type, len(values),
+                                       extra_offset + sum(map(len, extra))))
+                extra.append(packed)
+            else:
+                ifd.append(struct.pack("<HHI", tag, field_type, len(values)) + packed.ljust(4, b"\0"))
+        ifd.append(struct.pack("<I", 0))
+
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self._file = open(path, "wb")
+        self._file.write(b"II*\x00" + struct.pack("<I", 8))
+        self._file.write(b"".join(ifd))
+        self._file.write(b"".join(extra))
+
+    def write(self, strip):
+        self._file.write(np.ascontiguousarray(strip, dtype=np.uint8).tobytes())
+
+    def close(self):
+        self._file.close()
+
+
+class PngStripWriter:
+    """
+    Write an 8-bit gray/RGB/RGBA PNG one strip at a time through a streaming
+    zlib compressor.
+    """
+
+    def __init__(self, path, width, height, channels, compress_level=keyed_output.DEFAULT_COMPRESS_LEVEL):
+        if channels not in (1, 3, 4):
+            raise ValueError("Only gray, RGB and RGBA output is supported")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        color_type = {1: 0, 3: 2, 4: 6}[channels]
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, strip):
+        rows = strip.shape[0]
+        # Every scanline is prefixed with filter type 0 (None)
+        raw = np.zeros((rows, 1 + self.width * self.channels), dtype=np.uint8)
+        raw[:, 1:] = strip.reshape(rows, -1)
+        data = self._compressor.compress(raw.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self):
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._file.close()
+
+
+def open_strip_writer(path, width, height, channels, strip_rows=DEFAULT_STRIP_ROWS,
+                      compress_level=keyed_output.DEFAULT_COMPRESS_LEVEL):
+    """
+    Open a TIFF or PNG strip writer based on the file extension.
+
+    compress_level only applies to PNG, TIFF strips are uncompressed.
+    """
+    if path.lower().endswith((".tif", ".tiff")):
+        return TiffStripWriter(path, width, height, channels, strip_rows)
+    if path.lower().endswith(".png"):
+        return PngStripWriter(path, width, height, channels, compress_level)
+    raise ValueError(f"Strip output must be .tif, .tiff or .png: {path}")
+
+
+def process_strips(input_path, output_path, transform, out_channels, strip_rows=DEFAULT_STRIP_ROWS,
+                   compress_level=keyed_output.DEFAULT_COMPRESS_LEVEL):
+    """
+    Stream an image through transform(strip) -> strip, one band of rows at a
+    time.
+
+    Args:
+        input_path (str): Source image (uncompressed .tif and .npy are read
+            without loading the whole image)
+        output_path (str): Destination .tif/.tiff or .png
+        transform (callable): Maps a (rows, W, C) uint8 array to a
+            (rows, W, out_channels) uint8 array
+        out_channels (int): 1 for gray output, 3 for RGB, 4 for RGBA, or None
+            for the same channel count as the input
+        strip_rows (int): Number of rows processed per step
+        compress_level (int): zlib level for PNG output
+
+    Raises:
+        ValueError: strip_rows is below 1, or transform returned a different
+            number of rows than it was given
+    """
+    if strip_rows < 1:
+        raise ValueError(f"strip_rows must be at least 1, got {strip_rows}")
+    reader = open_strip_reader(input_path)
+    try:
+        if out_channels is None:
+            out_channels = reader.channels
+        writer = open_strip_writer(output_path, reader.width, reader.height, out_channels, strip_rows,
+                                   compress_level)
+        try:
+            for top in range(0, reader.height, strip_rows):
+                strip = reader.read(top, strip_rows)
+                result = transform(strip)
+                # A short strip would leave the file truncated but still readable
+                if result.shape[0] != strip.shape[0]:
+                    raise ValueError(f"transform returned {result.shape[0]} rows for a "
+                                     f"{strip.shape[0]}-row strip")
+                writer.write(result)
+        finally:
+            writer.close()
+    finally:
+        reader.close()
+
+
+def swap_channels_tiled(input_path, output_path, order, strip_rows=DEFAULT_STRIP_ROWS):
+    """Reorder RGB channels strip by strip, keeping any alpha, see channel_swap.permute_array."""
+    # Validate before opening anything
+    channel_swap.channel_indices(order)
+
+    def transform(strip):
+        # Copy, since .npy strips are read-only views of the memory map
+        return channel_swap.permute_array(np.array(strip), order)
+
+    process_strips(input_path, output_path, transform, None, strip_rows)
+
+
+def remove_background_tiled(input_path, output_path, target_color, color_range,
+                            strip_rows=DEFAULT_STRIP_ROWS, metric="rgb"):
+    """Key out target_color strip by strip, writing an RGBA image."""
+    def transform(strip):
+        return keying.remove_background(strip, target_color, color_range, metric)
+
+    process_strips(input_path, output_path, transform, 4, strip_rows)
+
+
+def tiled_output_path(output_path):
+    """Map an output path to one the strip writers can produce."""
+    root, ext = os.path.splitext(output_path)
+    return output_path if ext.lower() in (".tif", ".tiff", ".png") else root + ".tif"